@@ -38,3 +38,23 @@ class AuditLogMiddleware:
             ip = request.META.get('REMOTE_ADDR')
         return ip
 
+
+
+class PresenceMiddleware:
+    """
+    Middleware to record activity of authenticated users.
+    Runs after the view so users authenticated by DRF (JWT) are seen too;
+    users.presence coalesces the last_activity writes.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            from users.presence import touch
+            touch(user.id)
+        
+        return response
@@ -95,6 +95,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'campuslink.middleware.AuditLogMiddleware',
+    'campuslink.middleware.PresenceMiddleware',
 ]
 
 ROOT_URLCONF = 'campuslink.urls'
@@ -444,6 +445,30 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Celery n'est pas déployé sur Render : sans worker, les tâches de fond tournent dans un thread
+USE_CELERY = env.bool('USE_CELERY', default=False)
+
+# Vues des événements : comptées dans le cache puis écrites en base par lots toutes les N secondes
+EVENT_VIEWS_FLUSH_INTERVAL = env.int('EVENT_VIEWS_FLUSH_INTERVAL', default=60)
+
+# Recommandations d'événements : classement précalculé par utilisateur, recalculé toutes les N secondes
+RECOMMENDATIONS_REFRESH_INTERVAL = env.int('RECOMMENDATIONS_REFRESH_INTERVAL', default=3600)
+
+# Tâches périodiques (celery beat)
+CELERY_BEAT_SCHEDULE = {
+    'flush-event-views': {
+        'task': 'events.tasks.flush_event_views_task',
+        'schedule': EVENT_VIEWS_FLUSH_INTERVAL,
+    },
+    'compute-event-recommendations': {
+        'task': 'events.tasks.compute_recommendations_task',
+        'schedule': RECOMMENDATIONS_REFRESH_INTERVAL,
+    },
+    'cleanup-attachment-uploads': {
+        'task': 'messaging.tasks.cleanup_attachment_uploads_task',
+        'schedule': 60 * 60,
+    },
+}
 
 # Channels Configuration (WebSockets)
 # Use in-memory channel layer in development if Redis is not available
@@ -487,6 +512,12 @@ else:
         },
     }
 
+# Fan-out des grandes conversations de groupe : au-delà de MESSAGING_FANOUT_SHARD_SIZE membres,
+# les membres sont répartis en sous-groupes de cette taille, servis en parallèle
+MESSAGING_FANOUT_SHARD_SIZE = env.int('MESSAGING_FANOUT_SHARD_SIZE', default=250)
+# Au-delà de ce nombre de membres, les indicateurs de saisie et accusés de lecture ne sont plus diffusés (0 = jamais)
+MESSAGING_EPHEMERAL_MAX_MEMBERS = env.int('MESSAGING_EPHEMERAL_MAX_MEMBERS', default=500)
+
 # Email Configuration
 EMAIL_BACKEND = env('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = env('EMAIL_HOST', default='smtp.gmail.com')
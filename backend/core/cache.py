@@ -10,6 +10,21 @@ from django.conf import settings
 logger = logging.getLogger(__name__)
 
 
+# Backends whose incr/decr are atomic (DatabaseCache and FileBasedCache read then write)
+ATOMIC_INCR_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django_redis.cache.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def has_atomic_incr(alias='default'):
+    """Check if cache.incr / cache.decr are atomic with the configured cache backend."""
+    return settings.CACHES.get(alias, {}).get('BACKEND') in ATOMIC_INCR_BACKENDS
+
+
 def _get_cache_key(prefix, *args):
     """Generate cache key from prefix and arguments."""
     key_parts = [prefix] + [str(arg) if arg is not None else 'all' for arg in args]
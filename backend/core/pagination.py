@@ -1,4 +1,7 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -16,3 +19,67 @@ class CustomPageNumberPagination(PageNumberPagination):
             'results': data
         })
 
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over (created_at, id), newest first.
+    The cursor is the id of a returned object: ?before=<id> returns the page of
+    older objects, ?after=<id> the page of newer ones. Each page is a single
+    index range scan, whatever the depth of the history.
+    The response body stays a plain list so existing clients keep working.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    before_query_param = 'before'
+    after_query_param = 'after'
+    ordering = ('created_at', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+    
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+    
+    def get_anchor(self, queryset, cursor):
+        """Return the ordering values of the object used as cursor."""
+        try:
+            anchor = queryset.model._default_manager.filter(pk=cursor).values(*self.ordering).first()
+        except (ValidationError, ValueError):
+            anchor = None
+        if anchor is None:
+            raise NotFound(self.invalid_cursor_message)
+        return anchor
+    
+    def get_keyset_filter(self, anchor, lookup):
+        """Build the row comparison (a, b) <lookup> (anchor_a, anchor_b)."""
+        first, second = self.ordering
+        return (
+            Q(**{f'{first}__{lookup}': anchor[first]}) |
+            Q(**{first: anchor[first], f'{second}__{lookup}': anchor[second]})
+        )
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        before = request.query_params.get(self.before_query_param)
+        after = request.query_params.get(self.after_query_param)
+        descending = [f'-{field}' for field in self.ordering]
+        
+        if after and not before:
+            # Oldest objects newer than the cursor, returned newest first
+            anchor = self.get_anchor(queryset, after)
+            page = list(queryset.filter(self.get_keyset_filter(anchor, 'gt')).order_by(*self.ordering)[:page_size])
+            page.reverse()
+            return page
+        
+        if before:
+            anchor = self.get_anchor(queryset, before)
+            queryset = queryset.filter(self.get_keyset_filter(anchor, 'lt'))
+        return list(queryset.order_by(*descending)[:page_size])
+    
+    def get_paginated_response(self, data):
+        from rest_framework.response import Response
+        return Response(data)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Event, Participation, EventComment, EventLike
+from .models import Category, Event, Participation, EventWaitlistEntry, EventRecommendation, EventComment, EventLike
 
 
 @admin.register(Category)
@@ -23,6 +23,20 @@ class ParticipationAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'event__title']
 
 
+@admin.register(EventWaitlistEntry)
+class EventWaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['event', 'user', 'created_at']
+    list_filter = ['created_at']
+    search_fields = ['user__username', 'event__title']
+
+
+@admin.register(EventRecommendation)
+class EventRecommendationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'rank', 'event', 'score', 'computed_at']
+    list_filter = ['computed_at']
+    search_fields = ['user__username', 'event__title']
+
+
 @admin.register(EventComment)
 class EventCommentAdmin(admin.ModelAdmin):
     list_display = ['event', 'user', 'created_at']
@@ -0,0 +1,63 @@
+"""
+Commande Django pour recalculer les recommandations d'événements de chaque utilisateur
+Usage: python manage.py compute_recommendations (ex: toutes les heures via cron, sans celery beat)
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from events.recommendations import RECOMMENDATIONS_PER_USER, USER_BATCH_SIZE, compute_recommendations
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcule le score des événements à venir pour les utilisateurs actifs '
+        '(centres d\'intérêt, université, abonnements, participation des amis, popularité) '
+        'et enregistre leurs N meilleurs événements'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Email ou nom d\'utilisateur: ne recalcule que cet utilisateur',
+        )
+        parser.add_argument(
+            '--top-n',
+            type=int,
+            default=RECOMMENDATIONS_PER_USER,
+            help=f'Nombre d\'événements conservés par utilisateur (défaut: {RECOMMENDATIONS_PER_USER})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=USER_BATCH_SIZE,
+            help=f'Nombre d\'utilisateurs calculés ensemble (défaut: {USER_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['top_n'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--top-n et --batch-size doivent être au moins 1')
+
+        user_ids = None
+        if options['user']:
+            user = User.objects.filter(
+                Q(email=options['user']) | Q(username=options['user'])
+            ).first()
+            if not user:
+                raise CommandError(f'Utilisateur introuvable: {options["user"]}')
+            user_ids = [user.id]
+
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS('CALCUL DES RECOMMANDATIONS D\'ÉVÉNEMENTS'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+
+        result = compute_recommendations(
+            user_ids=user_ids,
+            top_n=options['top_n'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(
+            f'{result["users"]} utilisateurs classés sur {result["events"]} événements à venir '
+            f'({result["rows"]} recommandations enregistrées)'
+        )
@@ -0,0 +1,31 @@
+"""
+Commande Django pour écrire en base les vues d'événements comptées dans le cache
+Usage: python manage.py flush_event_views (ex: toutes les minutes via cron, sans celery beat)
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from events.view_counts import flush_event_views
+
+
+class Command(BaseCommand):
+    help = (
+        'Ajoute à Event.views_count les vues comptées dans le cache, par lots de mises à jour F(). '
+        'Les deux dernières tranches de EVENT_VIEWS_FLUSH_INTERVAL secondes sont laissées pour le passage suivant.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS('ÉCRITURE DES VUES D\'ÉVÉNEMENTS'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+
+        result = flush_event_views()
+        if result is None:
+            self.stdout.write(self.style.WARNING('Une autre écriture est déjà en cours, rien à faire'))
+            return
+
+        self.stdout.write(
+            f'{result["views"]} vues ajoutées à {result["events"]} événements '
+            f'({result["buckets"]} tranches de {settings.EVENT_VIEWS_FLUSH_INTERVAL} s)'
+        )
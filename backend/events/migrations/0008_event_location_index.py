@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_eventfilterpreference'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'location_lat', 'location_lng'], name='events_even_status_0e5d54_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0009_eventwaitlistentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='events.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'events_eventrecommendation',
+                'indexes': [models.Index(fields=['user', 'rank'], name='events_even_user_id_6ce99a_idx')],
+                'unique_together': {('user', 'event')},
+            },
+        ),
+    ]
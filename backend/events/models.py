@@ -102,6 +102,8 @@ class Event(models.Model):
             models.Index(fields=['start_date']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            # Bounding-box prefilter of nearby events (see utils.get_nearby_events)
+            models.Index(fields=['status', 'location_lat', 'location_lng']),
         ]
         # Spatial index for location_point (PostGIS)
         # This will be created automatically by PostGIS
@@ -151,6 +153,44 @@ class Participation(models.Model):
         return f"{self.user.username} -> {self.event.title}"
 
 
+class EventWaitlistEntry(models.Model):
+    """Place in the waiting list of a full event (first come, first promoted)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_waitlist_entries', db_index=True)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist_entries', db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'events_eventwaitlistentry'
+        unique_together = ['user', 'event']
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['event', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} waiting for {self.event.title}"
+
+
+class EventRecommendation(models.Model):
+    """Precomputed top-N event ranking of a user (see recommendations.compute_recommendations)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_recommendations')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='recommendations')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    computed_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'events_eventrecommendation'
+        unique_together = ['user', 'event']
+        indexes = [
+            models.Index(fields=['user', 'rank']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.rank} {self.event.title} for {self.user.username}"
+
+
 class EventComment(models.Model):
     """Comments on events."""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
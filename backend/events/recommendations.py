@@ -1,118 +1,294 @@
 """
 Recommendation engine for events.
+compute_recommendations() scores every upcoming event for a batch of users at
+once (NumPy arrays over the candidate events, a fixed number of queries per
+batch) and stores each user's top-N ranking in EventRecommendation. It runs on a
+schedule (celery beat or the compute_recommendations command).
+get_recommended_events() reads the ranking in one query; requests never score
+events themselves. A user with no ranking yet (or whose ranked events were all
+joined or have started) gets popular events while their ranking is computed in
+the background, and a stale ranking is refreshed in the background when celery
+beat is not running. Both are queued at most once per refresh interval.
 """
-from django.db.models import Q, Count, F
-from django.utils import timezone
+import logging
+import threading
+from collections import defaultdict
 from datetime import timedelta
-from users.models import User
-from .models import Event, Participation, EventLike, EventFavorite
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from users.models import User, Follow, Friendship
+from .models import Event, Participation, EventLike, EventFavorite, EventRecommendation
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_PER_USER = 50
+USER_BATCH_SIZE = 500
+
+
+def _encode(values):
+    """Encode values as an integer array (-1 for None). Returns (array, {value: code})."""
+    mapping = {}
+    codes = np.array([
+        -1 if value is None else mapping.setdefault(value, len(mapping))
+        for value in values
+    ], dtype=np.int64)
+    return codes, mapping
+
+
+class CandidateEvents:
+    """Upcoming published events as arrays, with the user-independent part of their score."""
+
+    def __init__(self, now):
+        rows = list(Event.objects.filter(status='published', start_date__gte=now).values_list(
+            'id', 'organizer_id', 'university_id', 'organizer__profile__university_id', 'category__name',
+            'participants_count', 'likes_count', 'views_count', 'is_featured', 'start_date'
+        ))
+        self.ids = [row[0] for row in rows]
+        self.index = {event_id: i for i, event_id in enumerate(self.ids)}
+        self.organizers, self.organizer_codes = _encode([row[1] for row in rows])
+        # Event university, or its organizer's (as before the event field existed)
+        self.universities, self.university_codes = _encode([row[2] or row[3] for row in rows])
+        self.categories, self.category_codes = _encode([(row[4] or '').lower() or None for row in rows])
+
+        participants, likes, views = (np.array([row[i] for row in rows], dtype=float) for i in (5, 6, 7))
+        days_until = np.array([(row[9] - now).days for row in rows], dtype=float)
+        featured = np.array([row[8] for row in rows], dtype=bool)
+        self.base_scores = (
+            np.minimum(participants * 2, 20)
+            + np.minimum(likes, 15)
+            + np.minimum(views / 10, 10)
+            + np.where(featured, 25, 0)
+            + np.where(days_until <= 7, 20, np.where(days_until <= 30, 10, 0))
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _pairs(queryset):
+    """Group (key, value) rows into {key: set(values)}."""
+    grouped = defaultdict(set)
+    for key, value in queryset:
+        grouped[key].add(value)
+    return grouped
+
+
+def _score_batch(candidates, user_ids, now, top_n):
+    """Return {user_id: [(event_id, score), ...]} best first, for a batch of users."""
+    users = list(User.objects.filter(id__in=user_ids).values_list(
+        'id', 'profile__university_id', 'profile__interests'
+    ))
+    # Already joined, liked or favorited
+    excluded = defaultdict(set)
+    for model in (Participation, EventLike, EventFavorite):
+        for user_id, event_ids in _pairs(
+            model.objects.filter(user_id__in=user_ids).values_list('user_id', 'event_id')
+        ).items():
+            excluded[user_id] |= event_ids
+    follows = _pairs(
+        Follow.objects.filter(follower_id__in=user_ids).values_list('follower_id', 'following_id')
+    )
+
+    friends = defaultdict(set)
+    for from_user_id, to_user_id in Friendship.objects.filter(
+        Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids), status='accepted'
+    ).values_list('from_user_id', 'to_user_id'):
+        friends[from_user_id].add(to_user_id)
+        friends[to_user_id].add(from_user_id)
+    friend_events = _pairs(Participation.objects.filter(
+        user_id__in=set().union(*friends.values()) if friends else [],
+        event__status='published',
+        event__start_date__gte=now
+    ).values_list('user_id', 'event_id'))
+
+    rankings = {}
+    for user_id, university_id, interests in users:
+        scores = candidates.base_scores.copy()
+
+        # 1. University match
+        university_code = candidates.university_codes.get(university_id)
+        if university_code is not None:
+            scores[candidates.universities == university_code] += 50
+
+        # 2. Interest match (event category vs profile interests)
+        interests = [
+            interest.lower() for interest in (interests or [])
+            if isinstance(interest, str) and interest
+        ]
+        matched = [
+            code for name, code in candidates.category_codes.items()
+            if any(interest in name or name in interest for interest in interests)
+        ]
+        if matched:
+            scores[np.isin(candidates.categories, matched)] += 30
+
+        # 3. Events from followed users
+        followed = [
+            candidates.organizer_codes[organizer_id]
+            for organizer_id in follows.get(user_id, ())
+            if organizer_id in candidates.organizer_codes
+        ]
+        if followed:
+            scores[np.isin(candidates.organizers, followed)] += 15
+
+        # 4. Friends taking part (10 per friend, up to 30)
+        friend_counts = defaultdict(int)
+        for friend_id in friends.get(user_id, ()):
+            for event_id in friend_events.get(friend_id, ()):
+                friend_counts[event_id] += 1
+        for event_id, count in friend_counts.items():
+            if event_id in candidates.index:
+                scores[candidates.index[event_id]] += min(count * 10, 30)
+
+        # Already joined, liked or favorited, or organized by the user
+        for event_id in excluded.get(user_id, ()):
+            if event_id in candidates.index:
+                scores[candidates.index[event_id]] = -np.inf
+        organizer_code = candidates.organizer_codes.get(user_id)
+        if organizer_code is not None:
+            scores[candidates.organizers == organizer_code] = -np.inf
+
+        k = min(top_n, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k else np.array([], dtype=np.int64)
+        top = top[np.argsort(-scores[top], kind='stable')]
+        rankings[user_id] = [(candidates.ids[i], float(scores[i])) for i in top if np.isfinite(scores[i])]
+    return rankings
+
+
+def compute_recommendations(user_ids=None, top_n=RECOMMENDATIONS_PER_USER, batch_size=USER_BATCH_SIZE):
+    """
+    Score the upcoming events for users (all active users by default) and
+    replace their stored rankings.
+
+    Returns:
+        dict: users ranked, candidate events, rows written
+    """
+    now = timezone.now()
+    candidates = CandidateEvents(now)
+    if user_ids is None:
+        user_ids = list(User.objects.filter(is_active=True).values_list('id', flat=True))
+
+    result = {'users': 0, 'events': len(candidates), 'rows': 0}
+    batch = []
+    for user_id in user_ids:
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            result['rows'] += _store_batch(candidates, batch, now, top_n)
+            result['users'] += len(batch)
+            batch = []
+    if batch:
+        result['rows'] += _store_batch(candidates, batch, now, top_n)
+        result['users'] += len(batch)
+    return result
+
+
+def _store_batch(candidates, user_ids, now, top_n):
+    rankings = _score_batch(candidates, user_ids, now, top_n) if len(candidates) else {}
+    rows = [
+        EventRecommendation(user_id=user_id, event_id=event_id, rank=rank, score=score, computed_at=now)
+        for user_id, ranking in rankings.items()
+        for rank, (event_id, score) in enumerate(ranking, start=1)
+    ]
+    with transaction.atomic():
+        EventRecommendation.objects.filter(user_id__in=user_ids).delete()
+        EventRecommendation.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _ranked_events(user_id, limit):
+    return list(
+        Event.objects.filter(
+            recommendations__user_id=user_id,
+            status='published',
+            start_date__gte=timezone.now()
+        ).exclude(
+            # Joined since the ranking was computed
+            participations__user_id=user_id
+        ).select_related(
+            'organizer__profile__university', 'category', 'university'
+        ).annotate(
+            recommendation_computed_at=F('recommendations__computed_at')
+        ).order_by('recommendations__rank')[:limit]
+    )
+
+
+def _popular_events(user_id, limit):
+    """Fallback while a user has no usable ranking: popular upcoming events."""
+    return list(
+        Event.objects.filter(
+            status='published',
+            start_date__gte=timezone.now()
+        ).exclude(
+            organizer_id=user_id
+        ).exclude(
+            participations__user_id=user_id
+        ).select_related(
+            'organizer__profile__university', 'category', 'university'
+        ).order_by('-is_featured', '-participants_count', '-likes_count', 'start_date')[:limit]
+    )
+
+
+def _refresh_in_thread(user_id):
+    try:
+        compute_recommendations(user_ids=[user_id])
+    except Exception as e:
+        logger.warning(f"Error refreshing recommendations of user {user_id}: {str(e)}")
+    finally:
+        connections.close_all()
+
+
+def schedule_refresh(user_id):
+    """
+    Recompute a user's ranking in the background (Celery task when USE_CELERY
+    is enabled, otherwise a thread), at most once per refresh interval.
+
+    Returns:
+        bool: True if a computation was queued
+    """
+    interval = settings.RECOMMENDATIONS_REFRESH_INTERVAL
+    if not cache.add(f'event_recommendations:refresh:{user_id}', 1, interval):
+        return False
+    if settings.USE_CELERY:
+        from .tasks import compute_recommendations_task
+        compute_recommendations_task.delay(user_ids=[str(user_id)])
+    else:
+        threading.Thread(target=_refresh_in_thread, args=(user_id,), daemon=True).start()
+    return True
 
 
 def get_recommended_events(user_id, limit=10):
     """
-    Get recommended events for a user based on:
+    Get recommended events for a user from the precomputed ranking, based on:
     - User interests
-    - Participation history
-    - Popular events in user's university
-    - Events liked by friends
-    - Trending events
-    
+    - University
+    - Followed organizers
+    - Friends' participation
+    - Popular, featured and upcoming events
+
     Args:
         user_id: User ID
         limit: Maximum number of recommendations
-    
+
     Returns:
         list: Recommended events (empty list if no events found)
     """
-    try:
-        user = User.objects.select_related('profile').get(id=user_id)
-    except User.DoesNotExist:
-        return []
-    
-    # Get user interests (safely handle missing profile)
-    user_interests = []
-    if hasattr(user, 'profile') and user.profile is not None:
-        user_interests = user.profile.interests if user.profile.interests else []
-    
-    # Get user's university (safely handle missing profile)
-    user_university = None
-    if hasattr(user, 'profile') and user.profile is not None:
-        user_university = user.profile.university
-    
-    # Get events user already participated/liked/favorited (to exclude)
-    try:
-        participated_events = Participation.objects.filter(user=user).values_list('event_id', flat=True)
-        liked_events = EventLike.objects.filter(user=user).values_list('event_id', flat=True)
-        favorited_events = EventFavorite.objects.filter(user=user).values_list('event_id', flat=True)
-        excluded_event_ids = set(participated_events) | set(liked_events) | set(favorited_events)
-    except Exception:
-        excluded_event_ids = set()
-    
-    # Base queryset: published events, future events
-    try:
-        base_queryset = Event.objects.filter(
-            status='published',
-            start_date__gte=timezone.now()
-        ).exclude(id__in=excluded_event_ids).select_related('organizer', 'organizer__profile', 'category')
-        
-        # If no events found, return empty list
-        if not base_queryset.exists():
-            return []
-        
-        # Scoring system
-        recommended_events = []
-        
-        # Limit the queryset to avoid processing too many events
-        events_to_score = list(base_queryset[:limit * 3])
-    except Exception:
-        return []
-    
-    for event in events_to_score:
-        score = 0
-        
-        # 1. University match (high weight)
-        if (user_university and 
-            hasattr(event.organizer, 'profile') and 
-            event.organizer.profile is not None and 
-            event.organizer.profile.university is not None and
-            event.organizer.profile.university == user_university):
-            score += 50
-        
-        # 2. Interest match (if event category matches user interests)
-        if user_interests and event.category:
-            # Simple matching (can be improved)
-            category_name_lower = event.category.name.lower()
-            for interest in user_interests:
-                if interest.lower() in category_name_lower or category_name_lower in interest.lower():
-                    score += 30
-                    break
-        
-        # 3. Popularity (participants, likes, views)
-        score += min(event.participants_count * 2, 20)
-        score += min(event.likes_count, 15)
-        score += min(event.views_count / 10, 10)
-        
-        # 4. Featured events
-        if event.is_featured:
-            score += 25
-        
-        # 5. Recent events (prefer upcoming)
-        days_until = (event.start_date - timezone.now()).days
-        if days_until <= 7:
-            score += 20
-        elif days_until <= 30:
-            score += 10
-        
-        # 6. Events from followed users
-        from users.models import Follow
-        if Follow.objects.filter(follower=user, following=event.organizer).exists():
-            score += 15
-        
-        recommended_events.append((event, score))
-    
-    # Sort by score
-    recommended_events.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return top events
-    return [event for event, score in recommended_events[:limit]]
+    events = _ranked_events(user_id, limit)
+    if events:
+        computed_at = events[0].recommendation_computed_at
+    else:
+        computed_at = EventRecommendation.objects.filter(
+            user_id=user_id
+        ).values_list('computed_at', flat=True).first()
 
+    if computed_at is None:
+        # Never ranked (e.g. new user) or nothing left to rank
+        schedule_refresh(user_id)
+    elif not settings.USE_CELERY:
+        # No celery beat: refresh this user's ranking once it is stale
+        if computed_at < timezone.now() - timedelta(seconds=settings.RECOMMENDATIONS_REFRESH_INTERVAL):
+            schedule_refresh(user_id)
+    return events or _popular_events(user_id, limit)
@@ -0,0 +1,142 @@
+"""
+Concurrency-safe seat reservation for events.
+A seat is taken with a single conditional UPDATE (participants_count + 1 only
+while it is below capacity), in the same transaction as the Participation row,
+whose (user, event) unique constraint rejects double joins. When the event is
+full the user joins a FIFO waitlist; every freed seat promotes the oldest entry.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from .models import Event, Participation, EventWaitlistEntry
+
+JOINED = 'joined'
+ALREADY_PARTICIPATING = 'already_participating'
+WAITLISTED = 'waitlisted'
+ALREADY_WAITLISTED = 'already_waitlisted'
+
+
+# Events with a seat left (no capacity means unlimited)
+SEAT_LEFT = Q(capacity__isnull=True) | Q(capacity__lte=0) | Q(participants_count__lt=F('capacity'))
+
+
+def _take_seat(event_id):
+    """Increment participants_count if a seat is left. Returns True on success."""
+    return Event.objects.filter(SEAT_LEFT, id=event_id).update(participants_count=F('participants_count') + 1) == 1
+
+
+def _free_seat(event_id):
+    Event.objects.filter(id=event_id, participants_count__gt=0).update(
+        participants_count=F('participants_count') - 1
+    )
+
+
+def waitlist_position(entry):
+    """1-based position of a waitlist entry."""
+    return EventWaitlistEntry.objects.filter(event_id=entry.event_id).filter(
+        Q(created_at__lt=entry.created_at) | Q(created_at=entry.created_at, id__lt=entry.id)
+    ).count() + 1
+
+
+def reserve_seat(event, user):
+    """
+    Join an event, or its waitlist when it is full.
+
+    Returns:
+        tuple: (status, obj) - (JOINED | ALREADY_PARTICIPATING, Participation)
+        or (WAITLISTED | ALREADY_WAITLISTED, EventWaitlistEntry)
+    """
+    participation = Participation.objects.filter(user=user, event=event).first()
+    if participation:
+        return ALREADY_PARTICIPATING, participation
+
+    try:
+        with transaction.atomic():
+            # Free seats go to the waitlist first (see promote_waitlist)
+            if not EventWaitlistEntry.objects.filter(event=event).exists() and _take_seat(event.id):
+                participation = Participation.objects.create(user=user, event=event)
+                EventWaitlistEntry.objects.filter(user=user, event=event).delete()
+                return JOINED, participation
+    except IntegrityError:
+        # A concurrent request of the same user joined first; the increment was rolled back
+        return ALREADY_PARTICIPATING, Participation.objects.get(user=user, event=event)
+
+    entry, created = EventWaitlistEntry.objects.get_or_create(user=user, event=event)
+    # A seat may have been freed between the full check and the waitlist insert
+    promote_waitlist(event)
+    participation = Participation.objects.filter(user=user, event=event).first()
+    if participation:
+        return JOINED, participation
+    return (WAITLISTED if created else ALREADY_WAITLISTED), entry
+
+
+def release_seat(event, user):
+    """
+    Leave an event (or its waitlist) and give the freed seat to the waitlist.
+
+    Returns:
+        tuple: (left, promoted) - left is 'participation', 'waitlist' or None,
+        promoted the list of users who got a seat
+    """
+    with transaction.atomic():
+        deleted = Participation.objects.filter(user=user, event=event).delete()[1].get(Participation._meta.label, 0)
+        if deleted:
+            _free_seat(event.id)
+    if deleted:
+        left = 'participation'
+    elif EventWaitlistEntry.objects.filter(user=user, event=event).delete()[0]:
+        left = 'waitlist'
+    else:
+        left = None
+    # Always run, so a seat freed by an interrupted call is still handed over
+    return left, promote_waitlist(event)
+
+
+def promote_waitlist(event):
+    """
+    Give the free seats of an event to the oldest waitlist entries.
+
+    Returns:
+        list: Users who got a seat
+    """
+    promoted = []
+    while True:
+        # Unlocked check first, so joins of a full event never wait on the lock below
+        if not Event.objects.filter(SEAT_LEFT, id=event.id).exists():
+            break
+        try:
+            with transaction.atomic():
+                # Lock the event row: promotions of an event run one at a time, so
+                # seats always go to the oldest entry (first come, first served)
+                list(Event.objects.select_for_update().filter(id=event.id).values_list('id', flat=True))
+                entry = EventWaitlistEntry.objects.filter(
+                    event_id=event.id
+                ).select_related('user').order_by('created_at', 'id').first()
+                if entry is None:
+                    break
+                if Participation.objects.filter(user_id=entry.user_id, event_id=event.id).exists():
+                    entry.delete()
+                    continue
+                if not _take_seat(event.id):
+                    break
+                Participation.objects.create(user_id=entry.user_id, event_id=event.id)
+                entry.delete()
+        except IntegrityError:
+            # The user joined concurrently; the entry is dropped on the next pass
+            continue
+        promoted.append(entry.user)
+    return promoted
+
+
+def notify_promoted(event, users):
+    """Tell waitlisted users they got a seat (users returned by release_seat / promote_waitlist)."""
+    from notifications.utils import create_notification
+    for promoted in users:
+        create_notification(
+            recipient=promoted,
+            notification_type='participation',
+            title=f'Place confirmée pour {event.title}',
+            message=f'Une place s\'est libérée : vous participez maintenant à "{event.title}"',
+            related_object_type='event',
+            related_object_id=event.id,
+            use_async=True
+        )
@@ -2,7 +2,7 @@
 Serializers for Events app.
 """
 from rest_framework import serializers
-from .models import Category, Event, Participation, EventComment, EventLike, EventFilterPreference
+from .models import Category, Event, Participation, EventComment, EventLike, EventFavorite, EventWaitlistEntry, EventFilterPreference
 from users.serializers import UserSerializer, UniversityBasicSerializer
 
 
@@ -12,17 +12,74 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+# ?expand= values and the relation each one prefetches
+EVENT_EXPANSIONS = {
+    'organizer': 'organizer__profile__university',
+    'participants': 'participations__user',
+    'likes': 'likes__user',
+    'favorites': 'favorited_by__user',
+    'comments': 'comments__user',
+}
+
+
+def parse_expand(value):
+    """Get the valid EVENT_EXPANSIONS keys of a comma-separated ?expand= value."""
+    if not value:
+        return set()
+    return {key.strip() for key in value.split(',')} & set(EVENT_EXPANSIONS)
+
+
+def get_viewer_state(user, event_ids):
+    """
+    Get which of the given events a user participates in, waits for, liked and favorited.
+    
+    Returns:
+        dict: 'participating', 'waitlisted', 'liked' and 'favorited' sets of event ids (one query each)
+    """
+    return {
+        'participating': set(Participation.objects.filter(user=user, event_id__in=event_ids).values_list('event_id', flat=True)),
+        'waitlisted': set(EventWaitlistEntry.objects.filter(user=user, event_id__in=event_ids).values_list('event_id', flat=True)),
+        'liked': set(EventLike.objects.filter(user=user, event_id__in=event_ids).values_list('event_id', flat=True)),
+        'favorited': set(EventFavorite.objects.filter(user=user, event_id__in=event_ids).values_list('event_id', flat=True)),
+    }
+
+
+class EventListSerializer(serializers.ListSerializer):
+    """
+    Load the viewer state of all the serialized events at once and share it through
+    the context ('viewer_state'), so is_participating / is_waitlisted / is_liked / is_favorited are
+    set lookups instead of one query per event.
+    """
+    
+    def to_representation(self, data):
+        events = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        if events and request and hasattr(request, 'user') and request.user.is_authenticated:
+            state = self.context.setdefault('viewer_state', {
+                'event_ids': set(), 'participating': set(), 'waitlisted': set(), 'liked': set(), 'favorited': set()
+            })
+            missing = {event.id for event in events} - state['event_ids']
+            if missing:
+                for key, event_ids in get_viewer_state(request.user, missing).items():
+                    state[key] |= event_ids
+                state['event_ids'] |= missing
+        return super().to_representation(events)
+
+
 class EventSerializer(serializers.ModelSerializer):
     organizer = serializers.SerializerMethodField()
     category = CategorySerializer(read_only=True)
     university = serializers.SerializerMethodField()
     is_participating = serializers.SerializerMethodField()
+    is_waitlisted = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
+    is_favorited = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Event
         fields = '__all__'
+        list_serializer_class = EventListSerializer
         read_only_fields = ['id', 'organizer', 'views_count', 'participants_count', 
                           'likes_count', 'created_at', 'updated_at']
     
@@ -87,17 +144,90 @@ class EventSerializer(serializers.ModelSerializer):
             logger.warning(f"Error getting image URL for event {obj.id}: {e}")
         return None
     
-    def get_is_participating(self, obj):
+    def _viewer_has(self, obj, key, model):
+        """Look the event up in the batched viewer state, or query it for a single event."""
         request = self.context.get('request')
-        if request and hasattr(request, 'user') and request.user.is_authenticated:
-            return Participation.objects.filter(user=request.user, event=obj).exists()
-        return False
+        if not (request and hasattr(request, 'user') and request.user.is_authenticated):
+            return False
+        state = self.context.get('viewer_state')
+        if state and obj.id in state['event_ids']:
+            return obj.id in state[key]
+        return model.objects.filter(user=request.user, event=obj).exists()
+    
+    def to_representation(self, instance):
+        """Add the heavy relations requested through the 'expand' context."""
+        data = super().to_representation(instance)
+        expand = self.context.get('expand') or ()
+        for key, related_name in (('participants', 'participations'), ('likes', 'likes'), ('favorites', 'favorited_by')):
+            if key in expand:
+                data[key] = [
+                    {
+                        'id': str(item.user.id),
+                        'username': item.user.username,
+                        'first_name': item.user.first_name,
+                        'last_name': item.user.last_name,
+                    }
+                    for item in getattr(instance, related_name).all()
+                ]
+        if 'comments' in expand:
+            data['comments'] = EventCommentSerializer(instance.comments.all(), many=True, context=self.context).data
+        return data
+    
+    def get_is_participating(self, obj):
+        return self._viewer_has(obj, 'participating', Participation)
+    
+    def get_is_waitlisted(self, obj):
+        return self._viewer_has(obj, 'waitlisted', EventWaitlistEntry)
     
     def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user') and request.user.is_authenticated:
-            return EventLike.objects.filter(user=request.user, event=obj).exists()
-        return False
+        return self._viewer_has(obj, 'liked', EventLike)
+    
+    def get_is_favorited(self, obj):
+        return self._viewer_has(obj, 'favorited', EventFavorite)
+
+
+class EventCardSerializer(EventSerializer):
+    """
+    Lean event representation for lists: the columns the event cards need and a
+    basic organizer. The full organizer is only rendered with ?expand=organizer.
+    """
+    
+    # Columns loaded by EventViewSet for lists (see EventViewSet.get_queryset)
+    LOADED_FIELDS = [
+        'title', 'description', 'start_date', 'end_date', 'location', 'location_lat', 'location_lng',
+        'image', 'image_url_legacy', 'capacity', 'price', 'is_free', 'status', 'is_featured',
+        'views_count', 'participants_count', 'likes_count', 'created_at', 'updated_at',
+        'category', 'university', 'organizer__username', 'organizer__first_name',
+        'organizer__last_name', 'organizer__profile__university',
+        'organizer__profile__university__name', 'organizer__profile__university__slug',
+        'organizer__profile__university__short_name', 'organizer__profile__university__logo',
+    ]
+    
+    class Meta(EventSerializer.Meta):
+        fields = [
+            'id', 'title', 'description', 'category', 'university', 'organizer', 'start_date', 'end_date',
+            'location', 'location_lat', 'location_lng', 'image', 'image_url', 'capacity', 'price', 'is_free',
+            'status', 'is_featured', 'views_count', 'participants_count', 'likes_count',
+            'is_participating', 'is_waitlisted', 'is_liked', 'is_favorited', 'created_at', 'updated_at',
+        ]
+    
+    def get_organizer(self, obj):
+        """Get a basic organizer (with university), or the full one with ?expand=organizer."""
+        if 'organizer' in (self.context.get('expand') or ()):
+            return super().get_organizer(obj)
+        if not obj.organizer:
+            return None
+        profile = getattr(obj.organizer, 'profile', None)
+        university = profile.university if profile else None
+        return {
+            'id': str(obj.organizer.id),
+            'username': obj.organizer.username,
+            'first_name': obj.organizer.first_name or '',
+            'last_name': obj.organizer.last_name or '',
+            'profile': {
+                'university': UniversityBasicSerializer(university, context=self.context).data if university else None,
+            },
+        }
 
 
 class ParticipationSerializer(serializers.ModelSerializer):
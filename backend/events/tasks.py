@@ -0,0 +1,18 @@
+"""
+Celery tasks for Events app.
+"""
+from celery import shared_task
+from .recommendations import compute_recommendations
+from .view_counts import flush_event_views
+
+
+@shared_task
+def flush_event_views_task():
+    """Write the buffered event view counts to the database (celery beat)."""
+    return flush_event_views()
+
+
+@shared_task
+def compute_recommendations_task(user_ids=None):
+    """Recompute the stored event rankings of the given users, or of every active user (celery beat)."""
+    return compute_recommendations(user_ids=user_ids)
@@ -0,0 +1,99 @@
+"""
+Tests for the lean event list and ?expand=.
+"""
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User, University
+from events.models import Event, Participation
+
+
+class EventListTestCase(TestCase):
+    """Test the card representation of EventViewSet.list and its opt-in relations."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='student@esmt.sn',
+            username='student',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.user.profile.university = University.objects.create(name='ESMT', slug='esmt', short_name='ESMT')
+        self.user.profile.save()
+        self.participants = [
+            User.objects.create_user(
+                email=f'participant{i}@esmt.sn',
+                username=f'participant{i}',
+                password='Test123!',
+                phone_number=f'+22177765432{i}',
+                is_verified=True,
+                is_active=True
+            )
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _create_events(self, count):
+        events = []
+        for i in range(count):
+            event = Event.objects.create(
+                title=f'Événement {i}',
+                description='Événement de test',
+                organizer=self.user,
+                start_date=timezone.now() + timedelta(days=i + 1),
+                location='Dakar',
+                registration_link='https://esmt.sn/inscription',
+                status='published'
+            )
+            for participant in self.participants:
+                Participation.objects.create(user=participant, event=event)
+            events.append(event)
+        return events
+
+    def _list(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/events/', {'page_size': 50, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], len(queries)
+
+    def test_card_representation(self):
+        """Test that list items carry the card fields and a basic organizer only."""
+        self._create_events(1)
+        results, _ = self._list()
+        item = results[0]
+        self.assertNotIn('registration_link', item)
+        self.assertNotIn('participants', item)
+        self.assertEqual(item['organizer']['username'], 'student')
+        self.assertEqual(item['organizer']['profile']['university']['name'], 'ESMT')
+        self.assertNotIn('email', item['organizer'])
+
+    def test_expand(self):
+        """Test that heavy relations are only rendered when requested."""
+        self._create_events(1)
+        results, _ = self._list(expand='participants,organizer,unknown')
+        item = results[0]
+        self.assertEqual(
+            sorted(participant['username'] for participant in item['participants']),
+            ['participant0', 'participant1', 'participant2']
+        )
+        self.assertEqual(item['organizer']['email'], 'student@esmt.sn')
+        self.assertNotIn('comments', item)
+
+    def test_query_count_independent_of_page_size(self):
+        """Test that a lean list page of 2 or 12 events runs the same number of queries."""
+        self._create_events(2)
+        # The first request of a session also records the user's last activity
+        self._list()
+        results, small_page_queries = self._list()
+        self.assertEqual(len(results), 2)
+
+        self._create_events(10)
+        results, large_page_queries = self._list()
+        self.assertEqual(len(results), 12)
+        self.assertEqual(large_page_queries, small_page_queries)
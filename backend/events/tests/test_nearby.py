@@ -0,0 +1,87 @@
+"""
+Tests for the nearby events search.
+"""
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from events.models import Event
+from events.utils import bounding_box, get_nearby_events, haversine_distance
+
+# Dakar, place de l'Indépendance
+DAKAR = (14.6681, -17.4380)
+
+
+class NearbyEventsTestCase(TestCase):
+    """Test the bounding-box prefilter and NumPy distances of get_nearby_events."""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            email='organizer@esmt.sn',
+            username='organizer',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.events = {
+            name: self._create_event(name, lat, lng)
+            for name, lat, lng in [
+                ('Plateau', 14.6700, -17.4370),
+                ('Fann', 14.6928, -17.4653),
+                ('Almadies', 14.7453, -17.5144),
+                ('Thiès', 14.7910, -16.9359),
+                ('Saint-Louis', 16.0326, -16.4818),
+                ('Sans coordonnées', None, None),
+                ('Origine', 0, 0),
+            ]
+        }
+        self._create_event('Brouillon', 14.6690, -17.4375, status='draft')
+
+    def _create_event(self, title, lat, lng, status='published'):
+        return Event.objects.create(
+            title=title,
+            description='Événement de test',
+            organizer=self.organizer,
+            start_date=timezone.now() + timedelta(days=7),
+            location=title,
+            location_lat=lat,
+            location_lng=lng,
+            status=status
+        )
+
+    def _expected(self, radius_km):
+        expected = []
+        for event in Event.objects.filter(status='published', location_lat__isnull=False).exclude(location_lat=0):
+            distance = haversine_distance(*DAKAR, float(event.location_lat), float(event.location_lng))
+            if distance <= radius_km:
+                expected.append((event.title, round(distance, 2)))
+        return sorted(expected, key=lambda item: item[1])
+
+    def test_matches_full_scan(self):
+        """Test that results, order and distances match a haversine scan of every event."""
+        for radius_km in (1, 10, 75, 500):
+            nearby = get_nearby_events(*DAKAR, radius_km=radius_km)
+            self.assertEqual([(event.title, event.distance_km) for event in nearby], self._expected(radius_km))
+
+        self.assertEqual([event.title for event in get_nearby_events(*DAKAR, radius_km=100, limit=2)], ['Plateau', 'Fann'])
+
+    def test_bounding_box_edges(self):
+        """Test the bounding box across the antimeridian and near the poles."""
+        min_lat, max_lat, lng_ranges = bounding_box(0, 179.99, 10)
+        self.assertEqual(len(lng_ranges), 2)
+        self.assertEqual(lng_ranges[0][1], 180)
+        self.assertEqual(lng_ranges[1][0], -180)
+
+        min_lat, max_lat, lng_ranges = bounding_box(89.99, 0, 10)
+        self.assertEqual((max_lat, lng_ranges), (90, []))
+
+    def test_nearby_endpoint(self):
+        """Test that the endpoint returns the distance of each event."""
+        response = APIClient().get('/api/events/nearby/', {'lat': DAKAR[0], 'lng': DAKAR[1], 'radius': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(event['title'], event['distance_km']) for event in response.data],
+            self._expected(5)
+        )
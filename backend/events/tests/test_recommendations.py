@@ -0,0 +1,127 @@
+"""
+Tests for precomputed event recommendations.
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User, University, Follow, Friendship
+from events.models import Event, Category, Participation, EventRecommendation
+from events.recommendations import compute_recommendations
+
+
+class RecommendationsTestCase(TestCase):
+    """Test batch scoring, stored rankings and the recommended endpoint."""
+
+    def setUp(self):
+        self.university = University.objects.create(name='ESMT', slug='esmt', short_name='ESMT')
+        self.user, self.organizer, self.followed, self.friend = [
+            User.objects.create_user(
+                email=f'{name}@esmt.sn',
+                username=name,
+                password='Test123!',
+                phone_number=f'+22177123456{i}',
+                is_verified=True,
+                is_active=True
+            )
+            for i, name in enumerate(['student', 'organizer', 'followed', 'friend'])
+        ]
+        self.user.profile.university = self.university
+        self.user.profile.interests = ['Sport']
+        self.user.profile.save()
+        Follow.objects.create(follower=self.user, following=self.followed)
+        Friendship.objects.create(from_user=self.friend, to_user=self.user, status='accepted')
+
+        sport = Category.objects.create(name='Sport', slug='sport')
+        self.university_event = self._create_event('Conférence ESMT', university=self.university)
+        self.interest_event = self._create_event('Tournoi de foot', category=sport)
+        self.followed_event = self._create_event('Atelier photo', organizer=self.followed)
+        self.friend_event = self._create_event('Soirée jazz')
+        Participation.objects.create(user=self.friend, event=self.friend_event)
+        self.plain_event = self._create_event('Vente de livres')
+        self.joined_event = self._create_event('Hackathon', university=self.university)
+        Participation.objects.create(user=self.user, event=self.joined_event)
+        self.own_event = self._create_event('Club de lecture', organizer=self.user, university=self.university)
+        self._create_event('Gala passé', start_date=timezone.now() - timedelta(days=1))
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+
+    def _create_event(self, title, organizer=None, start_date=None, **fields):
+        return Event.objects.create(
+            title=title,
+            description='Événement de test',
+            organizer=organizer or self.organizer,
+            start_date=start_date or timezone.now() + timedelta(days=60),
+            location='Dakar',
+            registration_link='https://esmt.sn/inscription',
+            status='published',
+            **fields
+        )
+
+    def _ranking(self, user):
+        return list(EventRecommendation.objects.filter(user=user).order_by('rank').values_list('event_id', flat=True))
+
+    def test_batch_ranking(self):
+        """Test score order, exclusions and replacement of the stored ranking."""
+        result = compute_recommendations(batch_size=2)
+        self.assertEqual(result['users'], 4)
+        self.assertEqual(result['events'], 7)
+
+        self.assertEqual(self._ranking(self.user), [
+            self.university_event.id,
+            self.interest_event.id,
+            self.followed_event.id,
+            self.friend_event.id,
+            self.plain_event.id,
+        ])
+        # Organizers never get their own events
+        self.assertNotIn(self.followed_event.id, self._ranking(self.followed))
+
+        Participation.objects.create(user=self.user, event=self.university_event)
+        compute_recommendations(user_ids=[self.user.id], top_n=2)
+        self.assertEqual(self._ranking(self.user), [self.interest_event.id, self.followed_event.id])
+
+    @override_settings(USE_CELERY=True)
+    def test_recommended_endpoint(self):
+        """Test the popular fallback while a new user is ranked, then the ranking served in one query."""
+        with mock.patch('events.tasks.compute_recommendations_task.delay') as delay:
+            response = self.client.get('/api/events/recommended/', {'limit': 2})
+            self.client.get('/api/events/recommended/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        self.assertNotIn(str(self.own_event.id), [event['id'] for event in response.data])
+        # Queued once, never computed in the request
+        delay.assert_called_once_with(user_ids=[str(self.user.id)])
+        self.assertFalse(EventRecommendation.objects.exists())
+
+        compute_recommendations(user_ids=[self.user.id])
+        response = self.client.get('/api/events/recommended/', {'limit': 3})
+        self.assertEqual(
+            [event['id'] for event in response.data],
+            [str(self.university_event.id), str(self.interest_event.id), str(self.followed_event.id)]
+        )
+
+        # Joined since the ranking was computed: skipped without a recompute
+        Participation.objects.create(user=self.user, event=self.interest_event)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/events/recommended/', {'limit': 3})
+        self.assertEqual(
+            [event['id'] for event in response.data],
+            [str(self.university_event.id), str(self.followed_event.id), str(self.friend_event.id)]
+        )
+        event_queries = [q['sql'] for q in queries.captured_queries if 'events_eventrecommendation' in q['sql']]
+        self.assertEqual(len(event_queries), 1)
+
+    def test_command(self):
+        """Test the compute_recommendations command for a single user."""
+        call_command('compute_recommendations', user='student', top_n=1, stdout=StringIO())
+        self.assertEqual(self._ranking(self.user), [self.university_event.id])
+        self.assertFalse(EventRecommendation.objects.exclude(user=self.user).exists())
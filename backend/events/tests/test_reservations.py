@@ -0,0 +1,189 @@
+"""
+Tests for concurrency-safe seat reservation and the event waitlist.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import OperationalError, connections
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from notifications.models import Notification
+from events.models import Event, Participation, EventWaitlistEntry
+from events.reservations import (
+    reserve_seat, release_seat, JOINED, ALREADY_PARTICIPATING, WAITLISTED, ALREADY_WAITLISTED
+)
+
+
+def create_users(count, prefix='student'):
+    return User.objects.bulk_create([
+        User(
+            email=f'{prefix}{i}@esmt.sn',
+            username=f'{prefix}{i}',
+            phone_number=f'+22177{i:07d}',
+            is_verified=True,
+            is_active=True
+        )
+        for i in range(count)
+    ])
+
+
+def create_event(organizer, capacity):
+    return Event.objects.create(
+        title='Gala ESMT',
+        description='Événement de test',
+        organizer=organizer,
+        start_date=timezone.now() + timedelta(days=7),
+        location='Dakar',
+        status='published',
+        capacity=capacity
+    )
+
+
+class ReservationTestCase(TestCase):
+    """Test the participate / leave endpoints with a waitlist."""
+
+    def setUp(self):
+        self.organizer, self.first, self.second, self.third = create_users(4)
+        self.event = create_event(self.organizer, capacity=1)
+        self.client = APIClient()
+
+    def _participate(self, user):
+        self.client.force_authenticate(user=user)
+        return self.client.post(f'/api/events/{self.event.id}/participate/')
+
+    def _leave(self, user):
+        self.client.force_authenticate(user=user)
+        return self.client.delete(f'/api/events/{self.event.id}/leave/')
+
+    def test_full_event_waitlist_and_promotion(self):
+        """Test that a full event waitlists in order and promotes when a seat is freed."""
+        self.assertEqual(self._participate(self.first).status_code, 201)
+        self.assertEqual(self._participate(self.first).status_code, 200)
+
+        response = self._participate(self.second)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['waitlist_position'], 1)
+        self.assertEqual(self._participate(self.third).data['waitlist_position'], 2)
+        self.assertEqual(self._participate(self.third).status_code, 200)
+
+        self.client.force_authenticate(user=self.second)
+        self.assertTrue(self.client.get(f'/api/events/{self.event.id}/').data['is_waitlisted'])
+
+        self.assertEqual(self._leave(self.first).status_code, 200)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participants_count, 1)
+        self.assertTrue(Participation.objects.filter(user=self.second, event=self.event).exists())
+        self.assertEqual(list(EventWaitlistEntry.objects.values_list('user', flat=True)), [self.third.id])
+
+        self.assertEqual(self._leave(self.third).data['message'], 'Vous avez quitté la liste d\'attente.')
+        self.assertEqual(self._leave(self.third).status_code, 404)
+        self.assertEqual(self._leave(self.second).status_code, 200)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participants_count, 0)
+
+    def test_free_seat_goes_to_oldest_waitlist_entry(self):
+        """Test that a newcomer cannot take a free seat ahead of the waitlist."""
+        # Seat left free by an interrupted promotion
+        EventWaitlistEntry.objects.create(user=self.second, event=self.event)
+        self.assertEqual(reserve_seat(self.event, self.first)[0], WAITLISTED)
+        self.assertTrue(Participation.objects.filter(user=self.second, event=self.event).exists())
+        self.assertEqual(reserve_seat(self.event, self.first)[0], ALREADY_WAITLISTED)
+        self.assertEqual(reserve_seat(self.event, self.second)[0], ALREADY_PARTICIPATING)
+
+        self.assertEqual(release_seat(self.event, self.second), ('participation', [self.first]))
+        self.assertEqual(reserve_seat(self.event, self.first)[0], ALREADY_PARTICIPATING)
+        self.assertFalse(EventWaitlistEntry.objects.exists())
+
+    def test_release_promotes_in_arrival_order(self):
+        """Test that a freed seat goes to the first of two waitlisted users."""
+        self._participate(self.first)
+        self.assertEqual(self._participate(self.second).data['waitlist_position'], 1)
+        self.assertEqual(self._participate(self.third).data['waitlist_position'], 2)
+
+        self.assertEqual(release_seat(self.event, self.first), ('participation', [self.second]))
+        self.assertTrue(Participation.objects.filter(user=self.second, event=self.event).exists())
+        self.assertFalse(Participation.objects.filter(user=self.third, event=self.event).exists())
+        self.assertEqual(self._participate(self.third).data['waitlist_position'], 1)
+
+    def test_clear_history_promotes_waitlist(self):
+        """Test that clearing the calendar history hands the seat over and notifies the promoted user."""
+        self._participate(self.first)
+        self.assertEqual(self._participate(self.second).status_code, 202)
+
+        self.client.force_authenticate(user=self.first)
+        response = self.client.delete('/api/events/calendar/clear_history/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['deleted_count'], 1)
+
+        self.assertFalse(Participation.objects.filter(user=self.first).exists())
+        self.assertTrue(Participation.objects.filter(user=self.second, event=self.event).exists())
+        self.assertFalse(EventWaitlistEntry.objects.exists())
+        self.assertTrue(Notification.objects.filter(
+            recipient=self.second, notification_type='participation', related_object_id=self.event.id
+        ).exists())
+
+
+class ConcurrentReservationTestCase(TransactionTestCase):
+    """Fire hundreds of parallel joins at a capacity-50 event."""
+
+    JOINS = 300
+    CAPACITY = 50
+
+    def _run_concurrently(self, function, users):
+        barrier = threading.Barrier(min(len(users), 32))
+
+        def worker(user):
+            try:
+                barrier.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            try:
+                while True:
+                    try:
+                        return function(self.event, user)
+                    except OperationalError as e:
+                        # SQLite allows one writer at a time; other databases block instead.
+                        # Retrying is safe: reserve_seat / release_seat are idempotent
+                        if 'locked' not in str(e):
+                            raise
+                        time.sleep(0.001)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            return list(executor.map(worker, users))
+
+    def test_parallel_joins_never_oversell(self):
+        """Test that exactly CAPACITY users join and the rest are waitlisted in order."""
+        organizer = create_users(1, prefix='organizer')[0]
+        users = create_users(self.JOINS)
+        self.event = create_event(organizer, capacity=self.CAPACITY)
+
+        # Every user joins once, the first 20 twice
+        results = self._run_concurrently(reserve_seat, users + users[:20])
+        seated = {obj.user_id for result, obj in results if result in (JOINED, ALREADY_PARTICIPATING)}
+        waitlisted = {obj.user_id for result, obj in results if result in (WAITLISTED, ALREADY_WAITLISTED)}
+        self.assertEqual(len(seated), self.CAPACITY)
+        self.assertEqual(len(waitlisted), self.JOINS - self.CAPACITY)
+        self.assertFalse(seated & waitlisted)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participants_count, self.CAPACITY)
+        self.assertEqual(set(Participation.objects.filter(event=self.event).values_list('user_id', flat=True)), seated)
+        self.assertEqual(EventWaitlistEntry.objects.filter(event=self.event).count(), self.JOINS - self.CAPACITY)
+
+        # Parallel leaves promote the oldest waitlist entries, one per freed seat
+        waiting = list(EventWaitlistEntry.objects.filter(event=self.event).values_list('user_id', flat=True))
+        leaving = [p.user for p in Participation.objects.filter(event=self.event).select_related('user')[:20]]
+        self._run_concurrently(release_seat, leaving)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participants_count, self.CAPACITY)
+        self.assertEqual(Participation.objects.filter(event=self.event).count(), self.CAPACITY)
+        self.assertEqual(
+            set(Participation.objects.filter(event=self.event, user_id__in=waiting).values_list('user_id', flat=True)),
+            set(waiting[:20])
+        )
@@ -0,0 +1,131 @@
+"""
+Tests for write-behind event view counting.
+"""
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from events.models import Event
+from events import view_counts
+from events.view_counts import FLUSH_BATCH_SIZE, flush_event_views, record_event_view
+
+
+@override_settings(USE_CELERY=True, EVENT_VIEWS_FLUSH_INTERVAL=60)
+class EventViewCountsTestCase(TestCase):
+    """Test that views are buffered in the cache and flushed in batches."""
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(
+            email='organizer@esmt.sn',
+            username='organizer',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.events = [
+            Event.objects.create(
+                title=f'Événement {i}',
+                description='Événement de test',
+                organizer=self.organizer,
+                start_date=timezone.now() + timedelta(days=7),
+                location='Dakar',
+                status='published',
+                views_count=10
+            )
+            for i in range(3)
+        ]
+        # Start of a 60 s bucket
+        self.now = 60 * 20000.0
+
+    def _at(self, seconds):
+        return mock.patch.object(view_counts.time, 'time', return_value=self.now + seconds)
+
+    def _views(self):
+        return [Event.objects.get(id=event.id).views_count for event in self.events]
+
+    def test_detail_view_is_buffered(self):
+        """Test that the detail endpoint no longer writes views_count."""
+        client = APIClient()
+        with self._at(0):
+            for _ in range(3):
+                response = client.get(f'/api/events/{self.events[0].id}/')
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._views(), [10, 10, 10])
+
+        with self._at(180):
+            self.assertEqual(flush_event_views(), {'buckets': 1, 'events': 1, 'views': 3})
+        self.assertEqual(self._views(), [13, 10, 10])
+
+    def test_flush_skips_open_buckets_and_never_applies_twice(self):
+        """Test that only closed buckets are flushed, each exactly once."""
+        with self._at(0):
+            for event, views in zip(self.events, (5, 1, 2)):
+                for _ in range(views):
+                    record_event_view(event.id)
+        with self._at(60):
+            record_event_view(self.events[0].id)
+
+        with self._at(90):
+            self.assertEqual(flush_event_views(), {'buckets': 0, 'events': 0, 'views': 0})
+        with self._at(150), self.assertNumQueries(1):
+            self.assertEqual(flush_event_views(), {'buckets': 1, 'events': 3, 'views': 8})
+        self.assertEqual(self._views(), [15, 11, 12])
+
+        with self._at(150):
+            self.assertEqual(flush_event_views()['views'], 0)
+        with self._at(200):
+            call_command('flush_event_views', stdout=mock.MagicMock())
+        self.assertEqual(self._views(), [16, 11, 12])
+
+    def test_flush_is_batched(self):
+        """Test that large flushes are split into FLUSH_BATCH_SIZE updates."""
+        with mock.patch.object(view_counts, 'FLUSH_BATCH_SIZE', 2), self.assertNumQueries(2):
+            view_counts.apply_view_counts({str(event.id): 1 for event in self.events})
+        self.assertEqual(self._views(), [11, 11, 11])
+        self.assertGreater(FLUSH_BATCH_SIZE, 2)
+
+
+@override_settings(
+    USE_CELERY=False,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'view_counts_cache'}},
+)
+class DatabaseCacheViewCountsTestCase(TestCase):
+    """Test that views are written directly when cache increments are not atomic."""
+
+    def setUp(self):
+        call_command('createcachetable')
+        organizer = User.objects.create_user(
+            email='organizer@esmt.sn',
+            username='organizer',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.event = Event.objects.create(
+            title='Événement',
+            description='Événement de test',
+            organizer=organizer,
+            start_date=timezone.now() + timedelta(days=7),
+            location='Dakar',
+            status='published',
+            views_count=10
+        )
+
+    def test_views_are_counted_without_the_cache(self):
+        """Test that every view is an F() update and nothing is buffered in cache_table."""
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                record_event_view(self.event.id)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.views_count, 13)
+        self.assertFalse([q for q in queries.captured_queries if 'view_counts_cache' in q['sql']])
+        self.assertEqual(flush_event_views(), {'buckets': 0, 'events': 0, 'views': 0})
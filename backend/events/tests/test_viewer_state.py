@@ -0,0 +1,85 @@
+"""
+Tests for the batched viewer state of EventSerializer.
+"""
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from events.models import Event, Participation, EventLike, EventFavorite
+
+VIEWER_STATE_TABLES = ('"events_participation"', '"events_eventwaitlistentry"', '"events_eventlike"', '"events_eventfavorite"')
+
+
+class ViewerStateTestCase(TestCase):
+    """Test that is_participating / is_liked / is_favorited cost a fixed number of queries per page."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='student@esmt.sn',
+            username='student',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _create_events(self, count):
+        return [
+            Event.objects.create(
+                title=f'Événement {i}',
+                description='Événement de test',
+                organizer=self.user,
+                start_date=timezone.now() + timedelta(days=i + 1),
+                location='Dakar',
+                status='published'
+            )
+            for i in range(count)
+        ]
+
+    def _list(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/events/', {'page_size': 50})
+        self.assertEqual(response.status_code, 200)
+        state_queries = [
+            query for query in queries.captured_queries
+            if any(table in query['sql'] for table in VIEWER_STATE_TABLES)
+        ]
+        return response.data['results'], len(state_queries)
+
+    def test_flags(self):
+        """Test the participation, like and favorite flags of a list page."""
+        events = self._create_events(3)
+        Participation.objects.create(user=self.user, event=events[0])
+        EventLike.objects.create(user=self.user, event=events[1])
+        EventFavorite.objects.create(user=self.user, event=events[1])
+
+        results, _ = self._list()
+        flags = {
+            item['title']: (item['is_participating'], item['is_liked'], item['is_favorited'])
+            for item in results
+        }
+        self.assertEqual(flags, {
+            'Événement 0': (True, False, False),
+            'Événement 1': (False, True, True),
+            'Événement 2': (False, False, False),
+        })
+
+        response = self.client.get(f'/api/events/{events[1].id}/')
+        self.assertTrue(response.data['is_liked'])
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_query_count_independent_of_page_size(self):
+        """Test that a list page of 2 or 12 events runs the same number of viewer state queries."""
+        self._create_events(2)
+        results, small_page_queries = self._list()
+        self.assertEqual(len(results), 2)
+
+        self._create_events(10)
+        results, large_page_queries = self._list()
+        self.assertEqual(len(results), 12)
+        self.assertEqual(large_page_queries, small_page_queries)
@@ -1,9 +1,13 @@
 """
 Utility functions for events app.
 """
-from math import radians, cos, sin, asin, sqrt
+from math import radians, degrees, cos, sin, asin, sqrt
+import numpy as np
 from django.db.models import Q
 
+# Mean radius of earth in kilometers
+EARTH_RADIUS_KM = 6371
+
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """
@@ -25,16 +29,63 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * asin(sqrt(a))
     
-    # Radius of earth in kilometers
-    r = 6371
+    return c * EARTH_RADIUS_KM
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Get the latitude/longitude box enclosing a circle on Earth.
+    
+    Args:
+        latitude: Latitude of center point
+        longitude: Longitude of center point
+        radius_km: Radius in kilometers
+    
+    Returns:
+        tuple: (min_lat, max_lat, lng_ranges) where lng_ranges is a list of
+        (min_lng, max_lng) pairs (two when the box crosses the antimeridian,
+        empty when it spans every longitude, i.e. near a pole)
+    """
+    angular_radius = radius_km / EARTH_RADIUS_KM
+    lat_delta = degrees(angular_radius)
+    min_lat, max_lat = latitude - lat_delta, latitude + lat_delta
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90), min(max_lat, 90), []
+    
+    lng_delta = degrees(asin(min(1, sin(angular_radius) / cos(radians(latitude)))))
+    min_lng, max_lng = longitude - lng_delta, longitude + lng_delta
+    if max_lng - min_lng >= 360:
+        return min_lat, max_lat, []
+    if min_lng < -180:
+        return min_lat, max_lat, [(min_lng + 360, 180), (-180, max_lng)]
+    if max_lng > 180:
+        return min_lat, max_lat, [(min_lng, 180), (-180, max_lng - 360)]
+    return min_lat, max_lat, [(min_lng, max_lng)]
+
+
+def haversine_distances(latitude, longitude, latitudes, longitudes):
+    """
+    Vectorized haversine_distance from one point to arrays of points.
+    
+    Returns:
+        numpy.ndarray: Distances in kilometers
+    """
+    lat1, lon1 = radians(latitude), radians(longitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    lon2 = np.radians(np.asarray(longitudes, dtype=float))
     
-    return c * r
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
 
 
 def get_nearby_events(latitude, longitude, radius_km=10, limit=20):
     """
     Get events within a certain radius from a location.
     
+    Candidates are prefiltered in the database on the bounding box of the circle
+    (served by the status/location_lat/location_lng index); exact distances are
+    then computed with NumPy for those candidates only.
+    
     Args:
         latitude: Latitude of center point
         longitude: Longitude of center point
@@ -42,33 +93,45 @@ def get_nearby_events(latitude, longitude, radius_km=10, limit=20):
         limit: Maximum number of events to return
     
     Returns:
-        QuerySet: Events within the radius, ordered by distance
+        list: Events within the radius, ordered by distance, each with a distance_km attribute
     """
     from .models import Event
     
-    # Get all events with coordinates
-    events = Event.objects.filter(
+    if radius_km <= 0 or limit <= 0:
+        return []
+    
+    min_lat, max_lat, lng_ranges = bounding_box(latitude, longitude, radius_km)
+    candidates = Event.objects.filter(
         status='published',
-        location_lat__isnull=False,
-        location_lng__isnull=False
+        location_lat__gte=min_lat,
+        location_lat__lte=max_lat
     ).exclude(
         location_lat=0,
         location_lng=0
     )
+    if lng_ranges:
+        lng_filter = Q()
+        for min_lng, max_lng in lng_ranges:
+            lng_filter |= Q(location_lng__gte=min_lng, location_lng__lte=max_lng)
+        candidates = candidates.filter(lng_filter)
+    else:
+        candidates = candidates.filter(location_lng__isnull=False)
+    
+    rows = list(candidates.values_list('id', 'location_lat', 'location_lng'))
+    if not rows:
+        return []
     
-    # Calculate distance for each event and filter
+    ids, latitudes, longitudes = zip(*rows)
+    distances = haversine_distances(latitude, longitude, latitudes, longitudes)
+    inside = np.flatnonzero(distances <= radius_km)
+    closest = inside[np.argsort(distances[inside], kind='stable')][:limit]
+    
+    events = Event.objects.select_related('organizer', 'category').in_bulk([ids[i] for i in closest])
     nearby_events = []
-    for event in events:
-        distance = haversine_distance(
-            latitude, longitude,
-            float(event.location_lat), float(event.location_lng)
-        )
-        if distance <= radius_km:
-            event.distance_km = round(distance, 2)
+    for i in closest:
+        event = events.get(ids[i])
+        if event is not None:
+            event.distance_km = round(float(distances[i]), 2)
             nearby_events.append(event)
     
-    # Sort by distance
-    nearby_events.sort(key=lambda x: x.distance_km)
-    
-    return nearby_events[:limit]
-
+    return nearby_events
@@ -0,0 +1,155 @@
+"""
+Write-behind view counting for events.
+A detail view only increments a counter in the cache. Counters live in time
+buckets of EVENT_VIEWS_FLUSH_INTERVAL seconds; the first view of an event in a
+bucket registers the event in that bucket's slot list. flush_event_views() adds
+the counts of closed buckets to Event.views_count in batched F() updates (run by
+celery beat, the flush_event_views command, or in a background thread after a
+view when Celery is not used), so hot events never contend on their row.
+This relies on cache.add / cache.incr being atomic (Redis, Memcached, local
+memory). With other backends (DatabaseCache: incr reads then writes a row, and
+culling may drop pending keys) each view is a direct F() update instead.
+"""
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Value, When
+from core.cache import has_atomic_incr
+
+logger = logging.getLogger(__name__)
+
+# Unflushed buckets older than this are dropped by the cache
+BUCKET_TTL = 24 * 60 * 60
+FLUSH_BATCH_SIZE = 500
+FLUSH_LOCK_KEY = 'event_views:flush_lock'
+FLUSHED_KEY = 'event_views:flushed'
+FLUSH_DUE_KEY = 'event_views:flush_due'
+
+
+def current_bucket(now=None):
+    return int((now or time.time()) // settings.EVENT_VIEWS_FLUSH_INTERVAL)
+
+
+def _count_key(bucket, event_id):
+    return f'event_views:{bucket}:{event_id}'
+
+
+def _slots_key(bucket):
+    return f'event_views:{bucket}:slots'
+
+
+def _slot_key(bucket, slot):
+    return f'event_views:{bucket}:slot:{slot}'
+
+
+def record_event_view(event_id):
+    """Count one view of an event (cache only; flushed to the database later)."""
+    if not has_atomic_incr():
+        from .models import Event
+        Event.objects.filter(pk=event_id).update(views_count=F('views_count') + 1)
+        return
+
+    bucket = current_bucket()
+    key = _count_key(bucket, event_id)
+    try:
+        if cache.add(key, 1, BUCKET_TTL):
+            # First view of the event in this bucket: register it for the flush
+            cache.add(_slots_key(bucket), 0, BUCKET_TTL)
+            slot = cache.incr(_slots_key(bucket))
+            cache.set(_slot_key(bucket, slot), str(event_id), BUCKET_TTL)
+        else:
+            cache.incr(key)
+    except Exception as e:
+        logger.warning(f"Error counting view of event {event_id}: {str(e)}")
+        return
+
+    if not settings.USE_CELERY and cache.add(FLUSH_DUE_KEY, 1, settings.EVENT_VIEWS_FLUSH_INTERVAL):
+        # No celery beat: flush from a request at most once per interval
+        threading.Thread(target=_flush_in_thread, daemon=True).start()
+
+
+def _flush_in_thread():
+    try:
+        flush_event_views()
+    finally:
+        connections.close_all()
+
+
+def _bucket_counts(bucket):
+    """Get {event_id: views} of a bucket."""
+    slots = cache.get(_slots_key(bucket)) or 0
+    if not slots:
+        return {}
+    slot_keys = [_slot_key(bucket, slot) for slot in range(1, slots + 1)]
+    event_ids = [event_id for event_id in cache.get_many(slot_keys).values() if event_id]
+    counts = cache.get_many([_count_key(bucket, event_id) for event_id in event_ids])
+    return {
+        event_id: counts[_count_key(bucket, event_id)]
+        for event_id in event_ids
+        if counts.get(_count_key(bucket, event_id))
+    }
+
+
+def _delete_bucket(bucket, event_ids):
+    slots = cache.get(_slots_key(bucket)) or 0
+    cache.delete_many(
+        [_count_key(bucket, event_id) for event_id in event_ids]
+        + [_slot_key(bucket, slot) for slot in range(1, slots + 1)]
+        + [_slots_key(bucket)]
+    )
+
+
+def apply_view_counts(counts):
+    """Add {event_id: views} to Event.views_count, FLUSH_BATCH_SIZE events per UPDATE."""
+    from .models import Event
+
+    items = list(counts.items())
+    for start in range(0, len(items), FLUSH_BATCH_SIZE):
+        batch = items[start:start + FLUSH_BATCH_SIZE]
+        Event.objects.filter(id__in=[event_id for event_id, _ in batch]).update(
+            views_count=F('views_count') + Case(
+                *[When(id=event_id, then=Value(views)) for event_id, views in batch],
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        )
+
+
+def flush_event_views():
+    """
+    Write the counts of every closed bucket to the database.
+    The bucket in progress and the previous one (views may still be landing in
+    it) are left for the next flush.
+
+    Returns:
+        dict: buckets flushed, events updated and views added (None if another flush is running)
+    """
+    interval = settings.EVENT_VIEWS_FLUSH_INTERVAL
+    if not cache.add(FLUSH_LOCK_KEY, 1, max(interval * 5, 60)):
+        return None
+    try:
+        last_closed = current_bucket() - 2
+        oldest = current_bucket() - BUCKET_TTL // interval
+        flushed = cache.get(FLUSHED_KEY)
+        first = max(flushed + 1, oldest) if flushed is not None else oldest
+
+        result = {'buckets': 0, 'events': 0, 'views': 0}
+        for bucket in range(first, last_closed + 1):
+            counts = _bucket_counts(bucket)
+            if not counts:
+                continue
+            apply_view_counts(counts)
+            # Mark the bucket flushed before dropping it, so it is never applied twice
+            cache.set(FLUSHED_KEY, bucket, None)
+            _delete_bucket(bucket, counts.keys())
+            result['buckets'] += 1
+            result['events'] += len(counts)
+            result['views'] += sum(counts.values())
+        if first <= last_closed:
+            cache.set(FLUSHED_KEY, last_closed, None)
+        return result
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
@@ -12,13 +12,19 @@ from django.db.models import Q, Case, When, F
 from django.utils import timezone
 from .models import Category, Event, Participation, EventComment, EventLike, EventFavorite, EventShare, EventFilterPreference
 from .serializers import (
-    CategorySerializer, EventSerializer, ParticipationSerializer,
-    EventCommentSerializer, EventLikeSerializer, EventFilterPreferenceSerializer
+    CategorySerializer, EventSerializer, EventCardSerializer, ParticipationSerializer,
+    EventCommentSerializer, EventLikeSerializer, EventFilterPreferenceSerializer,
+    EVENT_EXPANSIONS, parse_expand
 )
 from .permissions import IsVerifiedOrReadOnly
 from users.permissions import IsAdminOrClassLeader
 from .analytics import get_event_analytics, get_organizer_dashboard
 from .utils import get_nearby_events
+from .view_counts import record_event_view
+from .reservations import (
+    reserve_seat, release_seat, waitlist_position, notify_promoted,
+    ALREADY_PARTICIPATING, WAITLISTED, ALREADY_WAITLISTED
+)
 from .calendar import generate_user_calendar, get_user_calendar_events
 from .recommendations import get_recommended_events
 from core.cache import invalidate_feed_cache
@@ -40,12 +46,6 @@ class EventViewSet(viewsets.ModelViewSet):
     """ViewSet for events."""
     queryset = Event.objects.filter(status='published').select_related(
         'organizer', 'category'
-    ).prefetch_related(
-        'organizer__profile',
-        'participations__user',
-        'comments__user',
-        'likes__user',
-        'favorited_by__user'
     )
     serializer_class = EventSerializer
     permission_classes = [IsVerifiedOrReadOnly]
@@ -75,15 +75,24 @@ class EventViewSet(viewsets.ModelViewSet):
                     # Anonymous users can only see published events
                     queryset = super().get_queryset()
             
-            queryset = queryset.select_related(
-                'organizer', 'category'
-            ).prefetch_related(
-                'organizer__profile',
-                'participations__user',
-                'comments__user',
-                'likes__user',
-                'favorited_by__user'
-            )
+            expand = self.get_expand()
+            if self.action == 'list':
+                queryset = queryset.select_related(
+                    'organizer__profile__university', 'category', 'university'
+                )
+                if 'organizer' not in expand:
+                    # Lean list: only the columns EventCardSerializer renders
+                    queryset = queryset.only(*EventCardSerializer.LOADED_FIELDS)
+            else:
+                queryset = queryset.select_related(
+                    'organizer', 'category'
+                ).prefetch_related(
+                    'organizer__profile'
+                )
+            
+            # Heavy relations are opt-in (?expand=participants,comments,...)
+            for key in expand:
+                queryset = queryset.prefetch_related(EVENT_EXPANSIONS[key])
             
             # Filters
             university = self.request.query_params.get('university')
@@ -212,10 +221,20 @@ class EventViewSet(viewsets.ModelViewSet):
             # Return a safe queryset with only published events
             return Event.objects.filter(status='published').select_related('organizer', 'category')
     
+    def get_expand(self):
+        """Get the relations requested with ?expand= (see EVENT_EXPANSIONS)."""
+        return parse_expand(self.request.query_params.get('expand'))
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return EventCardSerializer
+        return super().get_serializer_class()
+    
     def get_serializer_context(self):
-        """Add request to serializer context."""
+        """Add request and requested expansions to serializer context."""
         context = super().get_serializer_context()
         context['request'] = self.request
+        context['expand'] = self.get_expand()
         return context
     
     def list(self, request, *args, **kwargs):
@@ -344,9 +363,8 @@ class EventViewSet(viewsets.ModelViewSet):
         try:
             instance = self.get_object()
             
-            # Increment views count
-            instance.views_count += 1
-            instance.save(update_fields=['views_count'])
+            # Count the view (buffered in the cache and flushed in batches when the backend allows it)
+            record_event_view(instance.id)
             
             try:
                 serializer = self.get_serializer(instance)
@@ -479,26 +497,21 @@ class EventViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # 6. Check capacity
-        if event.capacity and event.participants_count >= event.capacity:
-            return Response(
-                {'error': 'Cet événement est complet.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Check if already participating
-        if Participation.objects.filter(user=user, event=event).exists():
+        # 6. Take a seat (atomically, guarded by capacity) or join the waitlist
+        result, reservation = reserve_seat(event, user)
+        if result == ALREADY_PARTICIPATING:
             return Response(
                 {'message': 'Vous participez déjà à cet événement.'},
                 status=status.HTTP_200_OK
             )
+        if result in (WAITLISTED, ALREADY_WAITLISTED):
+            position = waitlist_position(reservation)
+            return Response({
+                'message': f'Cet événement est complet. Vous êtes en position {position} sur la liste d\'attente.',
+                'waitlisted': True,
+                'waitlist_position': position,
+            }, status=status.HTTP_202_ACCEPTED if result == WAITLISTED else status.HTTP_200_OK)
         
-        # Create participation
-        participation = Participation.objects.create(user=user, event=event)
-        
-        # Update participants count
-        event.participants_count += 1
-        event.save(update_fields=['participants_count'])
         invalidate_feed_cache()
         
         # Create notification for event organizer
@@ -515,25 +528,23 @@ class EventViewSet(viewsets.ModelViewSet):
         
         return Response({
             'message': 'Participation enregistrée.',
-            'participation': ParticipationSerializer(participation).data
+            'participation': ParticipationSerializer(reservation).data
         }, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['delete'], permission_classes=[IsAuthenticated])
     def leave(self, request, pk=None):
-        """Leave event."""
+        """Leave event (or its waitlist); the freed seat goes to the waitlist."""
         event = self.get_object()
-        user = request.user
-        
-        try:
-            participation = Participation.objects.get(user=user, event=event)
-            participation.delete()
-            event.participants_count = max(0, event.participants_count - 1)
-            event.save(update_fields=['participants_count'])
-            invalidate_feed_cache()
-            return Response({'message': 'Participation annulée.'}, status=status.HTTP_200_OK)
-        except Participation.DoesNotExist:
+        left, promoted = release_seat(event, request.user)
+        notify_promoted(event, promoted)
+        if left is None:
             return Response({'error': 'Pas de participation trouvée.'}, 
                           status=status.HTTP_404_NOT_FOUND)
+        if left == 'waitlist':
+            return Response({'message': 'Vous avez quitté la liste d\'attente.'}, status=status.HTTP_200_OK)
+        
+        invalidate_feed_cache()
+        return Response({'message': 'Participation annulée.'}, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def like(self, request, pk=None):
@@ -809,19 +820,12 @@ class EventViewSet(viewsets.ModelViewSet):
             if limit < 1 or limit > 50:
                 limit = 10
             
+            # Precomputed ranking, read in one query
             recommended = get_recommended_events(request.user.id, limit=limit)
-            
-            # Ensure we return a list (get_recommended_events may return empty list or QuerySet)
             if not recommended:
                 return Response([], status=status.HTTP_200_OK)
             
-            # Handle both list and QuerySet
-            if isinstance(recommended, list):
-                events_list = recommended
-            else:
-                events_list = list(recommended)
-            
-            serializer = EventSerializer(events_list, many=True, context={'request': request})
+            serializer = EventCardSerializer(recommended, many=True, context=self.get_serializer_context())
             return Response(serializer.data, status=status.HTTP_200_OK)
         except ValueError:
             # Invalid limit parameter
@@ -1000,18 +1004,14 @@ class CalendarViewSet(viewsets.ViewSet):
         user = request.user
         
         try:
-            # Delete all participations
-            participations = Participation.objects.filter(user=user)
-            count = participations.count()
-            
-            # Update event participants_count before deleting
+            # Delete all participations, giving each freed seat to the event's waitlist
+            participations = Participation.objects.filter(user=user).select_related('event')
+            count = 0
             for participation in participations:
-                event = participation.event
-                event.participants_count = max(0, event.participants_count - 1)
-                event.save(update_fields=['participants_count'])
-            
-            # Delete all participations
-            participations.delete()
+                left, promoted = release_seat(participation.event, user)
+                notify_promoted(participation.event, promoted)
+                if left == 'participation':
+                    count += 1
             
             # Also clear favorites and likes if requested
             clear_all = request.query_params.get('clear_all', 'false').lower() == 'true'
@@ -103,6 +103,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         
         # Create group conversation automatically
         from messaging.models import Conversation, Participant
+        from messaging.fanout import update_fanout
         conversation = Conversation.objects.create(
             conversation_type='group',
             name=group.name,
@@ -114,6 +115,7 @@ class GroupViewSet(viewsets.ModelViewSet):
             conversation=conversation,
             user=self.request.user
         )
+        update_fanout(conversation.id)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def join(self, request, pk=None):
@@ -134,6 +136,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         
         # Get or create group conversation
         from messaging.models import Conversation, Participant
+        from messaging.fanout import update_fanout
         conversation, conv_created = Conversation.objects.get_or_create(
             group=group,
             conversation_type='group',
@@ -149,10 +152,13 @@ class GroupViewSet(viewsets.ModelViewSet):
             user=request.user,
             defaults={'is_active': True}
         )
-        if not part_created and not participant.is_active:
+        reactivated = not part_created and not participant.is_active
+        if reactivated:
             participant.is_active = True
             participant.left_at = None
             participant.save()
+        if part_created or reactivated:
+            update_fanout(conversation.id)
         
         if created:
             group.members_count += 1
@@ -184,12 +190,14 @@ class GroupViewSet(viewsets.ModelViewSet):
             
             # Remove user from group conversation
             from messaging.models import Conversation, Participant
+            from messaging.fanout import update_fanout
             try:
                 conversation = Conversation.objects.get(group=group, conversation_type='group')
                 participant = Participant.objects.get(conversation=conversation, user=request.user)
                 participant.is_active = False
                 participant.left_at = timezone.now()
                 participant.save()
+                update_fanout(conversation.id)
             except (Conversation.DoesNotExist, Participant.DoesNotExist):
                 pass  # Conversation might not exist yet
             
@@ -353,6 +361,7 @@ class GroupViewSet(viewsets.ModelViewSet):
             
             # Get or create group conversation and add user as participant
             from messaging.models import Conversation, Participant
+            from messaging.fanout import update_fanout
             conversation, conv_created = Conversation.objects.get_or_create(
                 group=group,
                 conversation_type='group',
@@ -367,10 +376,13 @@ class GroupViewSet(viewsets.ModelViewSet):
                 user=request.user,
                 defaults={'is_active': True}
             )
-            if not part_created and not participant.is_active:
+            reactivated = not part_created and not participant.is_active
+            if reactivated:
                 participant.is_active = True
                 participant.left_at = None
                 participant.save()
+            if part_created or reactivated:
+                update_fanout(conversation.id)
             
             # Create notification for group admins
             from notifications.utils import create_bulk_notifications
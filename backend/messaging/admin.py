@@ -2,7 +2,7 @@
 Admin configuration for messaging app.
 """
 from django.contrib import admin
-from .models import Conversation, Participant, Message
+from .models import Conversation, Participant, Message, Broadcast, Attachment
 
 
 @admin.register(Conversation)
@@ -34,3 +34,21 @@ class MessageAdmin(admin.ModelAdmin):
     def content_preview(self, obj):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content'
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    """Admin interface for Broadcast model."""
+    list_display = ['id', 'sender', 'broadcast_type', 'status', 'processed_count', 'total_recipients', 'created_at']
+    list_filter = ['status', 'broadcast_type', 'created_at']
+    search_fields = ['sender__username', 'content']
+    readonly_fields = ['id', 'created_at', 'started_at', 'completed_at']
+
+
+@admin.register(Attachment)
+class AttachmentAdmin(admin.ModelAdmin):
+    """Admin interface for Attachment model."""
+    list_display = ['id', 'sha256', 'content_type', 'size', 'status', 'uploaded_by', 'created_at']
+    list_filter = ['status', 'content_type', 'created_at']
+    search_fields = ['sha256', 'uploaded_by__username']
+    readonly_fields = ['id', 'sha256', 'created_at', 'processed_at']
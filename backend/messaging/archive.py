@@ -0,0 +1,103 @@
+"""
+Message archival for Messaging app.
+Messages older than a cutoff are moved, in batches, from messaging_message to
+messaging_message_archive (ArchivedMessage), so the hot table and its indexes
+only cover recent history. The latest message of each conversation stays hot,
+which keeps every archived message older than the hot ones of its conversation:
+history pages read the hot table first and continue into the archive.
+"""
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from core.pagination import KeysetPagination
+from .models import Conversation, Message, ArchivedMessage
+
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVED_FIELDS = [
+    'id', 'conversation_id', 'sender_id', 'content', 'message_type', 'attachment_url',
+    'attachment_name', 'attachment_size', 'attachment_id', 'attachment_thumbnail_url', 'is_read',
+    'created_at', 'edited_at', 'deleted_at', 'is_deleted_for_all', 'seq', 'reaction_summary',
+]
+
+
+def archivable_messages(before):
+    """Return the hot messages created before a date that can be archived."""
+    latest = Conversation.objects.filter(last_message__isnull=False).values('last_message_id')
+    return Message.objects.filter(created_at__lt=before).exclude(id__in=latest)
+
+
+def archive_messages(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move the messages created before a date to the archive table.
+    Each batch is copied and deleted in one transaction; reactions and events
+    of archived messages are deleted with them (reaction_summary is kept).
+
+    Returns:
+        int: Number of messages archived
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                archivable_messages(before).order_by('created_at', 'id').values(*ARCHIVED_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            archived_at = timezone.now()
+            ArchivedMessage.objects.bulk_create([ArchivedMessage(archived_at=archived_at, **row) for row in rows])
+            Message.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        total += len(rows)
+    return total
+
+
+def oldest_hot_message_date():
+    """Return the creation date of the oldest message in the hot table."""
+    return Message.objects.aggregate(oldest=Min('created_at'))['oldest']
+
+
+class HotFirstKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination over the hot message table, continued into the archive.
+    The view provides the archived counterpart of its queryset with
+    get_archive_queryset() (None when there is nothing to read there); it is
+    only called when a page runs past the oldest hot message, or when the
+    cursor itself was archived.
+    """
+
+    def find_anchor(self, queryset, cursor):
+        try:
+            return self.get_anchor(queryset, cursor)
+        except NotFound:
+            return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not hasattr(view, 'get_archive_queryset'):
+            return super().paginate_queryset(queryset, request, view=view)
+
+        page_size = self.get_page_size(request)
+        before = request.query_params.get(self.before_query_param)
+        after = request.query_params.get(self.after_query_param)
+        cursor = after if after and not before else before
+        if not cursor or self.find_anchor(queryset, cursor):
+            page = super().paginate_queryset(queryset, request, view=view)
+            if len(page) == page_size or (after and not before):
+                return page
+            # Ran past the oldest hot message: every archived one is older
+            archive = view.get_archive_queryset()
+            if archive is None:
+                return page
+            return page + list(archive.order_by('-created_at', '-id')[:page_size - len(page)])
+
+        # The cursor itself was archived
+        archive = view.get_archive_queryset()
+        if archive is None:
+            raise NotFound(self.invalid_cursor_message)
+        anchor = self.get_anchor(archive, cursor)
+        if before:
+            return list(archive.filter(self.get_keyset_filter(anchor, 'lt')).order_by('-created_at', '-id')[:page_size])
+        page = list(archive.filter(self.get_keyset_filter(anchor, 'gt')).order_by(*self.ordering)[:page_size])
+        if len(page) < page_size:
+            page += list(queryset.order_by(*self.ordering)[:page_size - len(page)])
+        page.reverse()
+        return page
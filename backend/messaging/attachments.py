@@ -0,0 +1,350 @@
+"""
+Attachment storage for Messaging app.
+Uploads are streamed to a staging directory while their SHA-256 is computed,
+either in one request or chunk by chunk through a resumable AttachmentUpload.
+The hash is the storage key, so a file shared into many conversations is
+stored and thumbnailed once. A user only gets an attachment back after
+sending its bytes, or through a message of one of their conversations.
+Small files are processed in the request, larger ones in the background
+(Celery task when USE_CELERY is enabled, otherwise a thread).
+The staging directory is local to the instance (or shared with the workers
+through ATTACHMENT_STAGING_DIR): all chunks of a resumable upload must reach
+the same node. Uploads that stop receiving chunks expire after UPLOAD_EXPIRY
+(cleanup_stale_uploads).
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from .models import Attachment, AttachmentUpload, Message
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTACHMENT_SIZE = 10 * 1024 * 1024  # 10MB
+# Files up to this size are stored in the request, larger ones in the background
+INLINE_MAX_SIZE = 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_EXPIRY = 24 * 60 * 60  # seconds without a chunk before a resumable upload is dropped
+UPLOAD_CLEANUP_INTERVAL = 60 * 60  # seconds between two cleanups started from requests (no celery beat)
+UPLOAD_CLEANUP_DUE_KEY = 'attachment_uploads:cleanup_due'
+THUMBNAIL_SIZE = (320, 320)
+ALLOWED_TYPES = [
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'application/pdf', 'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+]
+EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'application/pdf': '.pdf',
+    'application/msword': '.doc',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
+}
+STORAGE_FOLDER = 'message_attachments'
+
+
+def get_staging_dir():
+    """
+    Return the directory holding files until they are stored.
+    Must be shared with the Celery workers when USE_CELERY is enabled.
+    """
+    path = getattr(settings, 'ATTACHMENT_STAGING_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'campuslink_attachments'
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def upload_staging_path(upload_id):
+    """Return the staged file of a resumable upload."""
+    return os.path.join(get_staging_dir(), f'upload-{upload_id}')
+
+
+def validate_attachment(content_type, size):
+    """Return an error message if a file can't be attached, None otherwise."""
+    if size > MAX_ATTACHMENT_SIZE:
+        return 'Le fichier est trop volumineux (max 10MB).'
+    if content_type not in ALLOWED_TYPES:
+        return 'Type de fichier non autorisé.'
+    return None
+
+
+def stage_file(file):
+    """
+    Copy an uploaded file to the staging directory chunk by chunk, hashing it on the way.
+
+    Returns:
+        tuple: (staged path, sha256 hex digest, size in bytes)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    path = os.path.join(get_staging_dir(), f'file-{uuid.uuid4()}')
+    with open(path, 'wb') as staged:
+        for chunk in file.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+            staged.write(chunk)
+    return path, digest.hexdigest(), size
+
+
+def hash_staged_file(path):
+    """Return the sha256 hex digest of a staged file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as staged:
+        for chunk in iter(lambda: staged.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def append_upload_chunk(upload, offset, chunk):
+    """
+    Append a chunk to a resumable upload if it starts where the upload stopped.
+
+    Returns:
+        bool: False if the offset doesn't match the bytes already received
+    """
+    if offset != upload.received_bytes:
+        return False
+    path = upload_staging_path(upload.id)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as staged:
+        # Drop bytes written by an interrupted request that were never acknowledged
+        staged.truncate(offset)
+        staged.seek(offset)
+        for data in chunk.chunks():
+            staged.write(data)
+        upload.received_bytes = staged.tell()
+    upload.save(update_fields=['received_bytes', 'updated_at'])
+    return True
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def register_staged_file(path, sha256, content_type, size, user):
+    """
+    Turn a staged file into an Attachment, reusing the stored file if the content is already known.
+
+    Returns:
+        tuple: (attachment, created)
+    """
+    attachment = Attachment.objects.filter(sha256=sha256).first()
+    if attachment is None:
+        try:
+            with transaction.atomic():
+                return Attachment.objects.create(
+                    sha256=sha256, content_type=content_type, size=size, staged_path=path, uploaded_by=user
+                ), True
+        except IntegrityError:
+            # Same content registered concurrently
+            attachment = Attachment.objects.get(sha256=sha256)
+
+    if attachment.status == 'failed':
+        # Retry a failed attachment with the new copy
+        if Attachment.objects.filter(id=attachment.id, status='failed').update(
+            status='pending', staged_path=path, error=''
+        ):
+            attachment.refresh_from_db()
+            return attachment, True
+    _discard(path)
+    return attachment, False
+
+
+def record_upload(attachment, user, file_name):
+    """Remember that a user sent the content of an attachment first uploaded by someone else."""
+    if attachment.uploaded_by_id == user.id:
+        return
+    if AttachmentUpload.objects.filter(attachment=attachment, user=user, status='completed').exists():
+        return
+    AttachmentUpload.objects.create(
+        user=user,
+        file_name=file_name[:255],
+        content_type=attachment.content_type,
+        total_size=attachment.size,
+        received_bytes=attachment.size,
+        sha256=attachment.sha256,
+        status='completed',
+        attachment=attachment
+    )
+
+
+def accessible_attachments(user):
+    """
+    Return the attachments a user may see and send: those whose bytes they
+    uploaded, and those shared in a conversation they take part in.
+    """
+    return Attachment.objects.filter(
+        Q(uploaded_by=user)
+        | Q(Exists(AttachmentUpload.objects.filter(attachment=OuterRef('pk'), user=user, status='completed')))
+        | Q(Exists(Message.objects.filter(
+            attachment=OuterRef('pk'),
+            conversation__participants__user=user,
+            conversation__participants__is_active=True
+        )))
+    )
+
+
+def _store(name, content, content_type):
+    """Store a file under a content-hash name and return its URL, skipping files already stored."""
+    cloud_name = getattr(settings, 'CLOUDINARY_STORAGE', {}).get('CLOUD_NAME')
+    if cloud_name:
+        import cloudinary.uploader
+        is_image = content_type.startswith('image/')
+        # Raw files keep their extension in the public id so they download with it
+        public_id = os.path.splitext(name)[0] if is_image else name
+        upload_result = cloudinary.uploader.upload(
+            content,
+            public_id=public_id,
+            overwrite=False,
+            resource_type='image' if is_image else 'raw'
+        )
+        return public_id, upload_result.get('secure_url') or upload_result.get('url')
+    if not default_storage.exists(name):
+        name = default_storage.save(name, content)
+    return name, default_storage.url(name)
+
+
+def make_thumbnail(path):
+    """Return a JPEG thumbnail of an image file."""
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as image:
+        # First frame of animated images, rotated as the camera intended
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        output = BytesIO()
+        image.save(output, format='JPEG', quality=80, optimize=True)
+    return output.getvalue()
+
+
+def process_attachment(attachment_id):
+    """Store a pending attachment and its thumbnail, then fill in the messages already pointing to it."""
+    claimed = Attachment.objects.filter(id=attachment_id, status='pending').update(status='processing')
+    if not claimed:
+        return
+    attachment = Attachment.objects.get(id=attachment_id)
+    try:
+        extension = EXTENSIONS.get(attachment.content_type, '')
+        name = f'{STORAGE_FOLDER}/{attachment.sha256[:2]}/{attachment.sha256}{extension}'
+        with open(attachment.staged_path, 'rb') as staged:
+            attachment.storage_name, attachment.url = _store(name, File(staged), attachment.content_type)
+
+        if attachment.is_image:
+            try:
+                thumbnail = make_thumbnail(attachment.staged_path)
+                _, attachment.thumbnail_url = _store(
+                    f'{STORAGE_FOLDER}/thumbnails/{attachment.sha256}.jpg', ContentFile(thumbnail), 'image/jpeg'
+                )
+            except Exception as e:
+                # The original is still usable without a thumbnail
+                logger.warning(f"Error creating thumbnail for attachment {attachment_id}: {str(e)}")
+
+        staged_path = attachment.staged_path
+        attachment.status = 'ready'
+        attachment.staged_path = ''
+        attachment.processed_at = timezone.now()
+        attachment.save(update_fields=[
+            'storage_name', 'url', 'thumbnail_url', 'status', 'staged_path', 'processed_at'
+        ])
+        Message.objects.filter(attachment=attachment).update(
+            attachment_url=attachment.url,
+            attachment_thumbnail_url=attachment.thumbnail_url or None
+        )
+        _discard(staged_path)
+    except Exception as e:
+        logger.error(f"Error processing attachment {attachment_id}: {str(e)}", exc_info=True)
+        Attachment.objects.filter(id=attachment_id).update(status='failed', staged_path='', error=str(e))
+        _discard(attachment.staged_path)
+
+
+def _process_attachment_in_thread(attachment_id):
+    try:
+        process_attachment(attachment_id)
+    finally:
+        connections.close_all()
+
+
+def dispatch_attachment(attachment):
+    """Process an attachment in the background once the current transaction commits."""
+    attachment_id = str(attachment.id)
+
+    def start():
+        if settings.USE_CELERY:
+            from .tasks import process_attachment_task
+            process_attachment_task.delay(attachment_id)
+        else:
+            threading.Thread(target=_process_attachment_in_thread, args=(attachment_id,), daemon=True).start()
+
+    transaction.on_commit(start)
+
+
+def schedule_attachment(attachment):
+    """Process a new attachment right away if it is small, in the background otherwise."""
+    if attachment.size <= INLINE_MAX_SIZE:
+        process_attachment(attachment.id)
+        attachment.refresh_from_db()
+    else:
+        dispatch_attachment(attachment)
+
+
+def cleanup_stale_uploads(max_age=UPLOAD_EXPIRY):
+    """
+    Delete resumable uploads that received no chunk for max_age seconds, then
+    the staged files older than that which no upload or pending attachment uses
+    (partial uploads, copies left by interrupted requests).
+
+    Returns:
+        dict: uploads and staged files removed
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    uploads, _ = AttachmentUpload.objects.filter(status='uploading', updated_at__lt=cutoff).delete()
+
+    staging_dir = get_staging_dir()
+    in_use = set(Attachment.objects.exclude(staged_path='').values_list('staged_path', flat=True))
+    in_use.update(
+        upload_staging_path(upload_id)
+        for upload_id in AttachmentUpload.objects.filter(status='uploading').values_list('id', flat=True)
+    )
+    files = 0
+    for name in os.listdir(staging_dir):
+        path = os.path.join(staging_dir, name)
+        try:
+            if path in in_use or os.path.getmtime(path) >= cutoff.timestamp():
+                continue
+        except OSError:
+            continue
+        _discard(path)
+        files += 1
+    return {'uploads': uploads, 'files': files}
+
+
+def _cleanup_in_thread():
+    try:
+        cleanup_stale_uploads()
+    except Exception as e:
+        logger.warning(f"Error cleaning up attachment uploads: {str(e)}")
+    finally:
+        connections.close_all()
+
+
+def schedule_upload_cleanup():
+    """Without celery beat, clean up stale uploads from a request at most once per UPLOAD_CLEANUP_INTERVAL."""
+    if not settings.USE_CELERY and cache.add(UPLOAD_CLEANUP_DUE_KEY, 1, UPLOAD_CLEANUP_INTERVAL):
+        threading.Thread(target=_cleanup_in_thread, daemon=True).start()
@@ -0,0 +1,207 @@
+"""
+Bulk delivery of broadcast messages for Messaging app.
+A broadcast is recorded as a Broadcast row and delivered in the background,
+CHUNK_SIZE recipients at a time: existing private conversations are resolved
+by their pair key in one query, missing ones are bulk created, then messages,
+inbox pointers, unread counts and notifications are written with one statement each.
+"""
+import logging
+import threading
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, F, Q, UUIDField, Value, When
+from django.utils import timezone
+from users.models import User
+from notifications.models import Notification
+from .models import Broadcast, Conversation, Participant, Message
+from .utils import invalidate_unread_summaries
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+def get_broadcast_recipients(broadcast):
+    """Return the queryset of students targeted by a broadcast."""
+    sender = broadcast.sender
+    recipients = User.objects.filter(
+        role='student', is_active=True, is_verified=True
+    ).exclude(id=sender.id)
+    profile = getattr(sender, 'profile', None) if sender.role == 'class_leader' else None
+
+    if broadcast.broadcast_type == 'class':
+        # Class leaders always target their own class
+        if profile:
+            if profile.university:
+                recipients = recipients.filter(profile__university=profile.university)
+            if profile.field_of_study:
+                recipients = recipients.filter(profile__field_of_study=profile.field_of_study)
+            if profile.academic_year:
+                recipients = recipients.filter(profile__academic_year=profile.academic_year)
+        else:
+            if broadcast.target_field_of_study:
+                recipients = recipients.filter(profile__field_of_study__icontains=broadcast.target_field_of_study)
+            if broadcast.target_academic_year:
+                recipients = recipients.filter(profile__academic_year__icontains=broadcast.target_academic_year)
+    elif broadcast.broadcast_type == 'university':
+        if profile:
+            if profile.university:
+                recipients = recipients.filter(profile__university=profile.university)
+        elif broadcast.target_university:
+            recipients = recipients.filter(profile__university__icontains=broadcast.target_university)
+    return recipients
+
+
+def deliver_broadcast_chunk(broadcast, user_ids):
+    """
+    Deliver a broadcast to a chunk of recipients in one transaction.
+
+    Returns:
+        int: Number of private conversations created for the chunk
+    """
+    sender = broadcast.sender
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Existing private conversations between the sender and the chunk, by pair key
+        keys = {Conversation.make_private_key(sender.id, user_id): user_id for user_id in user_ids}
+        conversation_ids = {
+            keys[key]: conversation_id
+            for key, conversation_id in Conversation.objects.filter(
+                private_key__in=keys
+            ).values_list('private_key', 'id')
+        }
+
+        missing = [user_id for user_id in user_ids if user_id not in conversation_ids]
+        created = 0
+        if missing:
+            new_conversations = {
+                user_id: Conversation(
+                    conversation_type='private',
+                    created_by=sender,
+                    private_key=Conversation.make_private_key(sender.id, user_id)
+                )
+                for user_id in missing
+            }
+            # Pairs created concurrently (e.g. from create_private) are skipped by the unique key
+            Conversation.objects.bulk_create(new_conversations.values(), ignore_conflicts=True)
+            stored = dict(
+                Conversation.objects.filter(
+                    private_key__in=[conversation.private_key for conversation in new_conversations.values()]
+                ).values_list('private_key', 'id')
+            )
+            participants = []
+            for user_id, conversation in new_conversations.items():
+                conversation_ids[user_id] = stored[conversation.private_key]
+                if stored[conversation.private_key] == conversation.id:
+                    created += 1
+                    participants.append(Participant(conversation=conversation, user=sender))
+                    participants.append(Participant(conversation=conversation, user_id=user_id))
+            Participant.objects.bulk_create(participants)
+
+        # One sequence number per conversation, allocated for the whole chunk at once
+        Conversation.objects.filter(id__in=conversation_ids.values()).update(last_seq=F('last_seq') + 1)
+        seqs = dict(Conversation.objects.filter(id__in=conversation_ids.values()).values_list('id', 'last_seq'))
+
+        messages = Message.objects.bulk_create([
+            Message(
+                conversation_id=conversation_ids[user_id],
+                sender=sender,
+                content=broadcast.content,
+                message_type='text',
+                created_at=now,
+                seq=seqs[conversation_ids[user_id]]
+            )
+            for user_id in user_ids
+        ])
+
+        # Inbox pointers and unread counts, as record_new_message does for a single message
+        # (pointers only move forward, past newer messages written meanwhile)
+        Conversation.objects.filter(
+            id__in=conversation_ids.values()
+        ).filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lte=now)
+        ).update(
+            last_message_id=Case(
+                *[When(id=message.conversation_id, then=Value(message.id)) for message in messages],
+                output_field=UUIDField()
+            ),
+            last_message_at=now
+        )
+        Participant.objects.filter(
+            conversation_id__in=conversation_ids.values(),
+            is_active=True
+        ).exclude(user=sender).update(unread_count=F('unread_count') + 1)
+        invalidate_unread_summaries(user_ids)
+
+        content = broadcast.content
+        notification_message = f'{sender.username} vous a envoyé un message: {content[:100]}{"..." if len(content) > 100 else ""}'
+        Notification.objects.bulk_create([
+            Notification(
+                recipient_id=user_id,
+                notification_type='message_broadcast',
+                title='Nouveau message de votre responsable',
+                message=notification_message,
+                related_object_type='conversation',
+                related_object_id=conversation_ids[user_id],
+                created_at=now
+            )
+            for user_id in user_ids
+        ])
+
+    return created
+
+
+def run_broadcast(broadcast_id):
+    """Deliver a pending broadcast to all its recipients, recording progress as it goes."""
+    claimed = Broadcast.objects.filter(id=broadcast_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        return
+
+    broadcast = Broadcast.objects.select_related('sender', 'sender__profile').get(id=broadcast_id)
+    try:
+        user_ids = list(get_broadcast_recipients(broadcast).order_by('id').values_list('id', flat=True))
+        Broadcast.objects.filter(id=broadcast_id).update(total_recipients=len(user_ids))
+
+        for start in range(0, len(user_ids), CHUNK_SIZE):
+            chunk = user_ids[start:start + CHUNK_SIZE]
+            created = deliver_broadcast_chunk(broadcast, chunk)
+            Broadcast.objects.filter(id=broadcast_id).update(
+                processed_count=F('processed_count') + len(chunk),
+                conversations_created=F('conversations_created') + created
+            )
+
+        Broadcast.objects.filter(id=broadcast_id).update(status='completed', completed_at=timezone.now())
+        logger.info(f"Broadcast {broadcast_id} delivered to {len(user_ids)} users")
+    except Exception as e:
+        logger.error(f"Error delivering broadcast {broadcast_id}: {str(e)}", exc_info=True)
+        Broadcast.objects.filter(id=broadcast_id).update(
+            status='failed', error=str(e), completed_at=timezone.now()
+        )
+
+
+def _run_broadcast_in_thread(broadcast_id):
+    try:
+        run_broadcast(broadcast_id)
+    finally:
+        connections.close_all()
+
+
+def dispatch_broadcast(broadcast):
+    """
+    Start delivering a broadcast once the current transaction commits.
+    Uses the Celery task when USE_CELERY is enabled, otherwise a background thread
+    (Celery is not deployed on Render).
+    """
+    broadcast_id = str(broadcast.id)
+
+    def start():
+        if settings.USE_CELERY:
+            from .tasks import send_broadcast
+            send_broadcast.delay(broadcast_id)
+        else:
+            threading.Thread(target=_run_broadcast_in_thread, args=(broadcast_id,), daemon=True).start()
+
+    transaction.on_commit(start)
@@ -2,23 +2,71 @@
 WebSocket consumers for real-time messaging.
 """
 import json
+import time
 import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
-from django.db import models
-from .models import Conversation, Participant, Message, MessageReaction
-from django.utils import timezone
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from users import presence
+from .models import Participant, Message
+from .utils import (
+    record_new_message, advance_read_watermark, next_seq, get_events_since,
+    add_message_reaction, remove_message_reaction
+)
+from .fanout import fanout_groups, member_group, suppress_ephemeral
 
 User = get_user_model()
 
+TYPING_MIN_INTERVAL = 3  # seconds between two typing transitions broadcast for a user
+TYPING_TIMEOUT = 8  # seconds after the last typing_start before the user is considered idle
 
-class ChatConsumer(AsyncWebsocketConsumer):
+
+class ConversationEventsMixin:
+    """
+    Channel layer handlers shared by the chat and inbox consumers.
+    Events carry a frame pre-encoded by ChatConsumer.broadcast, forwarded as-is.
+    """
+    
+    async def chat_message(self, event):
+        """Send message to WebSocket."""
+        await self.send(text_data=event['frame'])
+    
+    async def typing_indicator(self, event):
+        """Send typing indicator to WebSocket."""
+        # Don't send to the user who is typing
+        if str(self.user.id) != event['user_id']:
+            await self.send(text_data=event['frame'])
+    
+    async def read_receipt(self, event):
+        """Send read receipt to WebSocket."""
+        await self.send(text_data=event['frame'])
+    
+    async def reaction_added(self, event):
+        """Send reaction added to WebSocket."""
+        await self.send(text_data=event['frame'])
+    
+    async def reaction_removed(self, event):
+        """Send reaction removed to WebSocket."""
+        await self.send(text_data=event['frame'])
+
+
+class ChatConsumer(ConversationEventsMixin, AsyncWebsocketConsumer):
     """WebSocket consumer for chat messages."""
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.typing_task = None
+        # Typing state: what the client asked for vs. what was last broadcast
+        self.typing_desired = False
+        self.typing_emitted = False
+        self.typing_last_emit = float('-inf')
+        self.typing_expires_at = 0
+        self.conversation = None
+        self.sender_info = {}
+        self.fanout_shards = 0
+        self.suppress_ephemeral = False
     
     async def connect(self):
         """Handle WebSocket connection."""
@@ -31,13 +79,24 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
         
-        # Check if user is participant
-        is_participant = await self.check_participant()
-        if not is_participant:
+        # Check if user is participant and cache the conversation row for the write path
+        self.conversation = await self.get_conversation()
+        if self.conversation is None:
             await self.close()
             return
         
-        # Join conversation group
+        # Sender fields are constant for the lifetime of the socket
+        self.sender_info = {
+            'sender': self.user.username,
+            'sender_id': str(self.user.id),
+            'sender_first_name': self.user.first_name or '',
+            'sender_last_name': self.user.last_name or '',
+        }
+        
+        await database_sync_to_async(presence.socket_opened)(self.user.id)
+        
+        # Join conversation group (this member's shard in large groups)
+        self.set_fanout(self.conversation.fanout_shards, self.conversation.member_count)
         await self.channel_layer.group_add(
             self.conversation_group_name,
             self.channel_name
@@ -47,9 +106,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
     
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
-        if self.typing_task:
-            self.typing_task.cancel()
+        self.cancel_typing_task()
+        if self.conversation is not None:
+            await database_sync_to_async(presence.socket_closed)(self.user.id)
         try:
+            # Don't leave a stale typing indicator behind
+            if self.typing_emitted:
+                await self.broadcast_typing(False)
             await self.channel_layer.group_discard(
                 self.conversation_group_name,
                 self.channel_name
@@ -71,233 +134,373 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 if content:
                     message = await self.save_message(content)
                     if message:
-                        # Mark as read for sender
-                        await self.mark_message_read(message.id)
+                        # Sending a message ends the typing state
+                        await self.set_typing(False)
                         # Send message to conversation group
-                        await self.channel_layer.group_send(
-                            self.conversation_group_name,
-                            {
-                                'type': 'chat_message',
-                                'message': {
-                                    'id': str(message.id),
-                                    'sender': message.sender.username,
-                                    'sender_id': str(message.sender.id),
-                                    'sender_first_name': message.sender.first_name or '',
-                                    'sender_last_name': message.sender.last_name or '',
-                                    'content': message.content,
-                                    'created_at': message.created_at.isoformat(),
-                                    'is_read': False,
-                                }
+                        await self.broadcast('chat_message', {
+                            'seq': message.seq,
+                            'message': {
+                                'id': str(message.id),
+                                'seq': message.seq,
+                                **self.sender_info,
+                                'content': message.content,
+                                'created_at': message.created_at.isoformat(),
+                                'is_read': False,
                             }
-                        )
+                        })
             
             elif message_type == 'typing_start':
-                # User started typing
-                await self.channel_layer.group_send(
-                    self.conversation_group_name,
-                    {
-                        'type': 'typing_indicator',
-                        'user_id': str(self.user.id),
-                        'username': self.user.username,
-                        'typing': True
-                    }
-                )
+                # User started typing (coalesced, see set_typing)
+                await self.set_typing(True)
             
             elif message_type == 'typing_stop':
-                # User stopped typing
-                await self.channel_layer.group_send(
-                    self.conversation_group_name,
-                    {
-                        'type': 'typing_indicator',
-                        'user_id': str(self.user.id),
-                        'username': self.user.username,
-                        'typing': False
-                    }
-                )
+                # User stopped typing (coalesced, see set_typing)
+                await self.set_typing(False)
+            
+            elif message_type in ('heartbeat', 'ping'):
+                # Keep the user online while the socket is open
+                await database_sync_to_async(presence.touch)(self.user.id)
+                await self.send(text_data=json.dumps({'type': 'pong'}))
             
             elif message_type == 'message_read':
                 # Mark message as read
                 message_id = data.get('message_id')
                 if message_id:
                     await self.mark_message_read(message_id)
-                    await self.channel_layer.group_send(
-                        self.conversation_group_name,
-                        {
-                            'type': 'read_receipt',
-                            'message_id': message_id,
-                            'user_id': str(self.user.id),
-                            'username': self.user.username,
-                        }
-                    )
+                    if self.suppress_ephemeral:
+                        return
+                    await self.broadcast('read_receipt', {
+                        'message_id': message_id,
+                        'user_id': str(self.user.id),
+                        'username': self.user.username,
+                    })
             
             elif message_type == 'add_reaction':
                 # Add reaction to message
                 message_id = data.get('message_id')
                 emoji = data.get('emoji')
                 if message_id and emoji:
-                    reaction = await self.add_reaction(message_id, emoji)
-                    if reaction:
-                        await self.channel_layer.group_send(
-                            self.conversation_group_name,
-                            {
-                                'type': 'reaction_added',
-                                'message_id': message_id,
-                                'reaction': {
-                                    'id': str(reaction.id),
-                                    'user_id': str(self.user.id),
-                                    'username': self.user.username,
-                                    'emoji': emoji,
-                                }
-                            }
-                        )
+                    event = await self.add_reaction(message_id, emoji)
+                    if event:
+                        await self.broadcast('reaction_added', {
+                            'seq': event.seq,
+                            'message_id': message_id,
+                            **event.payload
+                        })
             
             elif message_type == 'remove_reaction':
                 # Remove reaction from message
                 message_id = data.get('message_id')
                 emoji = data.get('emoji')
                 if message_id and emoji:
-                    await self.remove_reaction(message_id, emoji)
-                    await self.channel_layer.group_send(
-                        self.conversation_group_name,
-                        {
-                            'type': 'reaction_removed',
+                    event = await self.remove_reaction(message_id, emoji)
+                    if event:
+                        await self.broadcast('reaction_removed', {
+                            'seq': event.seq,
                             'message_id': message_id,
-                            'user_id': str(self.user.id),
-                            'emoji': emoji,
-                        }
-                    )
+                            **event.payload
+                        })
+            
+            elif message_type == 'resync':
+                # Replay the events missed since the client's last known sequence number
+                try:
+                    since_seq = int(data.get('since_seq', 0))
+                except (TypeError, ValueError):
+                    since_seq = 0
+                events, has_more = await database_sync_to_async(get_events_since)(self.conversation_id, since_seq)
+                await self.send(text_data=json.dumps({
+                    'type': 'resync',
+                    'conversation_id': self.conversation_id,
+                    'events': events,
+                    'has_more': has_more,
+                }))
                     
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
                 'error': 'Invalid JSON'
             }))
     
-    async def chat_message(self, event):
-        """Send message to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'message': event['message']
-        }))
+    async def broadcast(self, event_type, payload, **extra):
+        """
+        Send an event to the conversation group.
+        The outbound WebSocket frame is encoded once here, and recipient handlers
+        forward it unchanged instead of re-encoding it for every member.
+        Extra keys travel next to the frame for recipient-side filtering.
+        Large conversations are sent to all their shard groups in parallel.
+        """
+        event = {
+            'type': event_type,
+            'frame': json.dumps({
+                'type': event_type,
+                'conversation_id': str(self.conversation_id),
+                **payload
+            }),
+            **extra
+        }
+        if not self.fanout_shards:
+            await self.channel_layer.group_send(self.conversation_group_name, event)
+            return
+        await asyncio.gather(*(
+            self.channel_layer.group_send(group, event)
+            for group in fanout_groups(self.conversation_id, self.fanout_shards)
+        ))
     
-    async def typing_indicator(self, event):
-        """Send typing indicator to WebSocket."""
-        # Don't send to the user who is typing
-        if str(self.user.id) != event['user_id']:
-            await self.send(text_data=json.dumps({
-                'type': 'typing_indicator',
-                'user_id': event['user_id'],
-                'username': event['username'],
-                'typing': event['typing']
-            }))
+    def set_fanout(self, shards, member_count):
+        """Apply the fan-out layout of the conversation (see messaging.fanout)."""
+        self.fanout_shards = shards
+        self.suppress_ephemeral = suppress_ephemeral(member_count)
+        self.conversation_group_name = member_group(self.conversation_id, shards, self.user.id)
     
-    async def read_receipt(self, event):
-        """Send read receipt to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'read_receipt',
-            'message_id': event['message_id'],
-            'user_id': event['user_id'],
-            'username': event['username'],
-        }))
+    async def fanout_changed(self, event):
+        """Move to this member's group in the new layout of a conversation that grew."""
+        old_group = self.conversation_group_name
+        self.set_fanout(event['shards'], event['member_count'])
+        if self.conversation_group_name != old_group:
+            await self.channel_layer.group_add(self.conversation_group_name, self.channel_name)
+            await self.channel_layer.group_discard(old_group, self.channel_name)
     
-    async def reaction_added(self, event):
-        """Send reaction added to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'reaction_added',
-            'message_id': event['message_id'],
-            'reaction': event['reaction'],
-        }))
+    async def set_typing(self, typing):
+        """
+        Record the typing state requested by the client.
+        Repeated typing_start frames only extend the expiry, and transitions are
+        broadcast at most once every TYPING_MIN_INTERVAL seconds.
+        """
+        self.cancel_typing_task()
+        # Large groups don't get typing indicators (a pending one is still cleared)
+        self.typing_desired = typing and not self.suppress_ephemeral
+        if typing:
+            self.typing_expires_at = time.monotonic() + TYPING_TIMEOUT
+        await self.sync_typing()
     
-    async def reaction_removed(self, event):
-        """Send reaction removed to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'reaction_removed',
-            'message_id': event['message_id'],
-            'user_id': event['user_id'],
-            'emoji': event['emoji'],
-        }))
+    async def sync_typing(self):
+        """Broadcast the pending typing transition, or schedule it once the rate limit allows."""
+        now = time.monotonic()
+        if self.typing_desired != self.typing_emitted:
+            wait = self.typing_last_emit + TYPING_MIN_INTERVAL - now
+            if wait > 0:
+                self.schedule_typing_task(wait)
+                return
+            await self.broadcast_typing(self.typing_desired)
+        if self.typing_emitted:
+            # Expire automatically if the client never sends typing_stop
+            self.schedule_typing_task(max(0, self.typing_expires_at - now))
+    
+    async def typing_timer(self, delay):
+        """Re-evaluate the typing state after delay seconds."""
+        await asyncio.sleep(delay)
+        self.typing_task = None
+        if self.typing_desired and time.monotonic() >= self.typing_expires_at:
+            self.typing_desired = False
+        await self.sync_typing()
+    
+    def schedule_typing_task(self, delay):
+        self.cancel_typing_task()
+        self.typing_task = asyncio.ensure_future(self.typing_timer(delay))
+    
+    def cancel_typing_task(self):
+        if self.typing_task:
+            self.typing_task.cancel()
+            self.typing_task = None
+    
+    async def broadcast_typing(self, typing):
+        """Send a typing transition to the conversation group."""
+        self.typing_emitted = typing
+        self.typing_last_emit = time.monotonic()
+        await self.broadcast('typing_indicator', {
+            'user_id': str(self.user.id),
+            'username': self.user.username,
+            'typing': typing
+        }, user_id=str(self.user.id))
     
     @database_sync_to_async
-    def check_participant(self):
-        """Check if user is a participant in the conversation."""
+    def get_conversation(self):
+        """Return the conversation if user is an active participant, None otherwise."""
         try:
-            Participant.objects.get(
+            participant = Participant.objects.select_related('conversation').get(
                 conversation_id=self.conversation_id,
                 user=self.user,
                 is_active=True
             )
-            return True
-        except Participant.DoesNotExist:
-            return False
+            return participant.conversation
+        except (Participant.DoesNotExist, ValidationError):
+            return None
     
     @database_sync_to_async
     def save_message(self, content):
-        """Save message to database."""
+        """
+        Save message to database.
+        Insert, conversation bump and unread increments run in one transaction
+        and a single thread hop, using the conversation cached by connect().
+        """
         try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=self.user,
-                content=content
-            )
-            
-            # Update conversation last_message_at
-            conversation.last_message_at = timezone.now()
-            conversation.save(update_fields=['last_message_at'])
-            
-            # Update unread count for other participants
-            Participant.objects.filter(
-                conversation=conversation,
-                is_active=True
-            ).exclude(user=self.user).update(unread_count=models.F('unread_count') + 1)
+            with transaction.atomic():
+                message = Message.objects.create(
+                    conversation=self.conversation,
+                    sender=self.user,
+                    content=content,
+                    seq=next_seq(self.conversation.id)
+                )
+                
+                # Update conversation last message and unread counts of other participants
+                record_new_message(message)
             
             return message
-        except Conversation.DoesNotExist:
+        except IntegrityError:
+            # Conversation was deleted while the socket was open
             return None
     
     @database_sync_to_async
     def mark_message_read(self, message_id):
         """Mark message as read by current user."""
         try:
-            message = Message.objects.get(id=message_id, conversation_id=self.conversation_id)
+            message = Message.objects.only(
+                'id', 'conversation_id', 'sender_id', 'created_at'
+            ).get(id=message_id, conversation_id=self.conversation_id)
             # Don't mark own messages as read
-            if message.sender != self.user:
-                message.read_by.add(self.user)
-                # Update participant last_read_at
-                Participant.objects.filter(
-                    conversation_id=self.conversation_id,
-                    user=self.user,
-                    is_active=True
-                ).update(
-                    last_read_at=timezone.now(),
-                    unread_count=models.F('unread_count') - 1
-                )
-        except Message.DoesNotExist:
+            if message.sender_id != self.user.id:
+                # Advance the participant's read watermark
+                advance_read_watermark(self.user, message)
+        except (Message.DoesNotExist, ValidationError):
             pass
     
     @database_sync_to_async
     def add_reaction(self, message_id, emoji):
-        """Add reaction to message."""
+        """Add reaction to message, returning its event (None if it already existed)."""
         try:
-            message = Message.objects.get(id=message_id, conversation_id=self.conversation_id)
-            reaction, created = MessageReaction.objects.get_or_create(
-                message=message,
-                user=self.user,
-                emoji=emoji
-            )
-            return reaction if created else None
-        except Message.DoesNotExist:
+            message = Message.objects.only('id', 'conversation_id').get(id=message_id, conversation_id=self.conversation_id)
+            return add_message_reaction(message, self.user, emoji)
+        except (Message.DoesNotExist, ValidationError):
             return None
     
     @database_sync_to_async
     def remove_reaction(self, message_id, emoji):
-        """Remove reaction from message."""
+        """Remove reaction from message, returning its event (None if there was none)."""
         try:
-            message = Message.objects.get(id=message_id, conversation_id=self.conversation_id)
-            MessageReaction.objects.filter(
-                message=message,
-                user=self.user,
-                emoji=emoji
-            ).delete()
-        except Message.DoesNotExist:
-            pass
+            message = Message.objects.only('id', 'conversation_id').get(id=message_id, conversation_id=self.conversation_id)
+            return remove_message_reaction(message, self.user, emoji)
+        except (Message.DoesNotExist, ValidationError):
+            return None
+
 
+class InboxConsumer(ConversationEventsMixin, AsyncWebsocketConsumer):
+    """
+    Per-user WebSocket multiplexing live events of all the user's conversations.
+    On connect it subscribes to every active conversation of the user; clients
+    can then send {"type": "subscribe" | "unsubscribe", "conversation_id": ...},
+    and {"type": "heartbeat"} to stay online. Every forwarded frame carries its
+    conversation_id. Sending messages, typing and read receipts still go through
+    ws/chat/<conversation_id>/ or the REST API.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # conversation_id -> channel-layer group joined for it
+        self.subscriptions = {}
+    
+    async def connect(self):
+        """Handle WebSocket connection."""
+        self.user = self.scope['user']
+        
+        # Check if user is authenticated
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+        
+        await database_sync_to_async(presence.socket_opened)(self.user.id)
+        
+        # Join the groups of all active conversations (single query)
+        for conversation_id, shards in await self.get_conversations():
+            await self.subscribe(conversation_id, shards)
+        
+        await self.accept()
+        await self.send(text_data=json.dumps({
+            'type': 'subscriptions',
+            'conversation_ids': sorted(self.subscriptions),
+        }))
+    
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection."""
+        if self.user.is_authenticated:
+            await database_sync_to_async(presence.socket_closed)(self.user.id)
+        try:
+            for group in self.subscriptions.values():
+                await self.channel_layer.group_discard(group, self.channel_name)
+        except Exception as e:
+            # Ignore errors during disconnect (e.g., Redis connection issues)
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.warning(f"Error during WebSocket disconnect: {e}")
+        self.subscriptions.clear()
+    
+    async def receive(self, text_data):
+        """Receive subscription changes from WebSocket."""
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({
+                'error': 'Invalid JSON'
+            }))
+            return
+        
+        message_type = data.get('type')
+        conversation_id = str(data.get('conversation_id') or '')
+        
+        if message_type == 'subscribe' and conversation_id:
+            if conversation_id not in self.subscriptions:
+                conversations = await self.get_conversations(conversation_id)
+                if not conversations:
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'conversation_id': conversation_id,
+                        'error': 'Not a participant in this conversation'
+                    }))
+                    return
+                conversation_id, shards = conversations[0]
+                await self.subscribe(conversation_id, shards)
+            await self.send(text_data=json.dumps({
+                'type': 'subscribed',
+                'conversation_id': conversation_id
+            }))
+        
+        elif message_type == 'unsubscribe' and conversation_id:
+            if conversation_id in self.subscriptions:
+                await self.channel_layer.group_discard(self.subscriptions.pop(conversation_id), self.channel_name)
+            await self.send(text_data=json.dumps({
+                'type': 'unsubscribed',
+                'conversation_id': conversation_id
+            }))
+        
+        elif message_type in ('heartbeat', 'ping'):
+            # Keep the user online while the socket is open
+            await database_sync_to_async(presence.touch)(self.user.id)
+            await self.send(text_data=json.dumps({'type': 'pong'}))
+    
+    async def subscribe(self, conversation_id, shards):
+        """Join the group of a conversation this user belongs to (its shard in large groups)."""
+        group = member_group(conversation_id, shards, self.user.id)
+        await self.channel_layer.group_add(group, self.channel_name)
+        self.subscriptions[conversation_id] = group
+    
+    async def fanout_changed(self, event):
+        """Move to this user's group in the new layout of a conversation that grew."""
+        conversation_id = event['conversation_id']
+        old_group = self.subscriptions.get(conversation_id)
+        if old_group is None:
+            return
+        await self.subscribe(conversation_id, event['shards'])
+        if self.subscriptions[conversation_id] != old_group:
+            await self.channel_layer.group_discard(old_group, self.channel_name)
+    
+    @database_sync_to_async
+    def get_conversations(self, conversation_id=None):
+        """Return (id, fan-out shards) of the user's active conversations, optionally restricted to one."""
+        participants = Participant.objects.filter(user=self.user, is_active=True)
+        if conversation_id:
+            participants = participants.filter(conversation_id=conversation_id)
+        try:
+            return [
+                (str(pk), shards)
+                for pk, shards in participants.values_list('conversation_id', 'conversation__fanout_shards')
+            ]
+        except ValidationError:
+            return []
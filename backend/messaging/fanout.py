@@ -0,0 +1,84 @@
+"""
+Channel-layer fan-out layout of conversations for Messaging app.
+Small conversations use a single chat_<id> group. Once a conversation has more
+than MESSAGING_FANOUT_SHARD_SIZE active members, its members are spread over
+shard groups chat_<id>_<n> (by user id) and events are sent to every shard in
+parallel, so no single group_send has to reach thousands of channels.
+Above MESSAGING_EPHEMERAL_MAX_MEMBERS, typing indicators and read receipts are
+no longer broadcast. The layout only grows, and connected consumers are told
+to move to their new group when it changes.
+"""
+import logging
+import math
+import uuid
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from .models import Conversation, Participant
+
+logger = logging.getLogger(__name__)
+
+
+def shard_count(member_count):
+    """Return the number of shard groups for a conversation size (0: not sharded)."""
+    shard_size = settings.MESSAGING_FANOUT_SHARD_SIZE
+    if not shard_size or member_count <= shard_size:
+        return 0
+    return math.ceil(member_count / shard_size)
+
+
+def suppress_ephemeral(member_count):
+    """Check if typing indicators and read receipts are dropped for a conversation size."""
+    max_members = settings.MESSAGING_EPHEMERAL_MAX_MEMBERS
+    return bool(max_members) and member_count > max_members
+
+
+def fanout_groups(conversation_id, shards):
+    """Return every channel-layer group an event of the conversation must be sent to."""
+    if not shards:
+        return [f'chat_{conversation_id}']
+    return [f'chat_{conversation_id}_{shard}' for shard in range(shards)]
+
+
+def member_group(conversation_id, shards, user_id):
+    """Return the channel-layer group a member's sockets join."""
+    if not shards:
+        return f'chat_{conversation_id}'
+    return f'chat_{conversation_id}_{uuid.UUID(str(user_id)).int % shards}'
+
+
+def update_fanout(conversation_id):
+    """
+    Recount the active members of a conversation and grow its fan-out layout if needed.
+    Call after adding or removing participants; connected consumers are notified
+    once the transaction commits when their group or ephemeral policy changes.
+    """
+    member_count = Participant.objects.filter(conversation_id=conversation_id, is_active=True).count()
+    conversation = Conversation.objects.only('member_count', 'fanout_shards').get(id=conversation_id)
+    old_shards, old_suppressed = conversation.fanout_shards, suppress_ephemeral(conversation.member_count)
+    # Never shrink: consumers connected under the larger layout stay reachable
+    shards = max(old_shards, shard_count(member_count))
+    Conversation.objects.filter(id=conversation_id).update(member_count=member_count, fanout_shards=shards)
+
+    if shards != old_shards or suppress_ephemeral(member_count) != old_suppressed:
+        event = {
+            'type': 'fanout_changed',
+            'conversation_id': str(conversation_id),
+            'shards': shards,
+            'member_count': member_count,
+        }
+        transaction.on_commit(lambda: notify_fanout_changed(fanout_groups(conversation_id, old_shards), event))
+
+
+def notify_fanout_changed(groups, event):
+    """Tell the consumers of the previous layout about the new one."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        for group in groups:
+            async_to_sync(channel_layer.group_send)(group, event)
+    except Exception as e:
+        # Consumers pick up the new layout on their next connection
+        logger.warning(f"Error notifying fan-out change of conversation {event['conversation_id']}: {str(e)}")
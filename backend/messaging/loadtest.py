@@ -0,0 +1,212 @@
+"""
+WebSocket load test for ChatConsumer.
+Simulated clients connect through channels' WebsocketCommunicator, spread over
+group conversations, and drive chat, typing, read and reaction traffic in rounds.
+Every chat message is timed from the send to its delivery to each member
+(the sender's own echo being the round trip), and database queries are counted
+on the thread where database_sync_to_async runs them.
+Used by the benchmark_chat management command and the messaging tests.
+"""
+import asyncio
+import json
+import math
+import time
+import uuid
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import connection
+from users.models import User
+from .models import Conversation, Participant
+from .routing import websocket_urlpatterns
+
+BENCHMARK_PREFIX = 'bench'
+
+
+def percentile(values, fraction):
+    """Return the value at a fraction (0-1) of the sorted values, nearest rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class QueryCounter:
+    """Database execute wrapper counting the queries of the current connection."""
+
+    def __init__(self):
+        self.count = 0
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def start(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+
+    def stop(self):
+        self._wrapper.__exit__(None, None, None)
+
+
+class SimulatedClient:
+    """One WebSocket connection of a benchmark user, reading frames in the background."""
+
+    def __init__(self, load_test, user, conversation_id):
+        self.load_test = load_test
+        self.user = user
+        self.conversation_id = conversation_id
+        self.communicator = None
+        self.reader = None
+        self.last_message_id = None
+        self.reacted_to = None
+
+    async def connect(self):
+        self.communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.conversation_id}/')
+        self.communicator.scope['user'] = self.user
+        connected, _ = await self.communicator.connect()
+        if not connected:
+            raise RuntimeError(f'Connection refused for {self.user.username}')
+        self.reader = asyncio.ensure_future(self.read())
+
+    async def read(self):
+        # Read the output queue directly: a receive_from() timeout would kill the consumer
+        while True:
+            output = await self.communicator.output_queue.get()
+            if output.get('type') != 'websocket.send':
+                continue
+            frame = json.loads(output['text'])
+            self.load_test.frames[frame.get('type')] = self.load_test.frames.get(frame.get('type'), 0) + 1
+            if frame.get('type') == 'chat_message':
+                self.last_message_id = frame['message']['id']
+                self.load_test.delivered(frame['message']['content'], self.user.id)
+
+    async def send(self, frame):
+        await self.communicator.send_to(text_data=json.dumps(frame))
+
+    async def play_round(self, round_number):
+        """Type, send a message, mark the last received one as read and toggle a reaction."""
+        await self.send({'type': 'typing_start'})
+        token = f'{BENCHMARK_PREFIX}:{uuid.uuid4().hex}'
+        self.load_test.sent(token, self.user.id, self.conversation_id)
+        await self.send({'type': 'chat_message', 'content': token})
+        if self.last_message_id:
+            await self.send({'type': 'message_read', 'message_id': self.last_message_id})
+        if self.reacted_to:
+            await self.send({'type': 'remove_reaction', 'message_id': self.reacted_to, 'emoji': '👍'})
+            self.reacted_to = None
+        elif self.last_message_id:
+            self.reacted_to = self.last_message_id
+            await self.send({'type': 'add_reaction', 'message_id': self.reacted_to, 'emoji': '👍'})
+
+    async def close(self):
+        if self.reader:
+            self.reader.cancel()
+        await self.communicator.disconnect()
+
+
+class ChatLoadTest:
+    """
+    Run rounds of traffic from `clients` users spread over `conversations` group
+    conversations. Every client plays one turn per round, concurrently; a round
+    ends once all its chat messages reached every member of their conversation.
+    """
+
+    def __init__(self, clients=20, conversations=4, rounds=10, timeout=30):
+        if conversations < 1 or clients < conversations:
+            raise ValueError('At least one client per conversation is required.')
+        self.clients_count = clients
+        self.conversations_count = conversations
+        self.rounds = rounds
+        self.timeout = timeout
+        self.members = {}
+        self.clients = []
+        self.frames = {}
+        self.pending = {}
+        self.round_trip = []
+        self.delivery = []
+        self.all_delivered = asyncio.Event()
+
+    def setup(self):
+        """Create the benchmark users and conversations (synchronous, run before run())."""
+        run_id = uuid.uuid4().hex[:8]
+        run_number = int(run_id[:4], 16) % 10000
+        users = User.objects.bulk_create([
+            User(
+                email=f'{BENCHMARK_PREFIX}{run_id}{i}@campuslink.test',
+                username=f'{BENCHMARK_PREFIX}{run_id}{i}',
+                phone_number=f'+2217{run_number:04d}{i:05d}',
+                first_name=f'Client {i}',
+                is_verified=True,
+                is_active=True
+            )
+            for i in range(self.clients_count)
+        ])
+        conversations = Conversation.objects.bulk_create([
+            Conversation(conversation_type='group', name=f'Benchmark {run_id} #{i}', created_by=users[0])
+            for i in range(self.conversations_count)
+        ])
+        participants = []
+        for i, user in enumerate(users):
+            conversation = conversations[i % self.conversations_count]
+            participants.append(Participant(conversation=conversation, user=user))
+            self.members.setdefault(conversation.id, set()).add(user.id)
+            self.clients.append(SimulatedClient(self, user, conversation.id))
+        Participant.objects.bulk_create(participants)
+
+    def sent(self, token, user_id, conversation_id):
+        self.pending[token] = (time.perf_counter(), user_id, set(self.members[conversation_id]))
+
+    def delivered(self, token, user_id):
+        if token not in self.pending:
+            return
+        sent_at, sender_id, waiting = self.pending[token]
+        latency = (time.perf_counter() - sent_at) * 1000
+        (self.round_trip if user_id == sender_id else self.delivery).append(latency)
+        waiting.discard(user_id)
+        if not waiting:
+            del self.pending[token]
+            if not self.pending:
+                self.all_delivered.set()
+
+    async def run(self):
+        """
+        Connect the clients, play the rounds and return the measurements.
+
+        Returns:
+            dict: messages, elapsed seconds, messages_per_second, queries,
+            queries_per_message, round_trip and delivery p50/p99 in milliseconds, frames by type
+        """
+        for client in self.clients:
+            await client.connect()
+
+        counter = QueryCounter()
+        await database_sync_to_async(counter.start)()
+        start = time.perf_counter()
+        try:
+            for round_number in range(self.rounds):
+                self.all_delivered.clear()
+                await asyncio.gather(*(client.play_round(round_number) for client in self.clients))
+                await asyncio.wait_for(self.all_delivered.wait(), self.timeout)
+            elapsed = time.perf_counter() - start
+        finally:
+            await database_sync_to_async(counter.stop)()
+            for client in self.clients:
+                await client.close()
+
+        messages = self.clients_count * self.rounds
+        return {
+            'clients': self.clients_count,
+            'conversations': self.conversations_count,
+            'messages': messages,
+            'elapsed': elapsed,
+            'messages_per_second': messages / elapsed if elapsed else 0.0,
+            'queries': counter.count,
+            'queries_per_message': counter.count / messages if messages else 0.0,
+            'round_trip_p50': percentile(self.round_trip, 0.5),
+            'round_trip_p99': percentile(self.round_trip, 0.99),
+            'delivery_p50': percentile(self.delivery, 0.5),
+            'delivery_p99': percentile(self.delivery, 0.99),
+            'frames': dict(self.frames),
+        }
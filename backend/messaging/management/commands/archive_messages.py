@@ -0,0 +1,79 @@
+"""
+Commande Django pour archiver les anciens messages, mois par mois
+Usage: python manage.py archive_messages --keep-months 12
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from messaging.archive import ARCHIVE_BATCH_SIZE, archivable_messages, archive_messages, oldest_hot_message_date
+
+
+def add_months(date, months):
+    """Return the first day of the month `months` after the month of date."""
+    month = date.month - 1 + months
+    return date.replace(year=date.year + month // 12, month=month % 12 + 1, day=1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Déplace les messages plus anciens que --keep-months vers la table d\'archive '
+        '(messaging_message_archive), un mois à la fois, en commençant par le plus ancien'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=12,
+            help='Nombre de mois (en plus du mois courant) conservés dans la table des messages (défaut: 12)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ARCHIVE_BATCH_SIZE,
+            help=f'Nombre de messages déplacés par transaction (défaut: {ARCHIVE_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Affiche le nombre de messages à archiver par mois sans les déplacer',
+        )
+
+    def handle(self, *args, **options):
+        if options['keep_months'] < 1:
+            raise CommandError('--keep-months doit être au moins 1')
+        dry_run = options['dry_run']
+
+        now = timezone.localtime()
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        cutoff = add_months(month_start, -options['keep_months'])
+
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS('ARCHIVAGE DES MESSAGES'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(f'Messages antérieurs au {cutoff:%d/%m/%Y} (le dernier message de chaque conversation est conservé)')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Mode simulation: aucun message ne sera déplacé'))
+        self.stdout.write('')
+
+        oldest = oldest_hot_message_date()
+        if oldest is None or oldest >= cutoff:
+            self.stdout.write('Aucun message à archiver.')
+            return
+
+        total = 0
+        month = timezone.localtime(oldest).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while month < cutoff:
+            month_end = min(add_months(month, 1), cutoff)
+            if dry_run:
+                count = archivable_messages(month_end).filter(created_at__gte=month).count()
+            else:
+                count = archive_messages(month_end, batch_size=options['batch_size'])
+            self.stdout.write(f'   {month:%Y-%m}: {count} message(s)')
+            total += count
+            month = month_end
+
+        self.stdout.write('')
+        verb = 'à archiver' if dry_run else 'archivé(s)'
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} message(s) {verb}'))
@@ -0,0 +1,130 @@
+"""
+Commande Django pour mesurer la charge supportée par le ChatConsumer WebSocket
+Usage: python manage.py benchmark_chat --clients 50 --conversations 5 --rounds 20
+"""
+
+import json
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from messaging.loadtest import ChatLoadTest
+
+
+class Command(BaseCommand):
+    help = (
+        'Simule N clients WebSocket répartis sur M conversations (messages, saisie, lectures, réactions) '
+        'et mesure la latence p50/p99, le débit et les requêtes SQL par message. '
+        'Les données sont créées dans une base de test, détruite à la fin.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=20,
+            help='Nombre de clients WebSocket simulés (défaut: 20)',
+        )
+        parser.add_argument(
+            '--conversations',
+            type=int,
+            default=4,
+            help='Nombre de conversations de groupe entre lesquelles répartir les clients (défaut: 4)',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=10,
+            help='Nombre de tours; à chaque tour chaque client envoie un message (défaut: 10)',
+        )
+        parser.add_argument(
+            '--use-configured-layer',
+            action='store_true',
+            help='Utilise le channel layer configuré (ex: Redis) au lieu d\'InMemoryChannelLayer',
+        )
+        parser.add_argument(
+            '--max-queries-per-message',
+            type=float,
+            help='Échoue si le nombre de requêtes SQL par message dépasse cette valeur',
+        )
+        parser.add_argument(
+            '--max-p99',
+            type=float,
+            help='Échoue si la latence p99 de livraison (ms) dépasse cette valeur',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Affiche les résultats en JSON (pour comparer deux exécutions)',
+        )
+
+    def handle(self, *args, **options):
+        if options['conversations'] < 1 or options['clients'] < options['conversations']:
+            raise CommandError('Il faut au moins un client par conversation')
+        if options['rounds'] < 1:
+            raise CommandError('--rounds doit être au moins 1')
+
+        layers = None if options['use_configured_layer'] else {
+            'default': {
+                'BACKEND': 'channels.layers.InMemoryChannelLayer',
+                'CONFIG': {'capacity': 1000},
+            }
+        }
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            load_test = ChatLoadTest(
+                clients=options['clients'],
+                conversations=options['conversations'],
+                rounds=options['rounds'],
+            )
+            load_test.setup()
+            if layers:
+                with override_settings(CHANNEL_LAYERS=layers):
+                    results = async_to_sync(load_test.run)()
+            else:
+                results = async_to_sync(load_test.run)()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.report(results)
+
+        if options['max_queries_per_message'] is not None and results['queries_per_message'] > options['max_queries_per_message']:
+            raise CommandError(
+                f'{results["queries_per_message"]:.2f} requêtes par message '
+                f'(maximum: {options["max_queries_per_message"]})'
+            )
+        if options['max_p99'] is not None and results['delivery_p99'] > options['max_p99']:
+            raise CommandError(f'Latence p99 de {results["delivery_p99"]:.1f} ms (maximum: {options["max_p99"]} ms)')
+
+    def report(self, results):
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS('BENCHMARK CHARGE WEBSOCKET (ChatConsumer)'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(
+            f'{results["clients"]} clients, {results["conversations"]} conversations, '
+            f'{results["messages"]} messages en {results["elapsed"]:.2f} s'
+        )
+        self.stdout.write('')
+        self.stdout.write(f'   Débit:                        {results["messages_per_second"]:.1f} messages/s')
+        self.stdout.write(
+            f'   Aller-retour (expéditeur):    p50 {results["round_trip_p50"]:.1f} ms | '
+            f'p99 {results["round_trip_p99"]:.1f} ms'
+        )
+        self.stdout.write(
+            f'   Livraison (autres membres):   p50 {results["delivery_p50"]:.1f} ms | '
+            f'p99 {results["delivery_p99"]:.1f} ms'
+        )
+        self.stdout.write(
+            f'   Requêtes SQL:                 {results["queries"]} '
+            f'({results["queries_per_message"]:.2f} par message, lectures et réactions comprises)'
+        )
+        self.stdout.write('')
+        self.stdout.write('   Trames reçues par type:')
+        for frame_type, count in sorted(results['frames'].items(), key=lambda item: str(item[0])):
+            self.stdout.write(f'      {frame_type}: {count}')
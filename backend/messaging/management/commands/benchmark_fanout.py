@@ -0,0 +1,137 @@
+"""
+Commande Django pour mesurer le coût de diffusion (fan-out) des messages WebSocket
+Usage: python manage.py benchmark_fanout --sizes 10,100,500
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from types import SimpleNamespace
+
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+
+from messaging.consumers import ChatConsumer
+
+
+class Command(BaseCommand):
+    help = 'Mesure le coût de diffusion par membre d\'un message de chat selon la taille du groupe'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default='10,50,100,500',
+            help='Tailles de groupe à mesurer, séparées par des virgules (défaut: 10,50,100,500)',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=20,
+            help='Nombre de messages envoyés par taille de groupe (défaut: 20)',
+        )
+        parser.add_argument(
+            '--content-size',
+            type=int,
+            default=200,
+            help='Taille du contenu des messages en caractères (défaut: 200)',
+        )
+        parser.add_argument(
+            '--use-configured-layer',
+            action='store_true',
+            help='Utilise le channel layer configuré (ex: Redis) au lieu d\'InMemoryChannelLayer',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes doit être une liste d\'entiers, ex: 10,100,500')
+
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS('BENCHMARK FAN-OUT WEBSOCKET'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write('Coûts en µs par membre et par message')
+        self.stdout.write(f'{"Membres":>8} | {"Channel layer":>14} | {"Encodé une fois":>16} | {"Encodé par membre":>18}')
+        self.stdout.write('-' * 70)
+
+        for size in sizes:
+            layer_time, encoded_once, encoded_per_member = asyncio.run(
+                self.measure(size, options['rounds'], options['content_size'], options['use_configured_layer'])
+            )
+            self.stdout.write(
+                f'{size:>8} | {layer_time:>14.2f} | {encoded_once:>16.2f} | {encoded_per_member:>18.2f}'
+            )
+
+    def get_layer(self, use_configured_layer):
+        if use_configured_layer:
+            return get_channel_layer()
+        return InMemoryChannelLayer(capacity=1000)
+
+    async def measure(self, size, rounds, content_size, use_configured_layer):
+        """
+        Return the fan-out cost per member in microseconds: channel layer delivery,
+        then recipient handlers with the pre-encoded frame and with per-member encoding.
+        """
+        layer = self.get_layer(use_configured_layer)
+        group = f'chat_benchmark_{uuid.uuid4().hex}'
+
+        # Recipient consumers only need a user and a send() sink
+        recipients = []
+        for _ in range(size):
+            consumer = ChatConsumer()
+            consumer.user = SimpleNamespace(id=uuid.uuid4())
+            consumer.sent_bytes = 0
+
+            async def send(text_data=None, consumer=consumer):
+                consumer.sent_bytes += len(text_data)
+
+            consumer.send = send
+            consumer.channel_name = await layer.new_channel()
+            await layer.group_add(group, consumer.channel_name)
+            recipients.append(consumer)
+
+        sender = ChatConsumer()
+        sender.channel_layer = layer
+        sender.conversation_group_name = group
+
+        def payload(i):
+            return {
+                'message': {
+                    'id': str(uuid.uuid4()),
+                    'sender': 'benchmark',
+                    'sender_id': str(uuid.uuid4()),
+                    'sender_first_name': '',
+                    'sender_last_name': '',
+                    'content': 'x' * content_size,
+                    'created_at': f'2026-01-01T00:00:{i % 60:02d}+00:00',
+                    'is_read': False,
+                }
+            }
+
+        layer_time = encoded_once = encoded_per_member = 0.0
+        for i in range(rounds):
+            # Current path: frame encoded once by the sender, forwarded as-is
+            start = time.perf_counter()
+            await sender.broadcast('chat_message', payload(i))
+            events = [await layer.receive(consumer.channel_name) for consumer in recipients]
+            layer_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for consumer, event in zip(recipients, events):
+                await consumer.chat_message(event)
+            encoded_once += time.perf_counter() - start
+
+            # Previous path: every recipient re-encodes the event
+            legacy_event = {'type': 'chat_message', **payload(i)}
+            start = time.perf_counter()
+            for consumer in recipients:
+                await consumer.send(text_data=json.dumps({'type': 'chat_message', 'message': legacy_event['message']}))
+            encoded_per_member += time.perf_counter() - start
+
+        for consumer in recipients:
+            await layer.group_discard(group, consumer.channel_name)
+
+        per_member = 1_000_000 / (rounds * size)
+        return layer_time * per_member, encoded_once * per_member, encoded_per_member * per_member
@@ -0,0 +1,36 @@
+"""
+Commande Django pour supprimer les uploads de pièces jointes abandonnés et leurs fichiers temporaires
+Usage: python manage.py cleanup_attachment_uploads (ex: toutes les heures via cron, sans celery beat)
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from messaging.attachments import UPLOAD_EXPIRY, cleanup_stale_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        'Supprime les uploads reprenables sans nouveau morceau depuis --max-age-hours, '
+        'ainsi que les fichiers temporaires qui ne sont plus utilisés'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-hours',
+            type=int,
+            default=UPLOAD_EXPIRY // 3600,
+            help=f'Âge (en heures) au-delà duquel un upload est abandonné (défaut: {UPLOAD_EXPIRY // 3600})',
+        )
+
+    def handle(self, *args, **options):
+        if options['max_age_hours'] < 1:
+            raise CommandError('--max-age-hours doit être au moins 1')
+
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS('NETTOYAGE DES UPLOADS DE PIÈCES JOINTES'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+
+        result = cleanup_stale_uploads(max_age=options['max_age_hours'] * 3600)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result["uploads"]} upload(s) et {result["files"]} fichier(s) temporaire(s) supprimé(s)'
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_last_message(apps, schema_editor):
+    """Point existing conversations at their latest non-deleted message."""
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+    for conversation in Conversation.objects.all().only('id'):
+        last_message = Message.objects.filter(
+            conversation_id=conversation.id,
+            deleted_at__isnull=True,
+            is_deleted_for_all=False
+        ).order_by('-created_at').only('id').first()
+        if last_message:
+            Conversation.objects.filter(id=conversation.id).update(last_message=last_message)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0006_message_attachment_name_message_attachment_size_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, help_text='Latest non-deleted message, used to render the inbox without loading history', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message'),
+        ),
+        migrations.RunPython(populate_last_message, migrations.RunPython.noop),
+    ]
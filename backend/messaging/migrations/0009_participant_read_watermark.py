@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_read_watermarks(apps, schema_editor):
+    """
+    Convert read_by rows into per-participant watermarks.
+    The watermark is the latest message the participant has read (or received
+    before their last_read_at), and unread counts are recomputed from it.
+    """
+    Participant = apps.get_model('messaging', 'Participant')
+    Message = apps.get_model('messaging', 'Message')
+    for participant in Participant.objects.all():
+        messages = Message.objects.filter(conversation_id=participant.conversation_id)
+        last_read = messages.filter(read_by=participant.user_id).order_by('-created_at').first()
+        if participant.last_read_at:
+            received = messages.filter(created_at__lte=participant.last_read_at).order_by('-created_at').first()
+            if received and (last_read is None or received.created_at > last_read.created_at):
+                last_read = received
+
+        unread = messages.filter(is_deleted_for_all=False).exclude(sender_id=participant.user_id)
+        if last_read:
+            participant.last_read_message_id = last_read.id
+            participant.last_read_at = max(filter(None, [participant.last_read_at, last_read.created_at]))
+            unread = unread.filter(created_at__gt=participant.last_read_at)
+        participant.unread_count = unread.count()
+        participant.save(update_fields=['last_read_message', 'last_read_at', 'unread_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0008_message_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participant',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, help_text='Latest message read by this participant', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message'),
+        ),
+        migrations.RunPython(populate_read_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='message',
+            name='read_by',
+        ),
+    ]
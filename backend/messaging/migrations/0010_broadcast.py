@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('messaging', '0009_participant_read_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('broadcast_type', models.CharField(choices=[('all', 'Tous les étudiants'), ('university', 'École'), ('class', 'Classe')], default='all', max_length=20)),
+                ('target_university', models.CharField(blank=True, max_length=200)),
+                ('target_field_of_study', models.CharField(blank=True, max_length=200)),
+                ('target_academic_year', models.CharField(blank=True, max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('completed', 'Terminé'), ('failed', 'Échoué')], db_index=True, default='pending', max_length=20)),
+                ('total_recipients', models.IntegerField(default=0)),
+                ('processed_count', models.IntegerField(default=0)),
+                ('conversations_created', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcasts_sent', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'messaging_broadcast',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['sender', 'created_at'], name='messaging_b_sender__0da621_idx')],
+            },
+        ),
+    ]
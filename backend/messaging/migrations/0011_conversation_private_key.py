@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:47
+
+from django.db import migrations, models
+
+
+def populate_private_keys(apps, schema_editor):
+    """
+    Key existing private conversations by their two members.
+    When a pair has several conversations, the most recently active one gets the key.
+    """
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Participant = apps.get_model('messaging', 'Participant')
+    members = {}
+    for conversation_id, user_id in Participant.objects.filter(
+        conversation__conversation_type='private'
+    ).values_list('conversation_id', 'user_id'):
+        members.setdefault(conversation_id, set()).add(str(user_id))
+
+    keyed = set()
+    for conversation in Conversation.objects.filter(
+        conversation_type='private'
+    ).order_by(models.F('last_message_at').desc(nulls_last=True), '-created_at').only('id'):
+        user_ids = members.get(conversation.id, set())
+        if len(user_ids) != 2:
+            continue
+        key = ':'.join(sorted(user_ids))
+        if key in keyed:
+            continue
+        keyed.add(key)
+        Conversation.objects.filter(id=conversation.id).update(private_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0010_broadcast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='private_key',
+            field=models.CharField(blank=True, editable=False, help_text='Sorted user IDs of a private conversation, one conversation per pair', max_length=73, null=True, unique=True),
+        ),
+        migrations.RunPython(populate_private_keys, migrations.RunPython.noop),
+    ]
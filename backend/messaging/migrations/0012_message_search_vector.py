@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:51
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# PostgreSQL only: other backends keep the column empty and search with icontains
+CREATE_SEARCH_TRIGGER = """
+CREATE OR REPLACE FUNCTION messaging_message_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := to_tsvector('french', coalesce(NEW.content, ''));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER messaging_message_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF content ON messaging_message
+    FOR EACH ROW EXECUTE FUNCTION messaging_message_search_vector_update();
+
+UPDATE messaging_message SET search_vector = to_tsvector('french', coalesce(content, ''));
+
+CREATE INDEX messaging_message_search_vector_idx ON messaging_message USING gin (search_vector);
+"""
+
+DROP_SEARCH_TRIGGER = """
+DROP INDEX IF EXISTS messaging_message_search_vector_idx;
+DROP TRIGGER IF EXISTS messaging_message_search_vector_trigger ON messaging_message;
+DROP FUNCTION IF EXISTS messaging_message_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_TRIGGER)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0011_conversation_private_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+def populate_message_seq(apps, schema_editor):
+    """Number existing messages of each conversation in creation order."""
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+    for conversation_id in Conversation.objects.values_list('id', flat=True):
+        messages = list(
+            Message.objects.filter(conversation_id=conversation_id).order_by('created_at', 'id').only('id')
+        )
+        for seq, message in enumerate(messages, start=1):
+            message.seq = seq
+        Message.objects.bulk_update(messages, ['seq'], batch_size=500)
+        Conversation.objects.filter(id=conversation_id).update(last_seq=len(messages))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0012_message_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('seq', models.PositiveBigIntegerField()),
+                ('event_type', models.CharField(choices=[('message_edited', 'Message modifié'), ('message_deleted', 'Message supprimé'), ('reaction_added', 'Réaction ajoutée'), ('reaction_removed', 'Réaction retirée')], max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'messaging_conversationevent',
+                'ordering': ['seq'],
+            },
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_seq',
+            field=models.PositiveBigIntegerField(default=0, help_text='Last sequence number allocated in this conversation'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Sequence number of the message in its conversation', null=True),
+        ),
+        migrations.RunPython(populate_message_seq, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('conversation', 'seq'), name='msg_conv_seq_unique'),
+        ),
+        migrations.AddField(
+            model_name='conversationevent',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='messaging.conversation'),
+        ),
+        migrations.AddField(
+            model_name='conversationevent',
+            name='message',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='messaging.message'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversationevent',
+            constraint=models.UniqueConstraint(fields=('conversation', 'seq'), name='event_conv_seq_unique'),
+        ),
+    ]
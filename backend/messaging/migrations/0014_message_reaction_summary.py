@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:56
+
+from django.db import migrations, models
+
+
+def populate_reaction_summaries(apps, schema_editor):
+    """Build the reaction summary of every message that has reactions."""
+    Message = apps.get_model('messaging', 'Message')
+    MessageReaction = apps.get_model('messaging', 'MessageReaction')
+    summaries = {}
+    for message_id, emoji, user_id, username in MessageReaction.objects.order_by('-created_at').values_list(
+        'message_id', 'emoji', 'user_id', 'user__username'
+    ):
+        entry = summaries.setdefault(message_id, {}).setdefault(emoji, {'count': 0, 'recent': []})
+        entry['count'] += 1
+        if len(entry['recent']) < 3:
+            entry['recent'].append({'user_id': str(user_id), 'username': username})
+    for message_id, summary in summaries.items():
+        Message.objects.filter(id=message_id).update(reaction_summary=summary)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0013_message_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='reaction_summary',
+            field=models.JSONField(blank=True, default=dict, help_text='Reaction counts per emoji and latest reactors'),
+        ),
+        migrations.RunPython(populate_reaction_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('messaging', '0014_message_reaction_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Attachment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sha256', models.CharField(help_text='SHA-256 of the file content', max_length=64, unique=True)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.BigIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('processing', 'En cours'), ('ready', 'Prêt'), ('failed', 'Échoué')], db_index=True, default='pending', max_length=20)),
+                ('staged_path', models.CharField(blank=True, max_length=500)),
+                ('storage_name', models.CharField(blank=True, max_length=500)),
+                ('url', models.URLField(blank=True, max_length=500)),
+                ('thumbnail_url', models.URLField(blank=True, max_length=500)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('uploaded_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attachments_uploaded', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'messaging_attachment',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment_thumbnail_url',
+            field=models.URLField(blank=True, help_text='URL of the image thumbnail', max_length=500, null=True),
+        ),
+        migrations.CreateModel(
+            name='AttachmentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file_name', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=100)),
+                ('total_size', models.BigIntegerField()),
+                ('received_bytes', models.BigIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, help_text='Hash announced by the client, checked on completion', max_length=64)),
+                ('status', models.CharField(choices=[('uploading', 'En cours'), ('completed', 'Terminé')], default='uploading', max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('attachment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to='messaging.attachment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachment_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'messaging_attachmentupload',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment',
+            field=models.ForeignKey(blank=True, help_text='Stored file behind attachment_url', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messages', to='messaging.attachment'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('messaging', '0015_attachment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('message_type', models.CharField(default='text', max_length=20)),
+                ('attachment_url', models.URLField(blank=True, max_length=500, null=True)),
+                ('attachment_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('attachment_size', models.IntegerField(blank=True, null=True)),
+                ('attachment_thumbnail_url', models.URLField(blank=True, max_length=500, null=True)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('edited_at', models.DateTimeField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('is_deleted_for_all', models.BooleanField(default=False)),
+                ('seq', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('reaction_summary', models.JSONField(blank=True, default=dict)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attachment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_messages', to='messaging.attachment')),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='messaging.conversation')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages_sent', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'messaging_message_archive',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['conversation', 'created_at', 'id'], name='msg_archive_conv_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:11
+
+import math
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_fanout(apps, schema_editor):
+    """Count the active participants of every conversation and shard the large ones."""
+    Conversation = apps.get_model('messaging', 'Conversation')
+    shard_size = settings.MESSAGING_FANOUT_SHARD_SIZE
+    counts = Conversation.objects.annotate(
+        active=Count('participants', filter=Q(participants__is_active=True))
+    ).filter(active__gt=0).values_list('id', 'active')
+    for conversation_id, active in counts:
+        shards = math.ceil(active / shard_size) if shard_size and active > shard_size else 0
+        Conversation.objects.filter(id=conversation_id).update(member_count=active, fanout_shards=shards)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0016_archivedmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='fanout_shards',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Number of channel-layer shard groups (0: a single chat_<id> group)'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of active participants'),
+        ),
+        migrations.RunPython(populate_fanout, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@
 Messaging models for CampusLink.
 """
 import uuid
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils import timezone
 from users.models import User
@@ -32,6 +33,31 @@ class Conversation(models.Model):
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_message_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Denormalized pointer to the latest visible message (kept up to date by messaging.utils)
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        help_text='Latest non-deleted message, used to render the inbox without loading history'
+    )
+    # Canonical "<user_id>:<user_id>" key of the two members of a private conversation
+    private_key = models.CharField(
+        max_length=73,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Sorted user IDs of a private conversation, one conversation per pair'
+    )
+    # Sequence numbers order messages and message events (edits, reactions, deletions)
+    last_seq = models.PositiveBigIntegerField(default=0, help_text='Last sequence number allocated in this conversation')
+    # Fan-out layout of large groups, maintained by messaging.fanout.update_fanout
+    member_count = models.PositiveIntegerField(default=0, help_text='Number of active participants')
+    fanout_shards = models.PositiveSmallIntegerField(
+        default=0, help_text='Number of channel-layer shard groups (0: a single chat_<id> group)'
+    )
     
     class Meta:
         db_table = 'messaging_conversation'
@@ -49,6 +75,11 @@ class Conversation(models.Model):
         if self.conversation_type == 'group':
             return f"Group: {self.name}"
         return f"Private: {self.id}"
+    
+    @staticmethod
+    def make_private_key(user_id, other_user_id):
+        """Return the canonical key of a private conversation between two users."""
+        return ':'.join(sorted([str(user_id), str(other_user_id)]))
 
 
 class Participant(models.Model):
@@ -59,6 +90,15 @@ class Participant(models.Model):
     joined_at = models.DateTimeField(default=timezone.now)
     left_at = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True, db_index=True)
+    # Read watermark: every message created up to last_read_at is read by this participant
+    last_read_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        help_text='Latest message read by this participant'
+    )
     last_read_at = models.DateTimeField(null=True, blank=True)
     unread_count = models.IntegerField(default=0)
     # User-specific conversation settings
@@ -93,27 +133,80 @@ class Message(models.Model):
     attachment_url = models.URLField(max_length=500, blank=True, null=True, help_text='URL of attached file/image')
     attachment_name = models.CharField(max_length=255, blank=True, null=True, help_text='Original filename')
     attachment_size = models.IntegerField(blank=True, null=True, help_text='File size in bytes')
+    attachment = models.ForeignKey(
+        'Attachment', on_delete=models.SET_NULL, null=True, blank=True, related_name='messages',
+        help_text='Stored file behind attachment_url'
+    )
+    attachment_thumbnail_url = models.URLField(max_length=500, blank=True, null=True, help_text='URL of the image thumbnail')
     is_read = models.BooleanField(default=False, db_index=True)
-    read_by = models.ManyToManyField(User, related_name='messages_read', blank=True)
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
     edited_at = models.DateTimeField(null=True, blank=True)
     deleted_at = models.DateTimeField(null=True, blank=True)
     is_deleted_for_all = models.BooleanField(default=False, help_text='Message deleted for all participants')
+    # Full-text search document, maintained by a database trigger and GIN indexed on PostgreSQL
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    seq = models.PositiveBigIntegerField(null=True, blank=True, help_text='Sequence number of the message in its conversation')
+    # {emoji: {'count': n, 'recent': [{'user_id', 'username'}, ...]}}, maintained by messaging.utils
+    reaction_summary = models.JSONField(default=dict, blank=True, help_text='Reaction counts per emoji and latest reactors')
     
     class Meta:
         db_table = 'messaging_message'
         ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'seq'], name='msg_conv_seq_unique'),
+        ]
         indexes = [
             models.Index(fields=['conversation']),
             models.Index(fields=['sender']),
             models.Index(fields=['is_read']),
             models.Index(fields=['created_at']),
+            # Keyset pagination of a conversation's history on (created_at, id)
+            models.Index(fields=['conversation', 'created_at', 'id'], name='msg_conv_created_id_idx'),
         ]
     
     def __str__(self):
         return f"{self.sender.username}: {self.content[:50]}"
 
 
+class ArchivedMessage(models.Model):
+    """
+    Message moved out of messaging_message by the archive_messages command.
+    Per conversation, archived messages are always older than the ones left in
+    the hot table, so history reads continue here once they run past it.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='archived_messages')
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_messages_sent')
+    content = models.TextField()
+    message_type = models.CharField(max_length=20, default='text')
+    attachment_url = models.URLField(max_length=500, blank=True, null=True)
+    attachment_name = models.CharField(max_length=255, blank=True, null=True)
+    attachment_size = models.IntegerField(blank=True, null=True)
+    attachment = models.ForeignKey(
+        'Attachment', on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_messages'
+    )
+    attachment_thumbnail_url = models.URLField(max_length=500, blank=True, null=True)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    edited_at = models.DateTimeField(null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    is_deleted_for_all = models.BooleanField(default=False)
+    seq = models.PositiveBigIntegerField(null=True, blank=True)
+    reaction_summary = models.JSONField(default=dict, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'messaging_message_archive'
+        ordering = ['created_at']
+        # History scans only: the per-column indexes of the hot table are not needed here
+        indexes = [
+            models.Index(fields=['conversation', 'created_at', 'id'], name='msg_archive_conv_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.sender.username}: {self.content[:50]} (archived)"
+
+
 class MessageReaction(models.Model):
     """Reaction to a message (emoji)."""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -132,3 +225,147 @@ class MessageReaction(models.Model):
     
     def __str__(self):
         return f"{self.user.username} reacted {self.emoji} to message {self.message.id}"
+
+
+class ConversationEvent(models.Model):
+    """
+    Change to an existing message (edit, deletion, reaction), numbered in the
+    same sequence as the conversation's messages so clients can resync from a seq.
+    """
+    
+    TYPE_CHOICES = [
+        ('message_edited', 'Message modifié'),
+        ('message_deleted', 'Message supprimé'),
+        ('reaction_added', 'Réaction ajoutée'),
+        ('reaction_removed', 'Réaction retirée'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='events', db_index=True)
+    seq = models.PositiveBigIntegerField()
+    event_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='events')
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'messaging_conversationevent'
+        ordering = ['seq']
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'seq'], name='event_conv_seq_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} #{self.seq} in {self.conversation_id}"
+
+
+class Broadcast(models.Model):
+    """Broadcast message sent by an admin or class leader, delivered in the background."""
+    
+    TYPE_CHOICES = [
+        ('all', 'Tous les étudiants'),
+        ('university', 'École'),
+        ('class', 'Classe'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('completed', 'Terminé'),
+        ('failed', 'Échoué'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcasts_sent', db_index=True)
+    content = models.TextField()
+    broadcast_type = models.CharField(max_length=20, choices=TYPE_CHOICES, default='all')
+    # Targeting filters as sent by the client (admins only, class leaders use their own profile)
+    target_university = models.CharField(max_length=200, blank=True)
+    target_field_of_study = models.CharField(max_length=200, blank=True)
+    target_academic_year = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    total_recipients = models.IntegerField(default=0)
+    processed_count = models.IntegerField(default=0)
+    conversations_created = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'messaging_broadcast'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['sender', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Broadcast {self.broadcast_type} by {self.sender.username} ({self.status})"
+
+
+class Attachment(models.Model):
+    """
+    Message attachment stored once per content hash: a file shared into many
+    conversations is uploaded and thumbnailed a single time.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('processing', 'En cours'),
+        ('ready', 'Prêt'),
+        ('failed', 'Échoué'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    sha256 = models.CharField(max_length=64, unique=True, help_text='SHA-256 of the file content')
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    # Local copy waiting to be pushed to storage, removed once processed
+    staged_path = models.CharField(max_length=500, blank=True)
+    storage_name = models.CharField(max_length=500, blank=True)
+    url = models.URLField(max_length=500, blank=True)
+    thumbnail_url = models.URLField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='attachments_uploaded')
+    created_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'messaging_attachment'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Attachment {self.sha256[:12]} ({self.status})"
+    
+    @property
+    def is_image(self):
+        return self.content_type.startswith('image/')
+
+
+class AttachmentUpload(models.Model):
+    """Resumable upload session: chunks are appended to a staged file until it is complete."""
+    
+    STATUS_CHOICES = [
+        ('uploading', 'En cours'),
+        ('completed', 'Terminé'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attachment_uploads')
+    file_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    total_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, help_text='Hash announced by the client, checked on completion')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    attachment = models.ForeignKey(Attachment, on_delete=models.SET_NULL, null=True, blank=True, related_name='uploads')
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'messaging_attachmentupload'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Upload {self.file_name} by {self.user.username} ({self.received_bytes}/{self.total_size})"
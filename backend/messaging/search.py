@@ -0,0 +1,36 @@
+"""
+Message search for Messaging app.
+On PostgreSQL, messages are matched against Message.search_vector (French
+configuration, GIN indexed and kept up to date by a trigger, see migration 0012)
+and ranked with ts_rank. Other backends (SQLite in tests and local setups)
+fall back to matching every word with icontains.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Value
+
+SEARCH_CONFIG = 'french'
+
+
+def search_enabled():
+    """Check if the database supports the indexed full-text search."""
+    return connection.vendor == 'postgresql'
+
+
+def filter_messages(queryset, query):
+    """Restrict a message queryset to messages matching a search query."""
+    if search_enabled():
+        return queryset.filter(search_vector=SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch'))
+    for word in query.split():
+        queryset = queryset.filter(content__icontains=word)
+    return queryset
+
+
+def rank_messages(queryset, query):
+    """Filter a message queryset by a search query and order it by relevance, then recency."""
+    queryset = filter_messages(queryset, query)
+    if search_enabled():
+        rank = SearchRank(F('search_vector'), SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch'))
+    else:
+        rank = Value(0.0, output_field=FloatField())
+    return queryset.annotate(rank=rank).order_by('-rank', '-created_at', '-id')
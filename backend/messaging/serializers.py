@@ -2,7 +2,7 @@
 Serializers for messaging app.
 """
 from rest_framework import serializers
-from .models import Conversation, Participant, Message, MessageReaction
+from .models import Conversation, Participant, Message, MessageReaction, Broadcast, Attachment, AttachmentUpload
 from users.serializers import UserSerializer, UserBasicSerializer
 
 
@@ -19,19 +19,33 @@ class MessageReactionSerializer(serializers.ModelSerializer):
 class MessageSerializer(serializers.ModelSerializer):
     """Serializer for Message model."""
     sender = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
     read_by = serializers.SerializerMethodField()
-    reactions = serializers.SerializerMethodField()
+    my_reactions = serializers.SerializerMethodField()
     is_read_by_me = serializers.SerializerMethodField()
     
     class Meta:
         model = Message
         fields = [
-            'id', 'conversation', 'sender', 'content', 'message_type',
-            'attachment_url', 'attachment_name', 'attachment_size',
-            'is_read', 'read_by', 'reactions', 'is_read_by_me', 'created_at', 'edited_at',
+            'id', 'conversation', 'seq', 'sender', 'content', 'message_type',
+            'attachment_url', 'attachment_name', 'attachment_size', 'attachment', 'attachment_thumbnail_url',
+            'is_read', 'read_by', 'reaction_summary', 'my_reactions', 'is_read_by_me', 'created_at', 'edited_at',
             'is_deleted_for_all', 'deleted_at'
         ]
-        read_only_fields = ['id', 'sender', 'is_read', 'read_by', 'reactions', 'created_at', 'edited_at', 'deleted_at']
+        read_only_fields = [
+            'id', 'seq', 'sender', 'is_read', 'read_by', 'reaction_summary', 'attachment_thumbnail_url',
+            'created_at', 'edited_at', 'deleted_at'
+        ]
+    
+    def to_representation(self, instance):
+        """Serve attachments kept in local media storage with absolute URLs."""
+        data = super().to_representation(instance)
+        request = self.context.get('request')
+        if request:
+            for field in ('attachment_url', 'attachment_thumbnail_url'):
+                if data.get(field) and data[field].startswith('/'):
+                    data[field] = request.build_absolute_uri(data[field])
+        return data
     
     def get_sender(self, obj):
         """Get sender with error handling."""
@@ -54,70 +68,90 @@ class MessageSerializer(serializers.ModelSerializer):
             except:
                 return {'id': None, 'username': 'Unknown', 'email': ''}
     
+    def get_conversation_participants(self, obj):
+        """
+        Get active participants of the message's conversation, with their read watermarks.
+        Loaded once per conversation and shared by every message serialized with this context.
+        """
+        cache = self.context.setdefault('conversation_participants', {})
+        if obj.conversation_id not in cache:
+            cache[obj.conversation_id] = list(
+                Participant.objects.filter(
+                    conversation_id=obj.conversation_id,
+                    is_active=True
+                ).select_related('user')
+            )
+        return cache[obj.conversation_id]
+    
+    def get_is_read(self, obj):
+        """Check if another participant's read watermark covers this message."""
+        return any(
+            participant.user_id != obj.sender_id and participant.last_read_at
+            and participant.last_read_at >= obj.created_at
+            for participant in self.get_conversation_participants(obj)
+        )
+    
     def get_read_by(self, obj):
-        """Get read_by users with error handling."""
+        """Get users whose read watermark covers this message."""
         try:
-            if hasattr(obj, 'read_by'):
-                # Use prefetched data if available, otherwise query
-                if hasattr(obj, '_prefetched_objects_cache') and 'read_by' in obj._prefetched_objects_cache:
-                    read_by_users = obj._prefetched_objects_cache['read_by'][:10]
-                else:
-                    read_by_users = list(obj.read_by.all()[:10])  # Limit to 10 to avoid performance issues
-                
-                result = []
-                for user in read_by_users:
+            result = []
+            for participant in self.get_conversation_participants(obj):
+                if participant.user_id == obj.sender_id or not participant.last_read_at:
+                    continue
+                if participant.last_read_at >= obj.created_at:
                     try:
-                        if user:  # Check if user exists
-                            result.append(UserBasicSerializer(user, context=self.context).data)
+                        result.append(UserBasicSerializer(participant.user, context=self.context).data)
                     except Exception as e:
                         import logging
                         logger = logging.getLogger(__name__)
-                        logger.warning(f"Error serializing read_by user {user.id if user and hasattr(user, 'id') else 'unknown'}: {str(e)}")
+                        logger.warning(f"Error serializing read_by user {participant.user_id}: {str(e)}")
                         # Skip this user but continue with others
                         continue
-                return result
-            return []
+                if len(result) >= 10:  # Limit to 10 to avoid performance issues
+                    break
+            return result
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Error serializing read_by for message {obj.id}: {str(e)}", exc_info=True)
             return []
     
-    def get_reactions(self, obj):
-        """Get reactions with error handling."""
-        try:
-            if hasattr(obj, 'reactions'):
-                # Use prefetched data if available, otherwise query
-                if hasattr(obj, '_prefetched_objects_cache') and 'reactions' in obj._prefetched_objects_cache:
-                    reactions = obj._prefetched_objects_cache['reactions']
-                else:
-                    reactions = list(obj.reactions.all())
-                
-                result = []
-                for reaction in reactions:
-                    try:
-                        if reaction:  # Check if reaction exists
-                            result.append(MessageReactionSerializer(reaction, context=self.context).data)
-                    except Exception as e:
-                        import logging
-                        logger = logging.getLogger(__name__)
-                        logger.warning(f"Error serializing reaction {reaction.id if reaction and hasattr(reaction, 'id') else 'unknown'}: {str(e)}")
-                        # Skip this reaction but continue with others
-                        continue
-                return result
+    def get_my_reactions(self, obj):
+        """
+        Get the emojis the current user reacted with.
+        Loaded once for all the messages being serialized that have reactions;
+        counts and recent reactors come from reaction_summary.
+        """
+        if not obj.reaction_summary:
             return []
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error serializing reactions for message {obj.id}: {str(e)}", exc_info=True)
+        request = self.context.get('request')
+        if not (request and request.user.is_authenticated):
             return []
+        my_reactions = self.context.setdefault('my_reactions', {})
+        if obj.id not in my_reactions:
+            messages = self.parent.instance if isinstance(self.parent, serializers.ListSerializer) else [obj]
+            message_ids = [message.id for message in messages if message.reaction_summary] or [obj.id]
+            for message_id in message_ids:
+                my_reactions[message_id] = []
+            for message_id, emoji in MessageReaction.objects.filter(
+                message_id__in=message_ids,
+                user=request.user
+            ).values_list('message_id', 'emoji'):
+                my_reactions[message_id].append(emoji)
+        return my_reactions.get(obj.id, [])
     
     def get_is_read_by_me(self, obj):
         """Check if message is read by current user."""
         try:
             request = self.context.get('request')
             if request and request.user.is_authenticated:
-                return obj.read_by.filter(id=request.user.id).exists()
+                if obj.sender_id == request.user.id:
+                    return True
+                participant = next(
+                    (p for p in self.get_conversation_participants(obj) if p.user_id == request.user.id),
+                    None
+                )
+                return bool(participant and participant.last_read_at and participant.last_read_at >= obj.created_at)
             return False
         except Exception as e:
             import logging
@@ -134,10 +168,10 @@ class ParticipantSerializer(serializers.ModelSerializer):
         model = Participant
         fields = [
             'id', 'conversation', 'user', 'joined_at', 'left_at',
-            'is_active', 'last_read_at', 'unread_count',
+            'is_active', 'last_read_message', 'last_read_at', 'unread_count',
             'is_pinned', 'is_archived', 'is_favorite', 'mute_notifications'
         ]
-        read_only_fields = ['id', 'joined_at', 'left_at', 'unread_count']
+        read_only_fields = ['id', 'joined_at', 'left_at', 'last_read_message', 'last_read_at', 'unread_count']
 
 
 class ConversationSerializer(serializers.ModelSerializer):
@@ -157,10 +191,10 @@ class ConversationSerializer(serializers.ModelSerializer):
         model = Conversation
         fields = [
             'id', 'conversation_type', 'name', 'group', 'created_by', 'created_at',
-            'updated_at', 'last_message_at', 'participants', 'last_message', 'unread_count',
+            'updated_at', 'last_message_at', 'last_seq', 'participants', 'last_message', 'unread_count',
             'is_pinned', 'is_archived', 'is_favorite', 'mute_notifications'
         ]
-        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at', 'last_message_at']
+        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at', 'last_message_at', 'last_seq']
     
     def get_group(self, obj):
         """Get group information if this is a group conversation."""
@@ -192,20 +226,14 @@ class ConversationSerializer(serializers.ModelSerializer):
             return None
     
     def get_last_message(self, obj):
-        """Get last message in conversation."""
+        """Get last message in conversation from the denormalized pointer."""
         try:
-            # Use the prefetched messages if available, otherwise query
-            if hasattr(obj, '_prefetched_objects_cache') and 'messages' in obj._prefetched_objects_cache:
-                messages = obj._prefetched_objects_cache['messages']
-                last_message = [m for m in messages if m.deleted_at is None]
-                if last_message:
-                    last_message = max(last_message, key=lambda m: m.created_at)
-                else:
-                    last_message = None
-            else:
-                last_message = obj.messages.filter(deleted_at__isnull=True).order_by('-created_at').first()
-            
-            if last_message:
+            last_message = obj.last_message
+            if last_message and last_message.deleted_at is None and not last_message.is_deleted_for_all:
+                # Seed read state from the prefetched participants to avoid a query per conversation
+                if hasattr(obj, '_prefetched_objects_cache') and 'participants' in obj._prefetched_objects_cache:
+                    participants = self.context.setdefault('conversation_participants', {})
+                    participants[obj.id] = [p for p in obj._prefetched_objects_cache['participants'] if p.is_active]
                 return MessageSerializer(last_message, context=self.context).data
             return None
         except Exception as e:
@@ -215,74 +243,101 @@ class ConversationSerializer(serializers.ModelSerializer):
             logger.error(f"Error getting last message for conversation {obj.id}: {str(e)}")
             return None
     
+    def get_viewer_participant(self, obj):
+        """
+        Return the current user's active Participant row for a conversation.
+        Reads the viewer_participants prefetch set up by ConversationViewSet,
+        then the prefetched participants, and only queries as a last resort.
+        """
+        request = self.context.get('request')
+        if not (request and request.user.is_authenticated):
+            return None
+        if hasattr(obj, 'viewer_participants'):
+            return obj.viewer_participants[0] if obj.viewer_participants else None
+        if hasattr(obj, '_prefetched_objects_cache') and 'participants' in obj._prefetched_objects_cache:
+            return next(
+                (p for p in obj._prefetched_objects_cache['participants'] if p.user_id == request.user.id and p.is_active),
+                None
+            )
+        # Cache the fallback query so the per-user fields share it
+        if not hasattr(obj, '_viewer_participant'):
+            obj._viewer_participant = obj.participants.filter(user=request.user, is_active=True).first()
+        return obj._viewer_participant
+    
     def get_unread_count(self, obj):
         """Get unread count for current user."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                # Use prefetched participants if available
-                if hasattr(obj, '_prefetched_objects_cache') and 'participants' in obj._prefetched_objects_cache:
-                    participants = obj._prefetched_objects_cache['participants']
-                    participant = next(
-                        (p for p in participants if p.user.id == request.user.id and p.is_active),
-                        None
-                    )
-                    if participant:
-                        return participant.unread_count
-                else:
-                    participant = obj.participants.get(user=request.user, is_active=True)
-                    return participant.unread_count
-            except (Participant.DoesNotExist, StopIteration, AttributeError):
-                return 0
-            except Exception as e:
-                # Log error but don't break the serializer
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Error getting unread count for conversation {obj.id}: {str(e)}")
-                return 0
-        return 0
+        participant = self.get_viewer_participant(obj)
+        return participant.unread_count if participant else 0
     
     def get_is_pinned(self, obj):
         """Get is_pinned status for current user."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                participant = obj.participants.get(user=request.user, is_active=True)
-                return participant.is_pinned
-            except Participant.DoesNotExist:
-                return False
-        return False
+        participant = self.get_viewer_participant(obj)
+        return participant.is_pinned if participant else False
     
     def get_is_archived(self, obj):
         """Get is_archived status for current user."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                participant = obj.participants.get(user=request.user, is_active=True)
-                return participant.is_archived
-            except Participant.DoesNotExist:
-                return False
-        return False
+        participant = self.get_viewer_participant(obj)
+        return participant.is_archived if participant else False
     
     def get_is_favorite(self, obj):
         """Get is_favorite status for current user."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                participant = obj.participants.get(user=request.user, is_active=True)
-                return participant.is_favorite
-            except Participant.DoesNotExist:
-                return False
-        return False
+        participant = self.get_viewer_participant(obj)
+        return participant.is_favorite if participant else False
     
     def get_mute_notifications(self, obj):
         """Get mute_notifications status for current user."""
+        participant = self.get_viewer_participant(obj)
+        return participant.mute_notifications if participant else False
+
+
+class BroadcastSerializer(serializers.ModelSerializer):
+    """Serializer for Broadcast model (delivery status and progress)."""
+    progress = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Broadcast
+        fields = [
+            'id', 'content', 'broadcast_type', 'status', 'total_recipients',
+            'processed_count', 'conversations_created', 'progress', 'error',
+            'created_at', 'started_at', 'completed_at'
+        ]
+        read_only_fields = fields
+    
+    def get_progress(self, obj):
+        """Get delivery progress as a percentage."""
+        if obj.status == 'completed':
+            return 100
+        if not obj.total_recipients:
+            return 0
+        return int(obj.processed_count * 100 / obj.total_recipients)
+
+
+class AttachmentSerializer(serializers.ModelSerializer):
+    """Serializer for Attachment model (stored file and processing status)."""
+    
+    class Meta:
+        model = Attachment
+        fields = ['id', 'sha256', 'content_type', 'size', 'status', 'url', 'thumbnail_url', 'error', 'created_at']
+        read_only_fields = fields
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                participant = obj.participants.get(user=request.user, is_active=True)
-                return participant.mute_notifications
-            except Participant.DoesNotExist:
-                return False
-        return False
+        if request:
+            for field in ('url', 'thumbnail_url'):
+                if data.get(field) and data[field].startswith('/'):
+                    data[field] = request.build_absolute_uri(data[field])
+        return data
+
 
+class AttachmentUploadSerializer(serializers.ModelSerializer):
+    """Serializer for AttachmentUpload model (resumable upload session)."""
+    attachment = AttachmentSerializer(read_only=True)
+    
+    class Meta:
+        model = AttachmentUpload
+        fields = [
+            'id', 'file_name', 'content_type', 'total_size', 'received_bytes', 'sha256',
+            'status', 'attachment', 'created_at'
+        ]
+        read_only_fields = ['id', 'received_bytes', 'status', 'attachment', 'created_at']
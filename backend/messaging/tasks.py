@@ -0,0 +1,24 @@
+"""
+Celery tasks for Messaging app.
+"""
+from celery import shared_task
+from .attachments import process_attachment, cleanup_stale_uploads
+from .broadcast import run_broadcast
+
+
+@shared_task
+def send_broadcast(broadcast_id):
+    """Deliver a broadcast message to all its recipients."""
+    run_broadcast(broadcast_id)
+
+
+@shared_task
+def process_attachment_task(attachment_id):
+    """Store an uploaded attachment and its thumbnail."""
+    process_attachment(attachment_id)
+
+
+@shared_task
+def cleanup_attachment_uploads_task():
+    """Delete abandoned resumable uploads and their staged files (celery beat)."""
+    return cleanup_stale_uploads()
@@ -0,0 +1,111 @@
+"""
+Tests for message archival and hot-first history reads.
+"""
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from messaging.models import Conversation, Participant, Message, MessageReaction, ArchivedMessage
+
+
+class MessageArchiveTestCase(TestCase):
+    """Test the archive_messages command and history pages spanning both tables."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='alice@esmt.sn',
+            username='alice',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.conversation = Conversation.objects.create(
+            conversation_type='group',
+            name='Promo 2024',
+            created_by=self.user
+        )
+        Participant.objects.create(conversation=self.conversation, user=self.user)
+        now = timezone.now()
+        # 8 messages from two years ago, then 4 recent ones
+        self.messages = [
+            Message.objects.create(
+                conversation=self.conversation,
+                sender=self.user,
+                content=f'Message {i}',
+                created_at=(now - timedelta(days=730) if i < 8 else now - timedelta(days=1)) + timedelta(minutes=i)
+            )
+            for i in range(12)
+        ]
+        self.conversation.last_message = self.messages[-1]
+        self.conversation.save(update_fields=['last_message'])
+        MessageReaction.objects.create(message=self.messages[0], user=self.user, emoji='👍')
+        Message.objects.filter(id=self.messages[0].id).update(
+            reaction_summary={'👍': {'count': 1, 'recent': [{'user_id': str(self.user.id), 'username': 'alice'}]}}
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = f'/api/messaging/messages/?conversation={self.conversation.id}'
+
+    def _archive(self, *args):
+        call_command('archive_messages', '--keep-months', '12', '--batch-size', '3', *args, stdout=StringIO())
+
+    def _ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data]
+
+    def test_cold_messages_are_moved(self):
+        """Test that old messages move to the archive with their reaction summary."""
+        self._archive('--dry-run')
+        self.assertEqual(ArchivedMessage.objects.count(), 0)
+
+        self._archive()
+        self.assertEqual(ArchivedMessage.objects.count(), 8)
+        self.assertEqual(Message.objects.count(), 4)
+        self.assertFalse(MessageReaction.objects.exists())
+        self.assertEqual(ArchivedMessage.objects.get(id=self.messages[0].id).reaction_summary['👍']['count'], 1)
+
+    def test_latest_message_of_dormant_conversation_stays_hot(self):
+        """Test that a conversation's last message is never archived."""
+        Message.objects.filter(id__in=[m.id for m in self.messages[8:]]).delete()
+        self.conversation.last_message = self.messages[7]
+        self.conversation.save(update_fields=['last_message'])
+
+        self._archive()
+        self.assertEqual(list(Message.objects.values_list('id', flat=True)), [self.messages[7].id])
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_id, self.messages[7].id)
+
+    def test_history_continues_into_archive(self):
+        """Test that before cursors read the hot table first, then the archive, without gaps."""
+        self._archive()
+        first = self._ids(self.client.get(f'{self.url}&page_size=5'))
+        self.assertEqual(first, [str(m.id) for m in reversed(self.messages[7:])])
+
+        seen = list(first)
+        page = first
+        while page:
+            page = self._ids(self.client.get(f'{self.url}&page_size=5&before={page[-1]}'))
+            seen.extend(page)
+        self.assertEqual(seen, [str(m.id) for m in reversed(self.messages)])
+
+        # A cursor in the archive also works for newer messages
+        newer = self._ids(self.client.get(f'{self.url}&page_size=3&after={self.messages[6].id}'))
+        self.assertEqual(newer, [str(m.id) for m in reversed(self.messages[7:10])])
+
+    def test_archive_requires_participation(self):
+        """Test that non-participants can't read archived messages."""
+        self._archive()
+        outsider = User.objects.create_user(
+            email='bob@esmt.sn',
+            username='bob',
+            password='Test123!',
+            phone_number='+221771234568',
+            is_verified=True,
+            is_active=True
+        )
+        self.client.force_authenticate(user=outsider)
+        self.assertEqual(self._ids(self.client.get(self.url)), [])
@@ -0,0 +1,267 @@
+"""
+Tests for deduplicated, resumable attachment uploads.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from PIL import Image
+from datetime import timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from messaging.models import Attachment, AttachmentUpload, Conversation, Participant, Message
+from messaging.attachments import INLINE_MAX_SIZE, cleanup_stale_uploads, process_attachment, upload_staging_path
+
+
+def make_png(size=(800, 600)):
+    output = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(output, format='PNG')
+    return output.getvalue()
+
+
+class AttachmentTestCase(TestCase):
+    """Test content-hash storage, thumbnails, background processing and resumable uploads."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.staging_dir = tempfile.mkdtemp()
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            ATTACHMENT_STAGING_DIR=self.staging_dir,
+            CLOUDINARY_STORAGE={'CLOUD_NAME': ''},
+            # Background work runs only where a test triggers it (no cleanup thread)
+            USE_CELERY=True
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.staging_dir, ignore_errors=True)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='sender@esmt.sn',
+            username='sender',
+            password='Test123!',
+            phone_number='+221771234560',
+            is_verified=True,
+            is_active=True
+        )
+        self.other = User.objects.create_user(
+            email='other@esmt.sn',
+            username='other',
+            password='Test123!',
+            phone_number='+221771234561',
+            is_verified=True,
+            is_active=True
+        )
+        self.conversation = Conversation.objects.create(conversation_type='private', created_by=self.user)
+        Participant.objects.create(conversation=self.conversation, user=self.user)
+        Participant.objects.create(conversation=self.conversation, user=self.other)
+
+    def _upload(self, user, content, name='photo.png', content_type='image/png'):
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(
+                '/api/messaging/messages/upload_attachment/',
+                {'file': SimpleUploadedFile(name, content, content_type=content_type)},
+                format='multipart'
+            )
+        return response, callbacks
+
+    def test_identical_files_are_stored_once(self):
+        """Test that the same image uploaded by two users is stored and thumbnailed once."""
+        content = make_png()
+        first, _ = self._upload(self.user, content)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data['status'], 'ready')
+        self.assertEqual(first.data['sha256'], hashlib.sha256(content).hexdigest())
+        self.assertTrue(first.data['url'].startswith('http'))
+        self.assertTrue(first.data['thumbnail_url'])
+
+        second, _ = self._upload(self.other, content, name='copie.png')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(second.data['name'], 'copie.png')
+        self.assertEqual(Attachment.objects.count(), 1)
+        # Sending the bytes gives access to the shared file
+        response = self.client.post('/api/messaging/messages/', {
+            'conversation': str(self.conversation.id),
+            'content': '📎 Photo',
+            'message_type': 'image',
+            'attachment': second.data['id'],
+        })
+        self.assertEqual(response.status_code, 201)
+
+        attachment = Attachment.objects.get()
+        self.assertIn(attachment.sha256, attachment.storage_name)
+        with open(f'{self.media_root}/message_attachments/thumbnails/{attachment.sha256}.jpg', 'rb') as thumbnail:
+            self.assertLessEqual(max(Image.open(thumbnail).size), 320)
+
+    def test_large_file_is_stored_in_background(self):
+        """Test that a large upload returns 202 and messages get the URL once it is stored."""
+        content = b'%PDF-1.4' + b'0' * INLINE_MAX_SIZE
+        response, callbacks = self._upload(self.user, content, name='cours.pdf', content_type='application/pdf')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertIsNone(response.data['url'])
+        self.assertEqual(len(callbacks), 1)
+
+        # Message sent before the file is stored
+        message_response = self.client.post('/api/messaging/messages/', {
+            'conversation': str(self.conversation.id),
+            'content': '📎 Fichier',
+            'message_type': 'file',
+            'attachment': response.data['id'],
+            'attachment_name': 'cours.pdf',
+        })
+        self.assertEqual(message_response.status_code, 201)
+        message = Message.objects.get(id=message_response.data['id'])
+        self.assertIsNone(message.attachment_url)
+
+        process_attachment(response.data['id'])
+        message.refresh_from_db()
+        attachment = Attachment.objects.get()
+        self.assertEqual(attachment.status, 'ready')
+        self.assertEqual(message.attachment_url, attachment.url)
+        self.assertEqual(message.attachment_size, len(content))
+        self.assertFalse(attachment.thumbnail_url)
+
+    def test_resumable_upload(self):
+        """Test chunked upload with a rejected out-of-order chunk and dedup on completion."""
+        content = make_png(size=(1200, 900))
+        self.client.force_authenticate(user=self.user)
+        start = self.client.post('/api/messaging/messages/attachments/uploads/', {
+            'file_name': 'photo.png', 'content_type': 'image/png', 'total_size': len(content)
+        })
+        self.assertEqual(start.status_code, 201)
+        url = f"/api/messaging/messages/attachments/uploads/{start.data['id']}/"
+        half = len(content) // 2
+
+        response = self.client.put(url, {
+            'offset': half, 'chunk': SimpleUploadedFile('chunk', content[half:])
+        }, format='multipart')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['received_bytes'], 0)
+
+        for offset, chunk in ((0, content[:half]), (half, content[half:])):
+            response = self.client.put(url, {
+                'offset': offset, 'chunk': SimpleUploadedFile('chunk', chunk)
+            }, format='multipart')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url).data['received_bytes'], len(content))
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            complete = self.client.post(f'{url}complete/')
+        self.assertEqual(complete.status_code, 202)
+        self.assertEqual(len(callbacks), 1)
+        attachment = Attachment.objects.get(id=complete.data['id'])
+        process_attachment(attachment.id)
+        status_response = self.client.get(f'/api/messaging/messages/attachments/{attachment.id}/')
+        self.assertEqual(status_response.data['status'], 'ready')
+        self.assertEqual(status_response.data['sha256'], hashlib.sha256(content).hexdigest())
+        self.assertTrue(status_response.data['thumbnail_url'])
+
+        # A client announcing the hash of a stored file skips the transfer
+        again = self.client.post('/api/messaging/messages/attachments/uploads/', {
+            'file_name': 'photo.png', 'content_type': 'image/png', 'total_size': len(content),
+            'sha256': hashlib.sha256(content).hexdigest()
+        })
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data['id'], str(attachment.id))
+        self.assertEqual(AttachmentUpload.objects.count(), 1)
+
+    def test_attachments_of_others_are_not_exposed(self):
+        """Test that the hash shortcut, status and message sending require access to the attachment."""
+        content = make_png()
+        uploaded, _ = self._upload(self.user, content)
+        attachment_id = uploaded.data['id']
+        outsider = User.objects.create_user(
+            email='outsider@esmt.sn',
+            username='outsider',
+            password='Test123!',
+            phone_number='+221771234562',
+            is_verified=True,
+            is_active=True
+        )
+        own_conversation = Conversation.objects.create(conversation_type='group', name='Seul', created_by=outsider)
+        Participant.objects.create(conversation=own_conversation, user=outsider)
+        self.client.force_authenticate(user=outsider)
+
+        start = self.client.post('/api/messaging/messages/attachments/uploads/', {
+            'file_name': 'photo.png', 'content_type': 'image/png', 'total_size': len(content),
+            'sha256': hashlib.sha256(content).hexdigest()
+        })
+        self.assertEqual(start.status_code, 201)
+        self.assertNotIn('url', start.data)
+
+        status_url = f'/api/messaging/messages/attachments/{attachment_id}/'
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+
+        response = self.client.post('/api/messaging/messages/', {
+            'conversation': str(own_conversation.id),
+            'content': '📎 Photo',
+            'message_type': 'image',
+            'attachment': attachment_id,
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Message.objects.exists())
+
+        # Members of a conversation the file was shared in can follow it
+        self.client.force_authenticate(user=self.user)
+        self.client.post('/api/messaging/messages/', {
+            'conversation': str(self.conversation.id),
+            'content': '📎 Photo',
+            'message_type': 'image',
+            'attachment': attachment_id,
+        })
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(status_url).status_code, 200)
+
+    def test_failed_attachment_is_an_error(self):
+        """Test that a file that could not be stored is answered with an error, not 202."""
+        content = b'%PDF-1.4' + b'0' * INLINE_MAX_SIZE
+        response, _ = self._upload(self.user, content, name='cours.pdf', content_type='application/pdf')
+        Attachment.objects.filter(id=response.data['id']).update(status='failed', error='Storage unavailable')
+
+        self.client.force_authenticate(user=self.user)
+        start = self.client.post('/api/messaging/messages/attachments/uploads/', {
+            'file_name': 'cours.pdf', 'content_type': 'application/pdf', 'total_size': len(content)
+        })
+        upload = AttachmentUpload.objects.get(id=start.data['id'])
+        AttachmentUpload.objects.filter(id=upload.id).update(
+            status='completed', attachment_id=response.data['id'], received_bytes=len(content)
+        )
+        complete = self.client.post(f'/api/messaging/messages/attachments/uploads/{upload.id}/complete/')
+        self.assertEqual(complete.status_code, 422)
+        self.assertEqual(complete.data['status'], 'failed')
+        self.assertIn('error', complete.data)
+
+    def test_stale_uploads_are_cleaned_up(self):
+        """Test that abandoned resumable uploads and unused staged files are deleted."""
+        self.client.force_authenticate(user=self.user)
+        uploads = []
+        for _ in range(2):
+            start = self.client.post('/api/messaging/messages/attachments/uploads/', {
+                'file_name': 'photo.png', 'content_type': 'image/png', 'total_size': 10
+            })
+            self.client.put(f"/api/messaging/messages/attachments/uploads/{start.data['id']}/", {
+                'offset': 0, 'chunk': SimpleUploadedFile('chunk', b'01234')
+            }, format='multipart')
+            uploads.append(start.data['id'])
+        stale, active = uploads
+        old = timezone.now() - timedelta(days=2)
+        AttachmentUpload.objects.filter(id=stale).update(updated_at=old)
+        os.utime(upload_staging_path(stale), (old.timestamp(), old.timestamp()))
+        orphan = os.path.join(self.staging_dir, 'file-orphan')
+        with open(orphan, 'wb') as staged:
+            staged.write(b'0')
+        os.utime(orphan, (old.timestamp(), old.timestamp()))
+
+        self.assertEqual(cleanup_stale_uploads(), {'uploads': 1, 'files': 2})
+        self.assertEqual([str(upload_id) for upload_id in AttachmentUpload.objects.values_list('id', flat=True)], [active])
+        self.assertFalse(os.path.exists(upload_staging_path(stale)))
+        self.assertTrue(os.path.exists(upload_staging_path(active)))
@@ -0,0 +1,133 @@
+"""
+Tests for background broadcast delivery.
+"""
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from notifications.models import Notification
+from messaging.models import Broadcast, Conversation, Participant, Message
+from messaging.broadcast import run_broadcast
+from messaging.utils import record_new_message
+
+
+class BroadcastTestCase(TestCase):
+    """Test broadcast queuing, bulk delivery and status."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email='admin@esmt.sn',
+            username='admin',
+            password='Test123!',
+            phone_number='+221771234560',
+            role='admin',
+            is_verified=True,
+            is_active=True
+        )
+        self.students = [
+            User.objects.create_user(
+                email=f'student{i}@esmt.sn',
+                username=f'student{i}',
+                password='Test123!',
+                phone_number=f'+22177123456{i + 1}',
+                is_verified=True,
+                is_active=True
+            )
+            for i in range(5)
+        ]
+        # The first student already talks to the admin
+        self.existing = Conversation.objects.create(
+            conversation_type='private',
+            created_by=self.admin,
+            private_key=Conversation.make_private_key(self.admin.id, self.students[0].id)
+        )
+        Participant.objects.create(conversation=self.existing, user=self.admin)
+        Participant.objects.create(conversation=self.existing, user=self.students[0])
+        self.client.force_authenticate(user=self.admin)
+
+    def _queue(self, **data):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post('/api/messaging/messages/broadcast/', {'content': 'Réunion demain', **data})
+        return response, callbacks
+
+    def test_broadcast_is_queued_then_delivered_in_bulk(self):
+        """Test that the request only queues the broadcast and delivery reuses conversations."""
+        response, callbacks = self._queue(type='all')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['broadcast']['status'], 'pending')
+        self.assertEqual(response.data['broadcast']['total_recipients'], 5)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Message.objects.count(), 0)
+
+        broadcast_id = response.data['broadcast']['id']
+        with mock.patch('messaging.broadcast.CHUNK_SIZE', 2):
+            run_broadcast(broadcast_id)
+
+        broadcast = Broadcast.objects.get(id=broadcast_id)
+        self.assertEqual(broadcast.status, 'completed')
+        self.assertEqual(broadcast.processed_count, 5)
+        self.assertEqual(broadcast.conversations_created, 4)
+
+        self.assertEqual(Conversation.objects.filter(conversation_type='private').count(), 5)
+        self.assertEqual(Message.objects.filter(conversation=self.existing).count(), 1)
+        self.assertEqual(Notification.objects.filter(notification_type='message_broadcast').count(), 5)
+        for student in self.students:
+            participant = Participant.objects.select_related('conversation').get(user=student)
+            self.assertEqual(participant.unread_count, 1)
+            self.assertEqual(participant.conversation.last_message.content, 'Réunion demain')
+
+        # Running the job again does not deliver twice
+        run_broadcast(broadcast_id)
+        self.assertEqual(Message.objects.count(), 5)
+
+    def test_delivery_does_not_rewind_last_message(self):
+        """Test that a chunk delivered after a newer message leaves the inbox pointer on it."""
+        response, _ = self._queue(type='all')
+        newer = Message.objects.create(
+            conversation=self.existing,
+            sender=self.students[0],
+            content='Déjà plus récent',
+            created_at=timezone.now() + timedelta(minutes=1)
+        )
+        record_new_message(newer)
+
+        run_broadcast(response.data['broadcast']['id'])
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.last_message_id, newer.id)
+        self.assertEqual(
+            Participant.objects.get(user=self.students[1]).conversation.last_message.content, 'Réunion demain'
+        )
+
+    def test_delivery_queries_do_not_grow_with_recipients(self):
+        """Test that a chunk is delivered with a constant number of queries."""
+        response, _ = self._queue(type='all')
+        broadcast_id = response.data['broadcast']['id']
+        # claim, load, recipients, total; chunk: savepoint, 2 lookups, 2 seq queries, 6 writes, release,
+        # progress; completion
+        with self.assertNumQueries(18):
+            run_broadcast(broadcast_id)
+
+    def test_broadcast_status(self):
+        """Test that the sender can follow the delivery progress."""
+        response, _ = self._queue(type='all')
+        broadcast_id = response.data['broadcast']['id']
+        run_broadcast(broadcast_id)
+
+        response = self.client.get(f'/api/messaging/messages/broadcast/{broadcast_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['progress'], 100)
+
+        self.client.force_authenticate(user=self.students[0])
+        response = self.client.get(f'/api/messaging/messages/broadcast/{broadcast_id}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_students_cannot_broadcast(self):
+        """Test that only admins and class leaders can broadcast."""
+        self.client.force_authenticate(user=self.students[0])
+        response, _ = self._queue(type='all')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Broadcast.objects.exists())
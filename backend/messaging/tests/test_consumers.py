@@ -0,0 +1,186 @@
+"""
+Tests for the chat WebSocket consumer.
+"""
+from unittest import mock
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from users.models import User
+from messaging.models import Conversation, Participant, Message
+from messaging.routing import websocket_urlpatterns
+
+
+@override_settings(CHANNEL_LAYERS={
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    }
+})
+class ChatConsumerTestCase(TestCase):
+    """Test ChatConsumer message persistence and fan-out."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='alice@esmt.sn',
+            username='alice',
+            password='Test123!',
+            phone_number='+221771234567',
+            first_name='Alice',
+            is_verified=True,
+            is_active=True
+        )
+        self.other = User.objects.create_user(
+            email='bob@esmt.sn',
+            username='bob',
+            password='Test123!',
+            phone_number='+221771234568',
+            is_verified=True,
+            is_active=True
+        )
+        self.conversation = Conversation.objects.create(
+            conversation_type='private',
+            created_by=self.user
+        )
+        Participant.objects.create(conversation=self.conversation, user=self.user)
+        Participant.objects.create(conversation=self.conversation, user=self.other)
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f'/ws/chat/{self.conversation.id}/'
+        )
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_chat_message_is_persisted_and_broadcast(self):
+        """Test that a chat message is saved in one transaction and fanned out."""
+        sender = await self._connect(self.user)
+        receiver = await self._connect(self.other)
+
+        # Queries run on the main thread, where database_sync_to_async executes
+        ctx = CaptureQueriesContext(connection)
+        await database_sync_to_async(ctx.__enter__)()
+        await sender.send_json_to({'type': 'chat_message', 'content': 'Salut'})
+        event = await receiver.receive_json_from()
+        await database_sync_to_async(ctx.__exit__)(None, None, None)
+        captured = await database_sync_to_async(lambda: list(ctx.captured_queries))()
+        await sender.receive_json_from()
+
+        self.assertEqual(event['type'], 'chat_message')
+        self.assertEqual(event['message']['content'], 'Salut')
+        self.assertEqual(event['message']['sender_first_name'], 'Alice')
+
+        # seq allocation (UPDATE + SELECT), INSERT message, UPDATE conversation, UPDATE participants
+        writes = [q for q in captured if not q['sql'].upper().startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(len(writes), 5)
+
+        message = await database_sync_to_async(Message.objects.get)(id=event['message']['id'])
+        conversation = await database_sync_to_async(Conversation.objects.get)(id=self.conversation.id)
+        self.assertEqual(conversation.last_message_id, message.id)
+
+        await sender.disconnect()
+        await receiver.disconnect()
+
+    @mock.patch('messaging.consumers.TYPING_TIMEOUT', 0.5)
+    @mock.patch('messaging.consumers.TYPING_MIN_INTERVAL', 0.2)
+    async def test_typing_indicators_are_coalesced(self):
+        """Test that typing frames are debounced, rate limited and expire."""
+        typist = await self._connect(self.user)
+        watcher = await self._connect(self.other)
+
+        for _ in range(5):
+            await typist.send_json_to({'type': 'typing_start'})
+        event = await watcher.receive_json_from()
+        self.assertEqual(event['type'], 'typing_indicator')
+        self.assertTrue(event['typing'])
+        self.assertTrue(await watcher.receive_nothing(timeout=0.1))
+
+        # A stop right after the start is held back until the interval has elapsed
+        await typist.send_json_to({'type': 'typing_stop'})
+        self.assertTrue(await watcher.receive_nothing(timeout=0.05))
+        event = await watcher.receive_json_from(timeout=1)
+        self.assertFalse(event['typing'])
+
+        # Without typing_stop, the indicator expires on its own
+        await typist.send_json_to({'type': 'typing_start'})
+        event = await watcher.receive_json_from(timeout=1)
+        self.assertTrue(event['typing'])
+        event = await watcher.receive_json_from(timeout=1)
+        self.assertFalse(event['typing'])
+
+        # The typist never receives its own indicator
+        self.assertTrue(await typist.receive_nothing(timeout=0.1))
+
+        await typist.disconnect()
+        await watcher.disconnect()
+
+    async def test_non_participant_is_rejected(self):
+        """Test that users outside the conversation cannot connect."""
+        outsider = await database_sync_to_async(User.objects.create_user)(
+            email='eve@esmt.sn',
+            username='eve',
+            password='Test123!',
+            phone_number='+221771234569'
+        )
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f'/ws/chat/{self.conversation.id}/'
+        )
+        communicator.scope['user'] = outsider
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    async def test_inbox_socket_multiplexes_conversations(self):
+        """Test that the per-user inbox socket receives events of every conversation."""
+        second = await database_sync_to_async(Conversation.objects.create)(
+            conversation_type='group',
+            name='Promo',
+            created_by=self.other
+        )
+        await database_sync_to_async(Participant.objects.create)(conversation=second, user=self.other)
+        await database_sync_to_async(Participant.objects.create)(conversation=second, user=self.user)
+
+        inbox = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/inbox/')
+        inbox.scope['user'] = self.other
+        connected, _ = await inbox.connect()
+        self.assertTrue(connected)
+        subscriptions = await inbox.receive_json_from()
+        self.assertEqual(set(subscriptions['conversation_ids']), {str(self.conversation.id), str(second.id)})
+
+        sender = await self._connect(self.user)
+        await sender.send_json_to({'type': 'chat_message', 'content': 'Salut'})
+        event = await inbox.receive_json_from()
+        await sender.receive_json_from()
+        self.assertEqual(event['type'], 'chat_message')
+        self.assertEqual(event['conversation_id'], str(self.conversation.id))
+
+        # After unsubscribing, events of that conversation are no longer delivered
+        await inbox.send_json_to({'type': 'unsubscribe', 'conversation_id': str(self.conversation.id)})
+        self.assertEqual((await inbox.receive_json_from())['type'], 'unsubscribed')
+        await sender.send_json_to({'type': 'chat_message', 'content': 'Encore'})
+        await sender.receive_json_from()
+        self.assertTrue(await inbox.receive_nothing(timeout=0.1))
+
+        await sender.disconnect()
+        await inbox.disconnect()
+
+    async def test_inbox_rejects_foreign_subscription(self):
+        """Test that the inbox socket cannot subscribe to other users' conversations."""
+        foreign = await database_sync_to_async(Conversation.objects.create)(
+            conversation_type='private',
+            created_by=self.user
+        )
+        inbox = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/inbox/')
+        inbox.scope['user'] = self.other
+        await inbox.connect()
+        await inbox.receive_json_from()
+
+        await inbox.send_json_to({'type': 'subscribe', 'conversation_id': str(foreign.id)})
+        response = await inbox.receive_json_from()
+        self.assertEqual(response['type'], 'error')
+
+        await inbox.disconnect()
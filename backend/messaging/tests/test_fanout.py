@@ -0,0 +1,111 @@
+"""
+Tests for sharded fan-out of large group conversations.
+"""
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, override_settings
+from users.models import User
+from messaging.models import Conversation, Participant
+from messaging.fanout import update_fanout, member_group
+from messaging.routing import websocket_urlpatterns
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    MESSAGING_FANOUT_SHARD_SIZE=2,
+    MESSAGING_EPHEMERAL_MAX_MEMBERS=3,
+)
+class FanoutTestCase(TestCase):
+    """Test shard layout, parallel delivery and suppression of ephemeral events."""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f'member{i}@esmt.sn',
+                username=f'member{i}',
+                password='Test123!',
+                phone_number=f'+22177123456{i}',
+                is_verified=True,
+                is_active=True
+            )
+            for i in range(5)
+        ]
+        self.conversation = Conversation.objects.create(
+            conversation_type='group',
+            name='Promo 2026',
+            created_by=self.users[0]
+        )
+
+    def _add_members(self, users):
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in users:
+                Participant.objects.update_or_create(
+                    conversation=self.conversation, user=user, defaults={'is_active': True}
+                )
+            update_fanout(self.conversation.id)
+        self.conversation.refresh_from_db()
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f'/ws/chat/{self.conversation.id}/'
+        )
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def test_layout_grows_and_never_shrinks(self):
+        """Test shard count and member count maintenance."""
+        self._add_members(self.users[:2])
+        self.assertEqual((self.conversation.member_count, self.conversation.fanout_shards), (2, 0))
+
+        self._add_members(self.users)
+        self.assertEqual((self.conversation.member_count, self.conversation.fanout_shards), (5, 3))
+
+        Participant.objects.filter(conversation=self.conversation, user__in=self.users[2:]).update(is_active=False)
+        update_fanout(self.conversation.id)
+        self.conversation.refresh_from_db()
+        self.assertEqual((self.conversation.member_count, self.conversation.fanout_shards), (2, 3))
+
+    async def test_sharded_delivery_without_ephemeral_events(self):
+        """Test that a message reaches every shard and typing/read receipts are dropped."""
+        await database_sync_to_async(self._add_members)(self.users)
+        groups = {member_group(self.conversation.id, 3, user.id) for user in self.users}
+        self.assertGreater(len(groups), 1)
+
+        sockets = [await self._connect(user) for user in self.users]
+        await sockets[0].send_json_to({'type': 'typing_start'})
+        await sockets[0].send_json_to({'type': 'chat_message', 'content': 'Bonjour à tous'})
+        for socket in sockets:
+            event = await socket.receive_json_from()
+            self.assertEqual(event['type'], 'chat_message')
+            self.assertEqual(event['message']['content'], 'Bonjour à tous')
+
+        await sockets[1].send_json_to({'type': 'message_read', 'message_id': event['message']['id']})
+        for socket in sockets:
+            self.assertTrue(await socket.receive_nothing(timeout=0.1))
+
+        for socket in sockets:
+            await socket.disconnect()
+
+    async def test_connected_members_follow_layout_change(self):
+        """Test that sockets opened before a group grows keep receiving its messages."""
+        await database_sync_to_async(self._add_members)(self.users[:2])
+        first = await self._connect(self.users[0])
+        second = await self._connect(self.users[1])
+
+        await database_sync_to_async(self._add_members)(self.users)
+        third = await self._connect(self.users[2])
+        # Let the open sockets handle fanout_changed (nothing is sent to the clients)
+        self.assertTrue(await first.receive_nothing(timeout=0.1))
+        self.assertTrue(await second.receive_nothing(timeout=0.1))
+
+        await first.send_json_to({'type': 'chat_message', 'content': 'Toujours là ?'})
+        for socket in (first, second, third):
+            event = await socket.receive_json_from()
+            self.assertEqual(event['message']['content'], 'Toujours là ?')
+
+        for socket in (first, second, third):
+            await socket.disconnect()
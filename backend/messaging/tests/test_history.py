@@ -0,0 +1,74 @@
+"""
+Tests for message history pagination.
+"""
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from messaging.models import Conversation, Participant, Message
+
+
+class MessageHistoryTestCase(TestCase):
+    """Test keyset pagination of MessageViewSet."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='alice@esmt.sn',
+            username='alice',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.conversation = Conversation.objects.create(
+            conversation_type='group',
+            name='Promo 2026',
+            created_by=self.user
+        )
+        Participant.objects.create(conversation=self.conversation, user=self.user)
+        base = timezone.now() - timedelta(hours=1)
+        # Two messages share each timestamp to exercise the id tie-breaker
+        self.messages = [
+            Message.objects.create(
+                conversation=self.conversation,
+                sender=self.user,
+                content=f'Message {i}',
+                created_at=base + timedelta(seconds=i // 2)
+            )
+            for i in range(25)
+        ]
+        self.client.force_authenticate(user=self.user)
+        self.url = f'/api/messaging/messages/?conversation={self.conversation.id}'
+
+    def _ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data]
+
+    def test_scroll_back_through_history(self):
+        """Test that before cursors walk the whole history without gaps or duplicates."""
+        seen = []
+        page = self._ids(self.client.get(f'{self.url}&page_size=10'))
+        while page:
+            seen.extend(page)
+            page = self._ids(self.client.get(f'{self.url}&page_size=10&before={page[-1]}'))
+
+        expected = sorted(self.messages, key=lambda m: (m.created_at, str(m.id)), reverse=True)
+        self.assertEqual(seen, [str(m.id) for m in expected])
+
+    def test_after_returns_only_new_messages(self):
+        """Test that a reconnecting client only receives messages newer than its cursor."""
+        newest = self._ids(self.client.get(f'{self.url}&page_size=1'))[0]
+        new_message = Message.objects.create(
+            conversation=self.conversation,
+            sender=self.user,
+            content='Nouveau'
+        )
+
+        self.assertEqual(self._ids(self.client.get(f'{self.url}&after={newest}')), [str(new_message.id)])
+
+    def test_invalid_cursor(self):
+        """Test that an unknown cursor is rejected."""
+        response = self.client.get(f'{self.url}&before=not-a-uuid')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,115 @@
+"""
+Tests for the conversation inbox.
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from users.models import User
+from messaging.models import Conversation, Participant, Message
+from messaging.utils import record_new_message
+from users.presence import touch
+
+
+class InboxTestCase(TestCase):
+    """Test the denormalized last message pointer used by the inbox."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='alice@esmt.sn',
+            username='alice',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.other = User.objects.create_user(
+            email='bob@esmt.sn',
+            username='bob',
+            password='Test123!',
+            phone_number='+221771234568',
+            is_verified=True,
+            is_active=True
+        )
+        self.conversation = Conversation.objects.create(
+            conversation_type='private',
+            created_by=self.user
+        )
+        Participant.objects.create(conversation=self.conversation, user=self.user)
+        Participant.objects.create(conversation=self.conversation, user=self.other)
+        self.client.force_authenticate(user=self.user)
+        # Record the (coalesced) last_activity write outside query measurements
+        touch(self.user.id)
+
+    def _send(self, sender, content):
+        message = Message.objects.create(
+            conversation=self.conversation,
+            sender=sender,
+            content=content
+        )
+        record_new_message(message)
+        return message
+
+    def _inbox_queries(self, table=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/messaging/conversations/')
+        self.assertEqual(response.status_code, 200)
+        queries = [q for q in ctx.captured_queries if table is None or f'FROM "{table}"' in q['sql']]
+        return response, len(queries)
+
+    def test_record_new_message_updates_pointer_and_unread(self):
+        """Test that a new message moves the pointer and bumps unread counts."""
+        message = self._send(self.other, 'Salut')
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_id, message.id)
+        self.assertEqual(self.conversation.last_message_at, message.created_at)
+        self.assertEqual(
+            Participant.objects.get(conversation=self.conversation, user=self.user).unread_count, 1
+        )
+        self.assertEqual(
+            Participant.objects.get(conversation=self.conversation, user=self.other).unread_count, 0
+        )
+
+    def test_inbox_query_count_independent_of_history(self):
+        """Test that the inbox costs the same number of queries for short and long histories."""
+        self._send(self.other, 'Premier')
+        _, short_history = self._inbox_queries()
+
+        for i in range(30):
+            self._send(self.other, f'Message {i}')
+        last = self._send(self.user, 'Dernier')
+        response, long_history = self._inbox_queries()
+
+        self.assertEqual(short_history, long_history)
+        results = response.data['results']
+        self.assertEqual(results[0]['last_message']['id'], str(last.id))
+
+    def test_inbox_query_count_independent_of_conversations(self):
+        """Test that per-user flags do not cost a query per conversation."""
+        self._send(self.other, 'Premier')
+        _, one_conversation = self._inbox_queries(table='messaging_participant')
+
+        for i in range(5):
+            conversation = Conversation.objects.create(conversation_type='group', name=f'Groupe {i}', created_by=self.other)
+            Participant.objects.create(conversation=conversation, user=self.user, is_pinned=(i == 0))
+            Participant.objects.create(conversation=conversation, user=self.other)
+        response, six_conversations = self._inbox_queries(table='messaging_participant')
+
+        self.assertEqual(one_conversation, six_conversations)
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(sum(item['is_pinned'] for item in response.data['results']), 1)
+        unread = {item['id']: item['unread_count'] for item in response.data['results']}
+        self.assertEqual(unread[str(self.conversation.id)], 1)
+
+    def test_delete_for_all_moves_pointer_back(self):
+        """Test that deleting the latest message points the inbox at the previous one."""
+        previous = self._send(self.other, 'Avant')
+        latest = self._send(self.user, 'Après')
+
+        response = self.client.post(f'/api/messaging/messages/{latest.id}/delete_for_all/?conversation={self.conversation.id}')
+        self.assertEqual(response.status_code, 200)
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_id, previous.id)
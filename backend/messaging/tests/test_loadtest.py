@@ -0,0 +1,37 @@
+"""
+Tests for the ChatConsumer load test harness.
+"""
+from channels.db import database_sync_to_async
+from django.test import TestCase, override_settings
+from messaging.loadtest import ChatLoadTest, percentile
+from messaging.models import Message
+
+
+@override_settings(CHANNEL_LAYERS={
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    }
+})
+class ChatLoadTestTestCase(TestCase):
+    """Test that the harness drives traffic and reports its measurements."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    async def test_small_run(self):
+        """Test that every message reaches every member and queries are counted."""
+        load_test = ChatLoadTest(clients=4, conversations=2, rounds=3)
+        await database_sync_to_async(load_test.setup)()
+        results = await load_test.run()
+
+        self.assertEqual(results['messages'], 12)
+        self.assertEqual(await database_sync_to_async(Message.objects.count)(), 12)
+        # Each message reaches both members of its conversation, sender included
+        self.assertEqual(results['frames']['chat_message'], 24)
+        self.assertGreater(results['queries_per_message'], 0)
+        self.assertGreater(results['messages_per_second'], 0)
+        self.assertLessEqual(results['round_trip_p50'], results['round_trip_p99'])
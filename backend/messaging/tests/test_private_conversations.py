@@ -0,0 +1,72 @@
+"""
+Tests for private conversation lookup by pair key.
+"""
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import User
+from messaging.models import Conversation, Participant
+from messaging.utils import get_or_create_private_conversation
+
+
+class PrivateConversationTestCase(TestCase):
+    """Test one private conversation per pair of users."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='alice@esmt.sn',
+            username='alice',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.other = User.objects.create_user(
+            email='bob@esmt.sn',
+            username='bob',
+            password='Test123!',
+            phone_number='+221771234568',
+            is_verified=True,
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_private_reuses_conversation_from_either_side(self):
+        """Test that both users get the same conversation."""
+        response = self.client.post('/api/messaging/conversations/create_private/', {'user_id': str(self.other.id)})
+        self.assertEqual(response.status_code, 201)
+        conversation_id = response.data['id']
+
+        response = self.client.post('/api/messaging/conversations/create_private/', {'user_id': str(self.other.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], conversation_id)
+
+        self.client.force_authenticate(user=self.other)
+        response = self.client.post('/api/messaging/conversations/create_private/', {'user_id': str(self.user.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], conversation_id)
+
+        conversation = Conversation.objects.get(id=conversation_id)
+        self.assertEqual(conversation.private_key, Conversation.make_private_key(self.other.id, self.user.id))
+        self.assertEqual(Participant.objects.filter(conversation=conversation).count(), 2)
+
+    def test_existing_conversation_is_found_with_one_query(self):
+        """Test that the lookup is a single probe on the pair key."""
+        conversation, created = get_or_create_private_conversation(self.user, self.other)
+        self.assertTrue(created)
+
+        with self.assertNumQueries(1):
+            found, created = get_or_create_private_conversation(self.other, self.user)
+        self.assertFalse(created)
+        self.assertEqual(found.id, conversation.id)
+
+    def test_database_rejects_duplicate_pair(self):
+        """Test that a second conversation for the same pair cannot be stored."""
+        get_or_create_private_conversation(self.user, self.other)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Conversation.objects.create(
+                conversation_type='private',
+                created_by=self.other,
+                private_key=Conversation.make_private_key(self.user.id, self.other.id)
+            )
@@ -0,0 +1,90 @@
+"""
+Tests for denormalized reaction summaries.
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from users.models import User
+from messaging.models import Conversation, Participant, Message
+from messaging.utils import add_message_reaction, remove_message_reaction, RECENT_REACTORS
+
+
+class ReactionSummaryTestCase(TestCase):
+    """Test reaction summaries maintained by add/remove reaction."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [
+            User.objects.create_user(
+                email=f'user{i}@esmt.sn',
+                username=f'user{i}',
+                password='Test123!',
+                phone_number=f'+22177123456{i}',
+                is_verified=True,
+                is_active=True
+            )
+            for i in range(5)
+        ]
+        self.conversation = Conversation.objects.create(conversation_type='group', name='Promo', created_by=self.users[0])
+        for user in self.users:
+            Participant.objects.create(conversation=self.conversation, user=user)
+        self.message = Message.objects.create(conversation=self.conversation, sender=self.users[0], content='Bravo !')
+        self.client.force_authenticate(user=self.users[0])
+
+    def test_summary_counts_and_recent_reactors(self):
+        """Test that counts are exact and recent reactors bounded."""
+        for user in self.users:
+            add_message_reaction(self.message, user, '👍')
+        add_message_reaction(self.message, self.users[1], '🎉')
+        self.assertIsNone(add_message_reaction(self.message, self.users[1], '🎉'))
+
+        self.message.refresh_from_db()
+        summary = self.message.reaction_summary
+        self.assertEqual(summary['👍']['count'], 5)
+        self.assertEqual(len(summary['👍']['recent']), RECENT_REACTORS)
+        self.assertEqual(summary['👍']['recent'][0]['username'], 'user4')
+        self.assertEqual(summary['🎉'], {'count': 1, 'recent': [{'user_id': str(self.users[1].id), 'username': 'user1'}]})
+
+        # Removing a recent reactor refills the list from the remaining reactions
+        remove_message_reaction(self.message, self.users[4], '👍')
+        remove_message_reaction(self.message, self.users[1], '🎉')
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.reaction_summary['👍']['count'], 4)
+        self.assertEqual(
+            [r['username'] for r in self.message.reaction_summary['👍']['recent']],
+            ['user3', 'user2', 'user1']
+        )
+        self.assertNotIn('🎉', self.message.reaction_summary)
+
+    def test_history_reads_summary_without_loading_reactions(self):
+        """Test that history pages do not load reaction rows per message."""
+        response = self.client.post(f'/api/messaging/messages/{self.message.id}/add_reaction/', {'emoji': '👍'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['reaction_summary']['👍']['count'], 1)
+
+        def history_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(f'/api/messaging/messages/?conversation={self.conversation.id}')
+            return response, len(ctx.captured_queries)
+
+        _, few_reactions = history_queries()
+        for user in self.users[1:]:
+            add_message_reaction(self.message, user, '❤️')
+        response, many_reactions = history_queries()
+
+        self.assertEqual(few_reactions, many_reactions)
+        item = response.data[0]
+        self.assertEqual(item['my_reactions'], ['👍'])
+        self.assertEqual(item['reaction_summary']['❤️']['count'], 4)
+
+    def test_full_reactor_list_on_demand(self):
+        """Test that the full list of reactors is available per emoji."""
+        for user in self.users:
+            add_message_reaction(self.message, user, '👍')
+        add_message_reaction(self.message, self.users[0], '🎉')
+
+        response = self.client.get(f'/api/messaging/messages/{self.message.id}/reactions/', {'emoji': '👍'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['results'][0]['user']['username'], 'user4')
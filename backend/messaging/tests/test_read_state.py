@@ -0,0 +1,112 @@
+"""
+Tests for per-participant read watermarks.
+"""
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from messaging.models import Conversation, Participant, Message
+from messaging.utils import record_new_message, mark_conversation_read
+
+
+class ReadWatermarkTestCase(TestCase):
+    """Test read state derived from Participant.last_read_at."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='alice@esmt.sn',
+            username='alice',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.other = User.objects.create_user(
+            email='bob@esmt.sn',
+            username='bob',
+            password='Test123!',
+            phone_number='+221771234568',
+            is_verified=True,
+            is_active=True
+        )
+        self.conversation = Conversation.objects.create(
+            conversation_type='private',
+            created_by=self.user
+        )
+        self.participant = Participant.objects.create(conversation=self.conversation, user=self.user)
+        Participant.objects.create(conversation=self.conversation, user=self.other)
+        base = timezone.now() - timedelta(minutes=10)
+        self.messages = []
+        for i in range(3):
+            message = Message.objects.create(
+                conversation=self.conversation,
+                sender=self.other,
+                content=f'Message {i}',
+                created_at=base + timedelta(minutes=i)
+            )
+            record_new_message(message)
+            self.messages.append(message)
+        self.client.force_authenticate(user=self.user)
+
+    def test_mark_read_moves_watermark_and_recomputes_unread(self):
+        """Test that reading a message marks everything before it as read."""
+        response = self.client.post(f'/api/messaging/messages/{self.messages[1].id}/mark_read/')
+        self.assertEqual(response.status_code, 200)
+
+        self.participant.refresh_from_db()
+        self.assertEqual(self.participant.last_read_message_id, self.messages[1].id)
+        self.assertEqual(self.participant.unread_count, 1)
+
+        # Re-reading an older message neither rewinds the watermark nor changes the count
+        self.client.post(f'/api/messaging/messages/{self.messages[0].id}/mark_read/')
+        self.client.post(f'/api/messaging/messages/{self.messages[0].id}/mark_read/')
+        self.participant.refresh_from_db()
+        self.assertEqual(self.participant.last_read_message_id, self.messages[1].id)
+        self.assertEqual(self.participant.unread_count, 1)
+
+    def test_history_reports_read_state(self):
+        """Test is_read_by_me and read_by derived from the watermarks."""
+        self.client.post(f'/api/messaging/messages/{self.messages[1].id}/mark_read/')
+
+        response = self.client.get(f'/api/messaging/messages/?conversation={self.conversation.id}')
+        self.assertEqual(response.status_code, 200)
+        read_state = {item['id']: item['is_read_by_me'] for item in response.data}
+        self.assertEqual(read_state, {
+            str(self.messages[0].id): True,
+            str(self.messages[1].id): True,
+            str(self.messages[2].id): False,
+        })
+        readers = {item['id']: [u['username'] for u in item['read_by']] for item in response.data}
+        self.assertEqual(readers[str(self.messages[0].id)], ['alice'])
+        self.assertEqual(readers[str(self.messages[2].id)], [])
+
+    def test_mark_conversation_read(self):
+        """Test that marking the conversation read only moves the watermark, and is_read follows it."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/messaging/conversations/{self.conversation.id}/mark_read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('UPDATE "messaging_message"')])
+
+        self.participant.refresh_from_db()
+        self.assertEqual(self.participant.unread_count, 0)
+        self.assertEqual(self.participant.last_read_message_id, self.messages[2].id)
+
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(f'/api/messaging/messages/?conversation={self.conversation.id}')
+        self.assertTrue(all(item['is_read'] for item in response.data))
+
+    def test_mark_conversation_read_with_stale_conversation(self):
+        """Test that a message newer than the caller's instance is covered by the watermark and the count."""
+        conversation = Conversation.objects.get(id=self.conversation.id)
+        message = Message.objects.create(conversation=self.conversation, sender=self.other, content='Message 3')
+        record_new_message(message)
+
+        self.assertEqual(mark_conversation_read(self.user, conversation), 1)
+        self.participant.refresh_from_db()
+        self.assertEqual(self.participant.unread_count, 0)
+        self.assertEqual(self.participant.last_read_message_id, message.id)
+        self.assertEqual(self.participant.last_read_at, message.created_at)
@@ -0,0 +1,111 @@
+"""
+Tests for sequence numbers and event resync.
+"""
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from users.models import User
+from messaging.models import Conversation, Participant, Message
+from messaging.routing import websocket_urlpatterns
+
+
+@override_settings(CHANNEL_LAYERS={
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    }
+})
+class ResyncTestCase(TestCase):
+    """Test per-conversation sequence numbers and since_seq resync."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='alice@esmt.sn',
+            username='alice',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.other = User.objects.create_user(
+            email='bob@esmt.sn',
+            username='bob',
+            password='Test123!',
+            phone_number='+221771234568',
+            is_verified=True,
+            is_active=True
+        )
+        self.conversation = Conversation.objects.create(
+            conversation_type='private',
+            created_by=self.user
+        )
+        Participant.objects.create(conversation=self.conversation, user=self.user)
+        Participant.objects.create(conversation=self.conversation, user=self.other)
+        self.client.force_authenticate(user=self.user)
+
+    def _send(self, content):
+        response = self.client.post('/api/messaging/messages/', {
+            'conversation': str(self.conversation.id),
+            'content': content
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def test_messages_and_changes_share_one_sequence(self):
+        """Test that the events endpoint replays everything after since_seq, in order."""
+        first = self._send('Premier')
+        second = self._send('Second')
+        self.assertEqual((first['seq'], second['seq']), (1, 2))
+
+        self.client.patch(f'/api/messaging/messages/{first["id"]}/', {'content': 'Premier (modifié)'})
+        self.client.post(f'/api/messaging/messages/{second["id"]}/add_reaction/', {'emoji': '👍'})
+        self.client.post(f'/api/messaging/messages/{second["id"]}/delete_for_all/')
+        third = self._send('Troisième')
+
+        response = self.client.get(f'/api/messaging/conversations/{self.conversation.id}/events/?since_seq=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['last_seq'], 6)
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual(
+            [(event['seq'], event['type']) for event in response.data['events']],
+            [(2, 'chat_message'), (3, 'message_edited'), (4, 'reaction_added'),
+             (5, 'message_deleted'), (6, 'chat_message')]
+        )
+        self.assertEqual(response.data['events'][1]['content'], 'Premier (modifié)')
+        self.assertEqual(response.data['events'][-1]['message']['id'], third['id'])
+
+        response = self.client.get(f'/api/messaging/conversations/{self.conversation.id}/events/?since_seq=6')
+        self.assertEqual(response.data['events'], [])
+
+    async def test_websocket_resync_frame(self):
+        """Test that a reconnecting socket gets the messages sent while it was away."""
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f'/ws/chat/{self.conversation.id}/'
+        )
+        communicator.scope['user'] = self.user
+        await communicator.connect()
+        await communicator.send_json_to({'type': 'chat_message', 'content': 'En ligne'})
+        live = await communicator.receive_json_from()
+        self.assertEqual(live['seq'], 1)
+        await communicator.disconnect()
+
+        # Sent while the first client was offline
+        await database_sync_to_async(self.client.force_authenticate)(user=self.other)
+        await database_sync_to_async(self._send)('Pendant la coupure')
+
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f'/ws/chat/{self.conversation.id}/'
+        )
+        communicator.scope['user'] = self.user
+        await communicator.connect()
+        await communicator.send_json_to({'type': 'resync', 'since_seq': live['seq']})
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'resync')
+        self.assertEqual([event['seq'] for event in response['events']], [2])
+        self.assertEqual(response['events'][0]['message']['content'], 'Pendant la coupure')
+        self.assertEqual(await database_sync_to_async(Message.objects.count)(), 2)
+        await communicator.disconnect()
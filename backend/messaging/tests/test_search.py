@@ -0,0 +1,71 @@
+"""
+Tests for message search.
+"""
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import User
+from messaging.models import Conversation, Participant, Message
+
+
+class MessageSearchTestCase(TestCase):
+    """Test the cross-conversation search endpoint (icontains fallback outside PostgreSQL)."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='alice@esmt.sn',
+            username='alice',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.other = User.objects.create_user(
+            email='bob@esmt.sn',
+            username='bob',
+            password='Test123!',
+            phone_number='+221771234568',
+            is_verified=True,
+            is_active=True
+        )
+        self.first = self._conversation(self.user, self.other)
+        self.second = self._conversation(self.user, self.other)
+        self.foreign = self._conversation(self.other)
+        Message.objects.create(conversation=self.first, sender=self.other, content='Le partiel de maths est lundi')
+        Message.objects.create(conversation=self.second, sender=self.user, content='Révisions de maths ce soir ?')
+        Message.objects.create(conversation=self.second, sender=self.user, content='Rendez-vous à la bibliothèque')
+        Message.objects.create(conversation=self.foreign, sender=self.other, content='Les maths, toujours les maths')
+        self.client.force_authenticate(user=self.user)
+
+    def _conversation(self, *users):
+        conversation = Conversation.objects.create(conversation_type='group', created_by=users[0])
+        for user in users:
+            Participant.objects.create(conversation=conversation, user=user)
+        return conversation
+
+    def test_search_all_my_messages(self):
+        """Test that search covers every conversation of the user, and only those."""
+        response = self.client.get('/api/messaging/messages/search/', {'q': 'maths'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        conversations = {item['conversation'] for item in response.data['results']}
+        self.assertEqual(conversations, {self.first.id, self.second.id})
+
+    def test_search_matches_every_word(self):
+        """Test that multi-word queries match messages containing all the words."""
+        response = self.client.get('/api/messaging/messages/search/', {'q': 'partiel lundi'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['content'], 'Le partiel de maths est lundi')
+
+    def test_search_within_conversation(self):
+        """Test that ?conversation= restricts the search to one conversation."""
+        response = self.client.get('/api/messaging/messages/search/', {'q': 'maths', 'conversation': str(self.second.id)})
+        self.assertEqual(response.data['count'], 1)
+
+        response = self.client.get('/api/messaging/messages/search/', {'q': 'maths', 'conversation': str(self.foreign.id)})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_search_requires_query(self):
+        """Test that too short queries are rejected."""
+        response = self.client.get('/api/messaging/messages/search/', {'q': 'a'})
+        self.assertEqual(response.status_code, 400)
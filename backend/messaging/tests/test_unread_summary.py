@@ -0,0 +1,83 @@
+"""
+Tests for the cached unread summary.
+"""
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from users.models import User
+from messaging.models import Conversation, Participant, Message
+from messaging.utils import record_new_message, get_unread_summary
+from users.presence import touch
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+class UnreadSummaryTestCase(TestCase):
+    """Test /conversations/unread_summary/ and its invalidation by the write path."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='alice@esmt.sn',
+            username='alice',
+            password='Test123!',
+            phone_number='+221771234567',
+            is_verified=True,
+            is_active=True
+        )
+        self.other = User.objects.create_user(
+            email='bob@esmt.sn',
+            username='bob',
+            password='Test123!',
+            phone_number='+221771234568',
+            is_verified=True,
+            is_active=True
+        )
+        self.conversations = []
+        for name in ('Promo', 'Projet'):
+            conversation = Conversation.objects.create(conversation_type='group', name=name, created_by=self.other)
+            Participant.objects.create(conversation=conversation, user=self.user)
+            Participant.objects.create(conversation=conversation, user=self.other)
+            self.conversations.append(conversation)
+        self.client.force_authenticate(user=self.user)
+        touch(self.user.id)
+
+    def _send(self, conversation, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            message = Message.objects.create(conversation=conversation, sender=self.other, content=content)
+            record_new_message(message)
+        return message
+
+    def _summary(self):
+        response = self.client.get('/api/messaging/conversations/unread_summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_summary_is_cached_and_invalidated_by_writes(self):
+        """Test that the summary is served from the cache until a write changes it."""
+        self._send(self.conversations[0], 'Un')
+        self._send(self.conversations[0], 'Deux')
+        self._send(self.conversations[1], 'Trois')
+
+        self.assertEqual(self._summary(), {
+            'total': 3,
+            'conversations': {str(self.conversations[0].id): 2, str(self.conversations[1].id): 1}
+        })
+        with self.assertNumQueries(0):
+            get_unread_summary(self.user)
+
+        # A new message invalidates the recipients' summary
+        self._send(self.conversations[1], 'Quatre')
+        self.assertEqual(self._summary()['total'], 4)
+
+        # Reading a conversation invalidates the reader's summary
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/messaging/conversations/{self.conversations[0].id}/mark_read/')
+        self.assertEqual(self._summary(), {
+            'total': 2,
+            'conversations': {str(self.conversations[1].id): 2}
+        })
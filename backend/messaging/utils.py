@@ -0,0 +1,374 @@
+"""
+Utility functions for messaging.
+"""
+import logging
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from .models import Conversation, Participant, Message, MessageReaction, ConversationEvent
+
+logger = logging.getLogger(__name__)
+
+RECENT_REACTORS = 3  # reactors kept per emoji in Message.reaction_summary
+UNREAD_SUMMARY_TTL = 300  # seconds, safety net for changes that do not invalidate the summary
+
+
+def record_new_message(message):
+    """
+    Update conversation state after a message has been inserted.
+    Moves the conversation's last_message pointer and bumps unread counts
+    of the other active participants in a single transaction.
+    Joins the caller's transaction when there is one, without a savepoint.
+    """
+    with transaction.atomic(savepoint=False):
+        # Only move the pointer forward, so concurrent writers cannot rewind it
+        Conversation.objects.filter(
+            id=message.conversation_id
+        ).filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.created_at)
+        ).update(
+            last_message=message,
+            last_message_at=message.created_at
+        )
+
+        Participant.objects.filter(
+            conversation_id=message.conversation_id,
+            is_active=True
+        ).exclude(user_id=message.sender_id).update(unread_count=F('unread_count') + 1)
+
+        invalidate_conversation_unread_summaries(message.conversation_id)
+
+
+def refresh_last_message(conversation_id):
+    """
+    Recompute the last_message pointer of a conversation.
+    Used when the current last message is deleted.
+    """
+    last_message = Message.objects.filter(
+        conversation_id=conversation_id,
+        deleted_at__isnull=True,
+        is_deleted_for_all=False
+    ).order_by('-created_at').only('id', 'created_at').first()
+
+    Conversation.objects.filter(id=conversation_id).update(
+        last_message=last_message
+    )
+    return last_message
+
+
+def advance_read_watermark(user, message):
+    """
+    Advance the user's read watermark up to message.
+    The watermark only moves forward, and the unread count is recomputed from it
+    in the same UPDATE so it can never drift or go negative.
+    Returns True if the watermark moved.
+    """
+    unread = Message.objects.filter(
+        conversation_id=message.conversation_id,
+        created_at__gt=message.created_at,
+        is_deleted_for_all=False
+    ).exclude(sender=user).order_by().values('conversation_id').annotate(
+        total=Count('id')
+    ).values('total')
+
+    updated = Participant.objects.filter(
+        conversation_id=message.conversation_id,
+        user=user,
+        is_active=True
+    ).filter(
+        Q(last_read_at__isnull=True) | Q(last_read_at__lt=message.created_at)
+    ).update(
+        last_read_message=message,
+        last_read_at=message.created_at,
+        unread_count=Coalesce(Subquery(unread), 0)
+    )
+    if updated:
+        invalidate_unread_summaries([user.id])
+    return updated > 0
+
+
+def mark_conversation_read(user, conversation):
+    """
+    Move the user's read watermark to the end of the conversation.
+    The last message is read from the conversation row in the same UPDATE that
+    clears the unread count, so a message arriving meanwhile (possibly newer than
+    the caller's conversation instance) stays unread on both.
+    """
+    last_message = Conversation.objects.filter(id=OuterRef('conversation_id'))
+    updated = Participant.objects.filter(
+        conversation=conversation,
+        user=user,
+        is_active=True
+    ).update(
+        last_read_message_id=Subquery(last_message.values('last_message_id')[:1]),
+        last_read_at=Coalesce(Subquery(last_message.values('last_message_at')[:1]), F('last_read_at')),
+        unread_count=0
+    )
+    if updated:
+        invalidate_unread_summaries([user.id])
+    return updated
+
+
+def get_or_create_private_conversation(user, other_user):
+    """
+    Return the private conversation between two users, creating it if needed.
+    Looked up by its canonical pair key; the unique constraint on that key
+    makes concurrent creations for the same pair resolve to one conversation.
+
+    Returns:
+        tuple: (Conversation, created)
+    """
+    key = Conversation.make_private_key(user.id, other_user.id)
+    existing = Conversation.objects.filter(private_key=key).first()
+    if existing:
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            conversation = Conversation.objects.create(
+                conversation_type='private',
+                created_by=user,
+                private_key=key
+            )
+            Participant.objects.bulk_create([
+                Participant(conversation=conversation, user=user),
+                Participant(conversation=conversation, user=other_user),
+            ])
+    except IntegrityError:
+        # Another request created the conversation in the meantime
+        return Conversation.objects.get(private_key=key), False
+    return conversation, True
+
+
+def viewer_participant_prefetch(user):
+    """
+    Prefetch the given user's own active Participant row of each conversation
+    into conversation.viewer_participants (read by ConversationSerializer).
+    """
+    return Prefetch(
+        'participants',
+        queryset=Participant.objects.filter(user=user, is_active=True),
+        to_attr='viewer_participants'
+    )
+
+
+def next_seq(conversation_id):
+    """
+    Allocate the next sequence number of a conversation.
+    Must run inside a transaction: the conversation row stays locked until
+    commit, so concurrent writers get consecutive numbers and a rolled back
+    write gives its number back.
+    """
+    Conversation.objects.filter(id=conversation_id).update(last_seq=F('last_seq') + 1)
+    return Conversation.objects.filter(id=conversation_id).values_list('last_seq', flat=True).get()
+
+
+def record_event(message, event_type, payload=None):
+    """
+    Append an event about an existing message to its conversation's log.
+    Joins the caller's transaction when there is one, without a savepoint.
+
+    Returns:
+        ConversationEvent instance
+    """
+    with transaction.atomic(savepoint=False):
+        return ConversationEvent.objects.create(
+            conversation_id=message.conversation_id,
+            seq=next_seq(message.conversation_id),
+            event_type=event_type,
+            message=message,
+            payload=payload or {}
+        )
+
+
+def message_frame(message):
+    """Return the chat_message payload of a message, as sent over WebSocket."""
+    sender = message.sender
+    return {
+        'id': str(message.id),
+        'seq': message.seq,
+        'sender': sender.username,
+        'sender_id': str(sender.id),
+        'sender_first_name': sender.first_name or '',
+        'sender_last_name': sender.last_name or '',
+        'content': message.content,
+        'message_type': message.message_type,
+        'attachment_url': message.attachment_url,
+        'attachment_name': message.attachment_name,
+        'attachment_size': message.attachment_size,
+        'attachment_thumbnail_url': message.attachment_thumbnail_url,
+        'created_at': message.created_at.isoformat(),
+        'edited_at': message.edited_at.isoformat() if message.edited_at else None,
+        'is_deleted_for_all': message.is_deleted_for_all,
+        'is_read': message.is_read,
+    }
+
+
+def get_events_since(conversation_id, since_seq, limit=200):
+    """
+    Return the events of a conversation after since_seq, in sequence order:
+    new messages as chat_message frames, and edits, deletions and reactions
+    as their own frames. At most limit events are returned.
+
+    Returns:
+        tuple: (list of events, has_more)
+    """
+    messages = list(
+        Message.objects.filter(conversation_id=conversation_id, seq__gt=since_seq)
+        .select_related('sender').order_by('seq')[:limit + 1]
+    )
+    changes = list(
+        ConversationEvent.objects.filter(conversation_id=conversation_id, seq__gt=since_seq)
+        .order_by('seq')[:limit + 1]
+    )
+    events = [
+        {'type': 'chat_message', 'seq': message.seq, 'message': message_frame(message)}
+        for message in messages
+    ] + [
+        {'type': event.event_type, 'seq': event.seq, 'message_id': str(event.message_id), **event.payload}
+        for event in changes
+    ]
+    events.sort(key=lambda event: event['seq'])
+    return events[:limit], len(events) > limit
+
+
+def add_message_reaction(message, user, emoji):
+    """
+    Add a user's reaction to a message and update its reaction summary.
+    The message row is locked while its summary is rewritten, so concurrent
+    reactions cannot overwrite each other.
+
+    Returns:
+        ConversationEvent instance, or None if the reaction already existed
+    """
+    with transaction.atomic():
+        reaction, created = MessageReaction.objects.get_or_create(
+            message=message,
+            user=user,
+            emoji=emoji
+        )
+        if not created:
+            return None
+
+        summary = Message.objects.select_for_update().values_list('reaction_summary', flat=True).get(id=message.id)
+        entry = summary.setdefault(emoji, {'count': 0, 'recent': []})
+        entry['count'] += 1
+        entry['recent'] = [
+            {'user_id': str(user.id), 'username': user.username}
+        ] + [r for r in entry['recent'] if r['user_id'] != str(user.id)][:RECENT_REACTORS - 1]
+        Message.objects.filter(id=message.id).update(reaction_summary=summary)
+        message.reaction_summary = summary
+
+        return record_event(message, 'reaction_added', {
+            'reaction': {
+                'id': str(reaction.id),
+                'user_id': str(user.id),
+                'username': user.username,
+                'emoji': emoji,
+            },
+            'reaction_summary': summary,
+        })
+
+
+def remove_message_reaction(message, user, emoji):
+    """
+    Remove a user's reaction from a message and update its reaction summary.
+
+    Returns:
+        ConversationEvent instance, or None if there was no such reaction
+    """
+    with transaction.atomic():
+        deleted, _ = MessageReaction.objects.filter(message=message, user=user, emoji=emoji).delete()
+        if not deleted:
+            return None
+
+        summary = Message.objects.select_for_update().values_list('reaction_summary', flat=True).get(id=message.id)
+        entry = summary.get(emoji, {'count': 1, 'recent': []})
+        if entry['count'] <= 1:
+            summary.pop(emoji, None)
+        else:
+            entry['count'] -= 1
+            if any(r['user_id'] == str(user.id) for r in entry['recent']):
+                # Refill the recent reactors from the remaining reactions
+                entry['recent'] = [
+                    {'user_id': str(user_id), 'username': username}
+                    for user_id, username in MessageReaction.objects.filter(
+                        message=message, emoji=emoji
+                    ).order_by('-created_at').values_list('user_id', 'user__username')[:RECENT_REACTORS]
+                ]
+            summary[emoji] = entry
+        Message.objects.filter(id=message.id).update(reaction_summary=summary)
+        message.reaction_summary = summary
+
+        return record_event(message, 'reaction_removed', {
+            'user_id': str(user.id),
+            'emoji': emoji,
+            'reaction_summary': summary,
+        })
+
+
+def _unread_summary_key(user_id):
+    return f'messaging:unread_summary:{user_id}'
+
+
+def get_unread_summary(user):
+    """
+    Return the user's unread totals: {'total': n, 'conversations': {id: n}}.
+    Served from the cache; rebuilt with one query after a write invalidated it.
+    """
+    key = _unread_summary_key(user.id)
+    try:
+        summary = cache.get(key)
+        if summary is not None:
+            return summary
+    except Exception as e:
+        logger.warning(f"Error reading unread summary for user {user.id}: {str(e)}")
+
+    counts = {
+        str(conversation_id): unread_count
+        for conversation_id, unread_count in Participant.objects.filter(
+            user=user,
+            is_active=True,
+            unread_count__gt=0
+        ).values_list('conversation_id', 'unread_count')
+    }
+    summary = {'total': sum(counts.values()), 'conversations': counts}
+    try:
+        cache.set(key, summary, UNREAD_SUMMARY_TTL)
+    except Exception as e:
+        logger.warning(f"Error caching unread summary for user {user.id}: {str(e)}")
+    return summary
+
+
+def invalidate_unread_summaries(user_ids):
+    """
+    Drop the cached unread summaries of the given users once the current
+    transaction commits, so they are never rebuilt from uncommitted counts.
+    """
+    keys = [_unread_summary_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+
+    def invalidate():
+        try:
+            cache.delete_many(keys)
+        except Exception as e:
+            logger.warning(f"Error invalidating unread summaries: {str(e)}")
+
+    transaction.on_commit(invalidate)
+
+
+def invalidate_conversation_unread_summaries(conversation_id):
+    """Drop the cached unread summaries of every active participant of a conversation."""
+    def invalidate():
+        user_ids = Participant.objects.filter(
+            conversation_id=conversation_id,
+            is_active=True
+        ).values_list('user_id', flat=True)
+        try:
+            cache.delete_many([_unread_summary_key(user_id) for user_id in user_ids])
+        except Exception as e:
+            logger.warning(f"Error invalidating unread summaries of conversation {conversation_id}: {str(e)}")
+
+    transaction.on_commit(invalidate)
@@ -3,16 +3,38 @@ Views for messaging app.
 """
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import Q, Count
 from django.utils import timezone
-from .models import Conversation, Participant, Message
-from .serializers import ConversationSerializer, MessageSerializer, ParticipantSerializer
+from .models import Conversation, Participant, Message, ArchivedMessage, Broadcast, Attachment, AttachmentUpload
+from .serializers import (
+    ConversationSerializer, MessageSerializer, MessageReactionSerializer, ParticipantSerializer,
+    BroadcastSerializer, AttachmentSerializer, AttachmentUploadSerializer
+)
+from .attachments import (
+    UPLOAD_CHUNK_SIZE, validate_attachment, stage_file, register_staged_file, schedule_attachment,
+    dispatch_attachment, append_upload_chunk, hash_staged_file, upload_staging_path, record_upload,
+    accessible_attachments, schedule_upload_cleanup
+)
+from .broadcast import get_broadcast_recipients, dispatch_broadcast
+from .search import rank_messages, filter_messages
+from .archive import HotFirstKeysetPagination
+from .fanout import update_fanout
+from .utils import (
+    record_new_message, refresh_last_message, advance_read_watermark, mark_conversation_read,
+    get_or_create_private_conversation, viewer_participant_prefetch, next_seq, record_event,
+    get_events_since, add_message_reaction, remove_message_reaction, get_unread_summary
+)
 from users.models import User
+from core.pagination import CustomPageNumberPagination
 from users.permissions import IsActiveAndVerified, IsActiveAndVerifiedOrReadOnly
 import os
+import uuid
 
 
 class ConversationViewSet(viewsets.ModelViewSet):
@@ -42,10 +64,13 @@ class ConversationViewSet(viewsets.ModelViewSet):
             
             queryset = Conversation.objects.filter(
                 id__in=conversation_ids
-            ).distinct().select_related('created_by', 'group').prefetch_related(
+            ).distinct().select_related(
+                'created_by', 'created_by__profile', 'group', 'last_message', 'last_message__sender'
+            ).prefetch_related(
                 'participants',
                 'participants__user',
-                'messages'
+                'participants__user__profile',
+                viewer_participant_prefetch(self.request.user)
             )
             
             # Filter by conversation type if requested
@@ -74,6 +99,11 @@ class ConversationViewSet(viewsets.ModelViewSet):
             user=self.request.user
         )
     
+    @action(detail=False, methods=['get'])
+    def unread_summary(self, request):
+        """Get total and per-conversation unread counts of the current user (cached)."""
+        return Response(get_unread_summary(request.user), status=status.HTTP_200_OK)
+    
     @action(detail=False, methods=['post'])
     def create_private(self, request):
         """Create a private conversation with another user."""
@@ -93,32 +123,18 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Check if private conversation already exists
-        existing = Conversation.objects.filter(
-            conversation_type='private',
-            participants__user=request.user,
-            participants__is_active=True
-        ).filter(
-            participants__user=other_user,
-            participants__is_active=True
-        ).distinct().first()
-        
-        if existing:
-            serializer = self.get_serializer(existing)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        
-        # Create new private conversation
-        conversation = Conversation.objects.create(
-            conversation_type='private',
-            created_by=request.user
-        )
-        
-        # Add both users as participants
-        Participant.objects.create(conversation=conversation, user=request.user)
-        Participant.objects.create(conversation=conversation, user=other_user)
+        if other_user.id == request.user.id:
+            return Response(
+                {'error': 'Cannot create a private conversation with yourself.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
+        conversation, created = get_or_create_private_conversation(request.user, other_user)
         serializer = self.get_serializer(conversation)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
     
     @action(detail=True, methods=['post'])
     def add_participant(self, request, pk=None):
@@ -156,6 +172,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
             participant.is_active = True
             participant.left_at = None
             participant.save()
+        update_fanout(conversation.id)
         
         serializer = ParticipantSerializer(participant)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -205,24 +222,26 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 user=request.user,
                 defaults={'is_active': True}
             )
-            if not part_created and not participant.is_active:
+            reactivated = not part_created and not participant.is_active
+            if reactivated:
                 participant.is_active = True
                 participant.left_at = None
                 participant.save()
+            if part_created or reactivated:
+                update_fanout(conversation.id)
             
             # Refresh conversation from DB to ensure participant is included
             conversation.refresh_from_db()
             
             # Reload conversation with all necessary relations for serialization
             conversation = Conversation.objects.select_related(
-                'created_by', 'created_by__profile', 'group', 'group__creator'
+                'created_by', 'created_by__profile', 'group', 'group__creator',
+                'last_message', 'last_message__sender'
             ).prefetch_related(
                 'participants',
                 'participants__user',
                 'participants__user__profile',
-                'messages',
-                'messages__sender',
-                'messages__sender__profile'
+                viewer_participant_prefetch(request.user)
             ).get(id=conversation.id)
             
             # Serialize with proper context
@@ -247,24 +266,36 @@ class ConversationViewSet(viewsets.ModelViewSet):
         """Mark all messages in conversation as read."""
         conversation = self.get_object()
         
-        participant = Participant.objects.get(
-            conversation=conversation,
-            user=request.user,
-            is_active=True
-        )
-        
-        # Mark all messages as read
-        Message.objects.filter(
-            conversation=conversation
-        ).exclude(sender=request.user).update(is_read=True)
-        
-        # Update participant
-        participant.last_read_at = timezone.now()
-        participant.unread_count = 0
-        participant.save()
+        # Move the participant's read watermark to the end of the conversation
+        # (is_read, read_by and is_read_by_me of messages are derived from the watermarks)
+        if not mark_conversation_read(request.user, conversation):
+            return Response({'error': 'Vous n\'êtes pas participant de cette conversation.'}, status=status.HTTP_404_NOT_FOUND)
         
         return Response({'message': 'Conversation marked as read.'}, status=status.HTTP_200_OK)
     
+    @action(detail=True, methods=['get'])
+    def events(self, request, pk=None):
+        """
+        Return the events missed since a sequence number (?since_seq=), so a
+        reconnecting client can catch up without reloading the history.
+        """
+        conversation = self.get_object()
+        try:
+            since_seq = int(request.query_params.get('since_seq', 0))
+        except ValueError:
+            return Response(
+                {'error': 'since_seq must be an integer.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        events, has_more = get_events_since(conversation.id, since_seq)
+        return Response({
+            'conversation_id': str(conversation.id),
+            'last_seq': max([conversation.last_seq] + [event['seq'] for event in events]),
+            'events': events,
+            'has_more': has_more
+        }, status=status.HTTP_200_OK)
+    
     @action(detail=True, methods=['post'])
     def pin(self, request, pk=None):
         """Pin or unpin a conversation."""
@@ -345,10 +376,15 @@ class ConversationViewSet(viewsets.ModelViewSet):
 class MessageViewSet(viewsets.ModelViewSet):
     """ViewSet for messages."""
     serializer_class = MessageSerializer
+    pagination_class = HotFirstKeysetPagination
     permission_classes = [IsAuthenticated, IsActiveAndVerifiedOrReadOnly]
     
     def list(self, request, *args, **kwargs):
-        """List messages with improved error handling."""
+        """
+        List messages of a conversation, newest first.
+        Use ?before=<message_id> to scroll back in history and ?after=<message_id>
+        to fetch only messages newer than the last one a client has seen.
+        """
         try:
             # Ensure conversation_id is provided
             conversation_id = request.query_params.get('conversation')
@@ -358,12 +394,15 @@ class MessageViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Get queryset
+            # Get queryset and take one keyset page
             queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
             
             # Serialize with context
-            serializer = self.get_serializer(queryset, many=True, context={'request': request})
-            return Response(serializer.data)
+            serializer = self.get_serializer(page, many=True, context={'request': request})
+            return self.get_paginated_response(serializer.data)
+        except APIException:
+            raise
         except Exception as e:
             import logging
             import traceback
@@ -402,41 +441,46 @@ class MessageViewSet(viewsets.ModelViewSet):
                     is_deleted_for_all=False
                 )
                 
-                # Add search filter if provided
+                # Add search filter if provided (full-text index on PostgreSQL)
                 if search_query:
-                    queryset = queryset.filter(content__icontains=search_query)
-                
-                # Apply select_related and prefetch_related
-                queryset = queryset.select_related('sender').prefetch_related(
-                    'read_by',
-                    'reactions',
-                    'reactions__user'
+                    queryset = filter_messages(queryset, search_query)
+            elif self.action != 'list':
+                # Detail actions (mark_read, reactions, edit...) are addressed by message id only
+                queryset = Message.objects.filter(
+                    conversation__participants__user=self.request.user,
+                    conversation__participants__is_active=True
                 )
-                
-                # Order and limit - use list slicing to avoid QuerySet issues
-                queryset = queryset.order_by('-created_at')
-                
-                # Convert to list and back to queryset to avoid slicing issues
-                # This ensures we can still use prefetch_related data
-                message_ids = list(queryset.values_list('id', flat=True)[:100])
-                
-                if message_ids:
-                    # Return queryset with prefetch for the limited IDs
-                    return Message.objects.filter(id__in=message_ids).select_related('sender').prefetch_related(
-                        'read_by',
-                        'reactions',
-                        'reactions__user'
-                    ).order_by('-created_at')
-                else:
-                    return Message.objects.none()
+            else:
+                return Message.objects.none()
             
-            return Message.objects.none()
+            # Slicing is done by the keyset pagination, so the queryset stays filterable
+            return queryset.select_related('sender').order_by('-created_at', '-id')
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Error in get_queryset for messages: {str(e)}", exc_info=True)
             return Message.objects.none()
     
+    def get_archive_queryset(self):
+        """
+        Return the archived messages of the listed conversation, read once a
+        history page runs past the hot table. Search covers hot messages only.
+        """
+        conversation_id = self.request.query_params.get('conversation')
+        if self.action != 'list' or not conversation_id or self.request.query_params.get('search', '').strip():
+            return None
+        if not Participant.objects.filter(
+            conversation_id=conversation_id,
+            user=self.request.user,
+            is_active=True
+        ).exists():
+            return None
+        return ArchivedMessage.objects.filter(
+            conversation_id=conversation_id,
+            deleted_at__isnull=True,
+            is_deleted_for_all=False
+        ).select_related('sender')
+    
     def get_parsers(self):
         """Allow file uploads."""
         # Check if action exists before accessing it (action may not be set yet during initialization)
@@ -460,7 +504,33 @@ class MessageViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("You are not a participant in this conversation.")
         
-        message = serializer.save(sender=self.request.user)
+        # Copy the stored file of an uploaded attachment; if it is still processing,
+        # process_attachment fills the URLs in once it is stored
+        attachment = serializer.validated_data.get('attachment')
+        attachment_fields = {}
+        if attachment:
+            if not accessible_attachments(self.request.user).filter(id=attachment.id).exists():
+                from rest_framework.exceptions import PermissionDenied
+                raise PermissionDenied("You do not have access to this attachment.")
+            attachment_fields = {
+                'attachment_url': attachment.url or None,
+                'attachment_thumbnail_url': attachment.thumbnail_url or None,
+                'attachment_size': attachment.size,
+            }
+        
+        with transaction.atomic():
+            message = serializer.save(sender=self.request.user, seq=next_seq(conversation.id), **attachment_fields)
+            # Update conversation last message and unread counts of other participants
+            record_new_message(message)
+        
+        if attachment and attachment.status != 'ready':
+            # Stored between the check above and the commit: fill the URLs in now
+            attachment.refresh_from_db()
+            if attachment.status == 'ready':
+                Message.objects.filter(id=message.id).update(
+                    attachment_url=attachment.url,
+                    attachment_thumbnail_url=attachment.thumbnail_url or None
+                )
         
         # Create notification for other participants (except sender)
         # Wrap in try-except to prevent notification errors from blocking message creation
@@ -489,76 +559,205 @@ class MessageViewSet(viewsets.ModelViewSet):
             logger.error(f"Error creating notifications for message {message.id}: {str(e)}", exc_info=True)
             # Message is already created, so we continue
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def search(self, request):
+        """
+        Search the current user's messages, ranked by relevance.
+        Searches all conversations of the user, or one with ?conversation=.
+        """
+        query = request.query_params.get('q', '').strip()
+        if len(query) < 2:
+            return Response(
+                {'error': 'La recherche doit contenir au moins 2 caractères.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        conversation_ids = Participant.objects.filter(
+            user=request.user,
+            is_active=True
+        ).values_list('conversation_id', flat=True)
+        queryset = Message.objects.filter(
+            conversation_id__in=conversation_ids,
+            deleted_at__isnull=True,
+            is_deleted_for_all=False
+        )
+        conversation_id = request.query_params.get('conversation')
+        if conversation_id:
+            try:
+                queryset = queryset.filter(conversation_id=uuid.UUID(conversation_id))
+            except ValueError:
+                return Response(
+                    {'error': 'Invalid conversation id.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        queryset = rank_messages(queryset, query).select_related('sender')
+        paginator = CustomPageNumberPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    def _attachment_response(self, attachment, name, request):
+        """Describe an attachment for the client; 202 while it is still being stored, 422 if storing failed."""
+        if attachment.status == 'failed':
+            return Response({
+                'error': 'Le fichier n\'a pas pu être enregistré. Veuillez le renvoyer.',
+                'id': str(attachment.id),
+                'status': attachment.status,
+            }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        data = AttachmentSerializer(attachment, context={'request': request}).data
+        return Response({
+            'id': data['id'],
+            'url': data['url'] or None,
+            'thumbnail_url': data['thumbnail_url'] or None,
+            'name': name,
+            'size': attachment.size,
+            'content_type': attachment.content_type,
+            'sha256': attachment.sha256,
+            'status': attachment.status,
+        }, status=status.HTTP_200_OK if attachment.status == 'ready' else status.HTTP_202_ACCEPTED)
+    
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated], parser_classes=[MultiPartParser, FormParser])
     def upload_attachment(self, request):
-        """Upload a file attachment for a message."""
+        """
+        Upload a file attachment for a message.
+        Files are stored once per content hash; large files are stored in the
+        background and answered with 202 and the attachment id to send with the message.
+        """
         file = request.FILES.get('file')
         if not file:
             return Response({'error': 'Aucun fichier fourni.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Validate file size (max 10MB)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if file.size > max_size:
-            return Response({'error': 'Le fichier est trop volumineux (max 10MB).'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Validate file type
-        allowed_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'application/pdf', 'application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']
-        if file.content_type not in allowed_types:
-            return Response({'error': 'Type de fichier non autorisé.'}, status=status.HTTP_400_BAD_REQUEST)
+        error = validate_attachment(file.content_type, file.size)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Try to upload to Cloudinary if available
-            try:
-                import cloudinary
-                import cloudinary.uploader
-                
-                # Upload to Cloudinary
-                folder = 'campuslink/message_attachments'
-                upload_result = cloudinary.uploader.upload(
-                    file,
-                    folder=folder,
-                    resource_type='auto'  # Auto-detect image, video, or raw
-                )
-                
-                attachment_url = upload_result.get('secure_url') or upload_result.get('url')
-                file_size = upload_result.get('bytes', file.size)
-                
-                return Response({
-                    'url': attachment_url,
-                    'name': file.name,
-                    'size': file_size,
-                    'content_type': file.content_type
-                }, status=status.HTTP_200_OK)
-                
-            except (ImportError, Exception) as e:
-                # Fallback: save to media folder if Cloudinary is not available
-                from django.core.files.storage import default_storage
-                from django.conf import settings
-                
-                # Create directory if it doesn't exist
-                upload_path = f'message_attachments/{file.name}'
-                file_path = default_storage.save(upload_path, file)
-                
-                # Get the URL
-                if hasattr(settings, 'MEDIA_URL'):
-                    base_url = request.build_absolute_uri('/')[:-1]  # Remove trailing slash
-                    attachment_url = f"{base_url}{settings.MEDIA_URL}{file_path}"
-                else:
-                    attachment_url = request.build_absolute_uri(default_storage.url(file_path))
-                
-                return Response({
-                    'url': attachment_url,
-                    'name': file.name,
-                    'size': file.size,
-                    'content_type': file.content_type
-                }, status=status.HTTP_200_OK)
-                
+            path, sha256, size = stage_file(file)
+            attachment, created = register_staged_file(path, sha256, file.content_type, size, request.user)
+            record_upload(attachment, request.user, file.name)
+            if created:
+                schedule_attachment(attachment)
+            return self._attachment_response(attachment, file.name, request)
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Error uploading attachment: {str(e)}", exc_info=True)
             return Response({'error': f'Erreur lors de l\'upload: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated], url_path='attachments/uploads')
+    def start_upload(self, request):
+        """
+        Start a resumable upload.
+        If the client sends the sha256 of a stored file it already has access to
+        (see accessible_attachments), the attachment is returned right away and
+        no bytes need to be sent; other files are always uploaded and hashed.
+        """
+        serializer = AttachmentUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        error = validate_attachment(data['content_type'], data['total_size'])
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        sha256 = data.get('sha256', '').lower()
+        if sha256:
+            attachment = accessible_attachments(request.user).filter(sha256=sha256, status='ready').first()
+            if attachment:
+                return self._attachment_response(attachment, data['file_name'], request)
+        
+        upload = serializer.save(user=request.user, sha256=sha256)
+        schedule_upload_cleanup()
+        return Response(
+            {**AttachmentUploadSerializer(upload).data, 'chunk_size': UPLOAD_CHUNK_SIZE},
+            status=status.HTTP_201_CREATED
+        )
+    
+    def _get_upload(self, request, upload_id):
+        try:
+            return AttachmentUpload.objects.select_related('attachment').get(
+                id=uuid.UUID(upload_id), user=request.user
+            )
+        except (ValueError, AttachmentUpload.DoesNotExist):
+            return None
+    
+    @action(
+        detail=False, methods=['get', 'put'], permission_classes=[IsAuthenticated],
+        url_path=r'attachments/uploads/(?P<upload_id>[^/.]+)', parser_classes=[MultiPartParser, FormParser]
+    )
+    def upload_chunk(self, request, upload_id=None):
+        """
+        GET: state of a resumable upload, to resume from received_bytes.
+        PUT: append a chunk (multipart 'chunk' file) at 'offset'; a wrong offset is answered with 409.
+        """
+        upload = self._get_upload(request, upload_id)
+        if not upload:
+            return Response({'error': 'Upload introuvable.'}, status=status.HTTP_404_NOT_FOUND)
+        if request.method == 'GET':
+            return Response(AttachmentUploadSerializer(upload, context={'request': request}).data)
+        
+        if upload.status != 'uploading':
+            return Response({'error': 'Upload déjà terminé.'}, status=status.HTTP_400_BAD_REQUEST)
+        chunk = request.FILES.get('chunk')
+        try:
+            offset = int(request.data.get('offset', ''))
+        except ValueError:
+            offset = None
+        if not chunk or offset is None:
+            return Response({'error': 'chunk and offset are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if offset + chunk.size > upload.total_size:
+            return Response({'error': 'Le fichier dépasse la taille annoncée.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            upload = AttachmentUpload.objects.select_for_update().get(id=upload.id)
+            if not append_upload_chunk(upload, offset, chunk):
+                return Response(
+                    {'error': 'Offset invalide.', 'received_bytes': upload.received_bytes},
+                    status=status.HTTP_409_CONFLICT
+                )
+        return Response({'id': str(upload.id), 'received_bytes': upload.received_bytes, 'total_size': upload.total_size})
+    
+    @action(
+        detail=False, methods=['post'], permission_classes=[IsAuthenticated],
+        url_path=r'attachments/uploads/(?P<upload_id>[^/.]+)/complete'
+    )
+    def complete_upload(self, request, upload_id=None):
+        """Finish a resumable upload: check the file, then store it once per content hash."""
+        upload = self._get_upload(request, upload_id)
+        if not upload:
+            return Response({'error': 'Upload introuvable.'}, status=status.HTTP_404_NOT_FOUND)
+        if upload.status == 'completed':
+            return self._attachment_response(upload.attachment, upload.file_name, request)
+        if upload.received_bytes != upload.total_size:
+            return Response(
+                {'error': 'Upload incomplet.', 'received_bytes': upload.received_bytes},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        path = upload_staging_path(upload.id)
+        sha256 = hash_staged_file(path)
+        if upload.sha256 and upload.sha256 != sha256:
+            return Response({'error': 'Le contenu ne correspond pas au hash annoncé.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        attachment, created = register_staged_file(path, sha256, upload.content_type, upload.total_size, request.user)
+        AttachmentUpload.objects.filter(id=upload.id).update(status='completed', attachment=attachment, sha256=sha256)
+        if created:
+            # The request already spent its time receiving chunks, always store in the background
+            dispatch_attachment(attachment)
+        return self._attachment_response(attachment, upload.file_name, request)
+    
+    @action(
+        detail=False, methods=['get'], permission_classes=[IsAuthenticated],
+        url_path=r'attachments/(?P<attachment_id>[0-9a-f-]{36})'
+    )
+    def attachment_status(self, request, attachment_id=None):
+        """Get the processing status of an attachment (uploaders and members of conversations sharing it)."""
+        try:
+            attachment = accessible_attachments(request.user).get(id=attachment_id)
+        except Attachment.DoesNotExist:
+            return Response({'error': 'Pièce jointe introuvable.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(AttachmentSerializer(attachment, context={'request': request}).data)
+    
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def broadcast(self, request):
         """Send broadcast message to all students or specific class (for class leaders/admins)."""
@@ -566,8 +765,6 @@ class MessageViewSet(viewsets.ModelViewSet):
         logger = logging.getLogger(__name__)
         
         try:
-            from users.permissions import IsAdminOrClassLeader
-            
             # Check permissions
             if not (request.user.role == 'admin' or request.user.role == 'class_leader'):
                 return Response(
@@ -587,114 +784,39 @@ class MessageViewSet(viewsets.ModelViewSet):
             target_field_of_study = request.data.get('field_of_study')
             target_academic_year = request.data.get('academic_year')
             
-            logger.info(f"Broadcast request from user {request.user.id}, type: {broadcast_type}")
-            
-            # Get target users
-            target_users = User.objects.filter(role='student', is_active=True, is_verified=True)
+            if broadcast_type not in dict(Broadcast.TYPE_CHOICES):
+                return Response(
+                    {'error': 'Invalid broadcast type.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            if broadcast_type == 'class':
-                # Send to students in the same class as the class leader
-                if request.user.role == 'class_leader' and hasattr(request.user, 'profile'):
-                    user_profile = request.user.profile
-                    if user_profile.university:
-                        target_users = target_users.filter(profile__university=user_profile.university)
-                    if user_profile.field_of_study:
-                        target_users = target_users.filter(profile__field_of_study=user_profile.field_of_study)
-                    if user_profile.academic_year:
-                        target_users = target_users.filter(profile__academic_year=user_profile.academic_year)
-                elif target_field_of_study or target_academic_year:
-                    if target_field_of_study:
-                        target_users = target_users.filter(profile__field_of_study__icontains=target_field_of_study)
-                    if target_academic_year:
-                        target_users = target_users.filter(profile__academic_year__icontains=target_academic_year)
-            elif broadcast_type == 'university':
-                if request.user.role == 'class_leader' and hasattr(request.user, 'profile'):
-                    user_profile = request.user.profile
-                    if user_profile.university:
-                        target_users = target_users.filter(profile__university=user_profile.university)
-                elif target_university:
-                    target_users = target_users.filter(profile__university__icontains=target_university)
             # 'all' - send to all students (only for admins)
-            elif broadcast_type == 'all' and request.user.role != 'admin':
+            if broadcast_type == 'all' and request.user.role != 'admin':
                 return Response(
                     {'error': 'Only admins can send messages to all students.'},
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            # Limit to prevent too many operations
-            target_users_count = target_users.count()
-            target_users = list(target_users[:1000])  # Limit to 1000 users max
-            
-            logger.info(f"Broadcast will be sent to {len(target_users)} users (out of {target_users_count} total)")
+            logger.info(f"Broadcast request from user {request.user.id}, type: {broadcast_type}")
             
-            # Create individual conversations for each target user
-            created_conversations = []
-            for user in target_users:
-                # Check if conversation already exists
-                existing = Conversation.objects.filter(
-                    conversation_type='private',
-                    participants__user=request.user,
-                    participants__is_active=True
-                ).filter(
-                    participants__user=user,
-                    participants__is_active=True
-                ).distinct().first()
-                
-                if not existing:
-                    # Create new conversation
-                    conversation = Conversation.objects.create(
-                        conversation_type='private',
-                        created_by=request.user
-                    )
-                    Participant.objects.create(conversation=conversation, user=request.user)
-                    Participant.objects.create(conversation=conversation, user=user)
-                    existing = conversation
-                
-                # Send message
-                message = Message.objects.create(
-                    conversation=existing,
+            # Delivery runs in the background, see messaging.broadcast
+            with transaction.atomic():
+                broadcast = Broadcast(
                     sender=request.user,
                     content=content,
-                    message_type='text'
+                    broadcast_type=broadcast_type,
+                    target_university=target_university or '',
+                    target_field_of_study=target_field_of_study or '',
+                    target_academic_year=target_academic_year or ''
                 )
-                
-                # Update conversation last_message_at
-                existing.last_message_at = timezone.now()
-                existing.save()
-                
-                created_conversations.append({
-                    'conversation_id': str(existing.id),
-                    'user_id': str(user.id),
-                    'username': user.username
-                })
-                
-                # Create notification for broadcast message
-                try:
-                    from notifications.utils import create_notification
-                    broadcast_type_label = {
-                        'all': 'tous les étudiants',
-                        'university': 'votre école',
-                        'class': 'votre classe'
-                    }.get(broadcast_type, 'vos contacts')
-                    
-                    create_notification(
-                        recipient=user,
-                        notification_type='message_broadcast',
-                        title='Nouveau message de votre responsable',
-                        message=f'{request.user.username} vous a envoyé un message: {content[:100]}{"..." if len(content) > 100 else ""}',
-                        related_object_type='conversation',
-                        related_object_id=str(existing.id) if existing.id else None
-                    )
-                except Exception as notif_error:
-                    # Log notification error but don't fail the broadcast
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.warning(f"Error creating notification for broadcast: {str(notif_error)}")
+                broadcast.total_recipients = get_broadcast_recipients(broadcast).count()
+                broadcast.save()
+                dispatch_broadcast(broadcast)
             
             return Response({
-                'message': f'Broadcast message sent to {len(created_conversations)} users.',
-                'conversations': created_conversations
-            }, status=status.HTTP_201_CREATED)
+                'message': f'Broadcast message queued for {broadcast.total_recipients} users.',
+                'broadcast': BroadcastSerializer(broadcast).data
+            }, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             logger.error(f"Error in broadcast message: {str(e)}", exc_info=True)
             import traceback
@@ -707,6 +829,21 @@ class MessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], url_path=r'broadcast/(?P<broadcast_id>[^/.]+)')
+    def broadcast_status(self, request, broadcast_id=None):
+        """Get delivery status and progress of a broadcast sent by the current user."""
+        broadcasts = Broadcast.objects.all()
+        if request.user.role != 'admin':
+            broadcasts = broadcasts.filter(sender=request.user)
+        try:
+            broadcast = broadcasts.get(id=broadcast_id)
+        except (Broadcast.DoesNotExist, ValidationError):
+            return Response(
+                {'error': 'Diffusion introuvable.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(BroadcastSerializer(broadcast).data)
+    
     def update(self, request, *args, **kwargs):
         """Update (edit) a message."""
         message = self.get_object()
@@ -735,7 +872,12 @@ class MessageViewSet(viewsets.ModelViewSet):
         
         message.content = new_content
         message.edited_at = timezone.now()
-        message.save(update_fields=['content', 'edited_at'])
+        with transaction.atomic():
+            message.save(update_fields=['content', 'edited_at'])
+            record_event(message, 'message_edited', {
+                'content': message.content,
+                'edited_at': message.edited_at.isoformat(),
+            })
         
         serializer = self.get_serializer(message)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -755,7 +897,13 @@ class MessageViewSet(viewsets.ModelViewSet):
         # Mark as deleted for all
         message.is_deleted_for_all = True
         message.deleted_at = timezone.now()
-        message.save(update_fields=['is_deleted_for_all', 'deleted_at'])
+        with transaction.atomic():
+            message.save(update_fields=['is_deleted_for_all', 'deleted_at'])
+            record_event(message, 'message_deleted', {'deleted_at': message.deleted_at.isoformat()})
+        
+        # Move the inbox pointer back if the deleted message was the latest one
+        if Conversation.objects.filter(id=message.conversation_id, last_message=message).exists():
+            refresh_last_message(message.conversation_id)
         
         return Response({'message': 'Message supprimé pour tous.'}, status=status.HTTP_200_OK)
     
@@ -771,22 +919,17 @@ class MessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        from .models import MessageReaction
-        reaction, created = MessageReaction.objects.get_or_create(
-            message=message,
-            user=request.user,
-            emoji=emoji
-        )
-        
-        if not created:
+        event = add_message_reaction(message, request.user, emoji)
+        if not event:
             return Response(
                 {'error': 'Reaction already exists.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        from .serializers import MessageReactionSerializer
-        serializer = MessageReactionSerializer(reaction)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response({
+            **event.payload['reaction'],
+            'reaction_summary': message.reaction_summary
+        }, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['delete'], permission_classes=[IsAuthenticated])
     def remove_reaction(self, request, pk=None):
@@ -800,14 +943,25 @@ class MessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        from .models import MessageReaction
-        MessageReaction.objects.filter(
-            message=message,
-            user=request.user,
-            emoji=emoji
-        ).delete()
-        
-        return Response({'message': 'Reaction removed.'}, status=status.HTTP_200_OK)
+        remove_message_reaction(message, request.user, emoji)
+        return Response({
+            'message': 'Reaction removed.',
+            'reaction_summary': message.reaction_summary
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def reactions(self, request, pk=None):
+        """List everyone who reacted to a message (optionally ?emoji=), newest first."""
+        message = self.get_object()
+        queryset = message.reactions.select_related('user', 'user__profile').order_by('-created_at')
+        emoji = request.query_params.get('emoji')
+        if emoji:
+            queryset = queryset.filter(emoji=emoji)
+        
+        paginator = CustomPageNumberPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = MessageReactionSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def mark_read(self, request, pk=None):
@@ -831,18 +985,7 @@ class MessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Mark as read
-        message.read_by.add(request.user)
-        
-        # Update participant last_read_at
-        participant = Participant.objects.get(
-            conversation=message.conversation,
-            user=request.user,
-            is_active=True
-        )
-        participant.last_read_at = timezone.now()
-        if participant.unread_count > 0:
-            participant.unread_count -= 1
-        participant.save()
+        # Advance the participant's read watermark
+        advance_read_watermark(request.user, message)
         
         return Response({'message': 'Message marked as read.'}, status=status.HTTP_200_OK)
\ No newline at end of file
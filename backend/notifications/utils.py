@@ -2,6 +2,7 @@
 Utility functions for creating notifications.
 This module provides both synchronous and asynchronous (Celery) notification creation.
 """
+from django.conf import settings
 from django.utils import timezone
 from .models import Notification
 from users.models import User
@@ -34,13 +35,13 @@ def create_notification(
         message: Notification message
         related_object_type: Type of related object (e.g., 'group', 'event', 'user')
         related_object_id: ID of related object (UUID)
-        use_async: If True and Celery is available, use async task
+        use_async: If True and Celery is enabled (USE_CELERY), use async task
     
     Returns:
         Notification instance or None (or task ID if async)
     """
-    # If async is requested and Celery is available, use the task
-    if use_async and CELERY_AVAILABLE:
+    # If async is requested and Celery workers are deployed, use the task
+    if use_async and CELERY_AVAILABLE and settings.USE_CELERY:
         from .tasks import create_notification as create_notification_task
         recipient_id = recipient.id if isinstance(recipient, User) else recipient
         return create_notification_task.delay(
@@ -99,7 +100,7 @@ def create_bulk_notifications(
         message: Notification message
         related_object_type: Type of related object
         related_object_id: ID of related object
-        use_async: If True and Celery is available, use async tasks
+        use_async: If True and Celery is enabled (USE_CELERY), use async tasks
     
     Returns:
         Number of notifications created (or list of task IDs if async)
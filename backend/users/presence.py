@@ -0,0 +1,131 @@
+"""
+Presence tracking for User app.
+Online state lives in the cache with a TTL, and User.last_activity is
+written at most once per user every LAST_ACTIVITY_FLUSH_INTERVAL seconds.
+Fed by authenticated HTTP requests (PresenceMiddleware) and by WebSocket
+connect, heartbeat and disconnect frames (messaging consumers; clients send a
+heartbeat every HEARTBEAT_INTERVAL seconds). The online key is rewritten at
+most once per ONLINE_REFRESH_INTERVAL, so a request usually costs one cache
+read. With a cache backend whose increments are atomic (Redis, Memcached,
+local memory), open sockets are counted per user and the user goes offline as
+soon as their last socket closes; otherwise (DatabaseCache) they go offline
+when the online TTL runs out.
+"""
+import logging
+from django.core.cache import cache
+from django.utils import timezone
+from core.cache import has_atomic_incr
+
+logger = logging.getLogger('users')
+
+ONLINE_TTL = 120  # seconds without activity before a user is considered offline
+ONLINE_REFRESH_INTERVAL = 60  # seconds before a fresh online key is rewritten
+HEARTBEAT_INTERVAL = 45  # seconds between two client heartbeats on an open socket
+LAST_ACTIVITY_FLUSH_INTERVAL = 300  # seconds between two last_activity writes for a user
+CONNECTIONS_TTL = 24 * 60 * 60  # safety net for counters left by sockets that never reported closing
+
+
+def _online_key(user_id):
+    return f'presence:online:{user_id}'
+
+
+def _flush_key(user_id):
+    return f'presence:flushed:{user_id}'
+
+
+def _connections_key(user_id):
+    return f'presence:connections:{user_id}'
+
+
+def touch(user_id, now=None):
+    """
+    Record activity for a user.
+    Marks the user online (unless they were marked during the last
+    ONLINE_REFRESH_INTERVAL seconds) and writes last_activity if it was not
+    written during the last LAST_ACTIVITY_FLUSH_INTERVAL seconds.
+
+    Returns:
+        bool: True if last_activity was written to the database
+    """
+    try:
+        now = now or timezone.now()
+        online_since = cache.get(_online_key(user_id))
+        if online_since is not None and online_since > now.timestamp() - ONLINE_REFRESH_INTERVAL:
+            # Marked recently: no cache write (a database write with DatabaseCache)
+            return False
+        cache.set(_online_key(user_id), now.timestamp(), ONLINE_TTL)
+        # cache.add only succeeds for the first writer of the interval
+        if cache.add(_flush_key(user_id), now.timestamp(), LAST_ACTIVITY_FLUSH_INTERVAL):
+            from .models import User
+            User.objects.filter(id=user_id).update(last_activity=now)
+            return True
+    except Exception as e:
+        logger.warning(f"Error recording presence for user {user_id}: {str(e)}")
+    return False
+
+
+def socket_opened(user_id):
+    """Count an open WebSocket of a user and record the activity."""
+    if has_atomic_incr():
+        try:
+            cache.add(_connections_key(user_id), 0, CONNECTIONS_TTL)
+            cache.incr(_connections_key(user_id))
+        except Exception as e:
+            logger.warning(f"Error counting connection of user {user_id}: {str(e)}")
+    touch(user_id)
+
+
+def socket_closed(user_id):
+    """
+    Uncount a closed WebSocket of a user.
+    The user goes offline only when it was their last open socket; otherwise
+    (other tabs, inbox plus chat sockets) the online TTL keeps running.
+    Without atomic increments, sockets are not counted and the TTL always runs out.
+    """
+    if not has_atomic_incr():
+        return
+    try:
+        remaining = cache.decr(_connections_key(user_id))
+    except ValueError:
+        # Counter expired or evicted: assume it was the last socket
+        remaining = 0
+    except Exception as e:
+        logger.warning(f"Error uncounting connection of user {user_id}: {str(e)}")
+        return
+    if remaining > 0:
+        return
+    mark_offline(user_id)
+    try:
+        # A socket opened meanwhile may have been marked online just before the delete
+        if (cache.get(_connections_key(user_id)) or 0) > 0:
+            touch(user_id)
+    except Exception as e:
+        logger.warning(f"Error reading connections of user {user_id}: {str(e)}")
+
+
+def mark_offline(user_id):
+    """Clear the online state of a user, whatever sockets they have open."""
+    try:
+        cache.delete(_online_key(user_id))
+    except Exception as e:
+        logger.warning(f"Error clearing presence for user {user_id}: {str(e)}")
+
+
+def is_online(user_id):
+    """Check if a user had activity during the last ONLINE_TTL seconds."""
+    try:
+        return cache.get(_online_key(user_id)) is not None
+    except Exception as e:
+        logger.warning(f"Error reading presence for user {user_id}: {str(e)}")
+        return False
+
+
+def get_online_user_ids(user_ids):
+    """Return the subset of user_ids that are online, in a single cache round trip."""
+    keys = {_online_key(user_id): str(user_id) for user_id in user_ids}
+    try:
+        found = cache.get_many(list(keys))
+    except Exception as e:
+        logger.warning(f"Error reading presence: {str(e)}")
+        return set()
+    return {keys[key] for key in found}
@@ -0,0 +1,139 @@
+"""
+Tests for presence tracking.
+"""
+from datetime import timedelta
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from users.presence import touch, mark_offline, is_online, get_online_user_ids
+from messaging.models import Conversation, Participant
+from messaging.routing import websocket_urlpatterns
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+)
+class PresenceTestCase(TestCase):
+    """Test presence and last_activity coalescing."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@esmt.sn',
+            username='testuser',
+            password='Test123!',
+            phone_number='+221771234567'
+        )
+        cache.clear()
+
+    def test_touch_coalesces_last_activity_writes(self):
+        """Test that last_activity is written once per flush interval."""
+        first = timezone.now()
+        self.assertTrue(touch(self.user.id, now=first))
+        self.assertFalse(touch(self.user.id, now=first + timedelta(seconds=30)))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_activity, first)
+        self.assertTrue(is_online(self.user.id))
+
+    def test_mark_offline(self):
+        """Test that a user is offline after mark_offline."""
+        touch(self.user.id)
+        mark_offline(self.user.id)
+        self.assertFalse(is_online(self.user.id))
+        self.assertEqual(get_online_user_ids([self.user.id]), set())
+
+    def test_authenticated_request_records_activity(self):
+        """Test that the middleware records activity of JWT-authenticated requests."""
+        self.client.force_authenticate(user=self.user)
+        self.client.get('/api/users/verification-status/')
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_activity)
+
+        response = self.client.get(f'/api/users/presence/?ids={self.user.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['online'], {str(self.user.id): True})
+
+    async def _connect(self, path):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_online_until_last_socket_closes(self):
+        """Test that closing one of several sockets leaves the user online."""
+        conversation = await Conversation.objects.acreate(conversation_type='group', name='Promo', created_by=self.user)
+        await Participant.objects.acreate(conversation=conversation, user=self.user)
+
+        inbox = await self._connect('/ws/inbox/')
+        await inbox.receive_json_from()  # subscriptions
+        chat = await self._connect(f'/ws/chat/{conversation.id}/')
+        other_tab = await self._connect('/ws/inbox/')
+        await other_tab.receive_json_from()
+
+        await chat.disconnect()
+        await inbox.disconnect()
+        self.assertTrue(is_online(self.user.id))
+
+        await other_tab.disconnect()
+        self.assertFalse(is_online(self.user.id))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'presence_cache'}},
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+)
+class DatabaseCachePresenceTestCase(TestCase):
+    """Test presence with a cache backend whose increments are not atomic."""
+
+    def setUp(self):
+        call_command('createcachetable')
+        self.user = User.objects.create_user(
+            email='test@esmt.sn',
+            username='testuser',
+            password='Test123!',
+            phone_number='+221771234567'
+        )
+
+    def _cache_writes(self, function):
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        return [
+            q for q in queries.captured_queries
+            if 'presence_cache' in q['sql'] and not q['sql'].startswith('SELECT')
+        ]
+
+    def test_touch_throttles_online_writes(self):
+        """Test that a user marked online recently costs no cache write."""
+        first = timezone.now()
+        self.assertTrue(self._cache_writes(lambda: touch(self.user.id, now=first)))
+        self.assertEqual(self._cache_writes(lambda: touch(self.user.id, now=first + timedelta(seconds=30))), [])
+        self.assertTrue(self._cache_writes(lambda: touch(self.user.id, now=first + timedelta(seconds=70))))
+        self.assertTrue(is_online(self.user.id))
+
+    async def test_sockets_are_not_counted(self):
+        """Test that closing sockets leaves the online TTL running instead of using a racy counter."""
+        sockets = []
+        for _ in range(2):
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/inbox/')
+            communicator.scope['user'] = self.user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.receive_json_from()
+            sockets.append(communicator)
+
+        for socket in sockets:
+            await socket.disconnect()
+        self.assertTrue(await database_sync_to_async(is_online)(self.user.id))
+        self.assertIsNone(await cache.aget(f'presence:connections:{self.user.id}'))
@@ -5,7 +5,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
-    register, verify_phone, resend_otp, verify_email, verification_status, profile, my_profile_stats, my_profile_stats_detailed,
+    register, verify_phone, resend_otp, verify_email, verification_status, presence_status, profile, my_profile_stats, my_profile_stats_detailed,
     change_password, notification_preferences,
     CustomTokenObtainPairView, UserViewSet, UniversityViewSet, CampusViewSet, friends_list, send_friend_request,
     friend_suggestions,
@@ -37,6 +37,9 @@ urlpatterns = [
     path('verify-email/<str:token>/', verify_email, name='verify_email'),
     path('verification-status/', verification_status, name='verification_status'),
     
+    # Presence
+    path('presence/', presence_status, name='presence_status'),
+    
     # Profile
     path('profile/', profile, name='profile'),
     path('profile/stats/', my_profile_stats, name='my_profile_stats'),
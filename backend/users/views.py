@@ -23,6 +23,7 @@ from .serializers import (
 from .permissions import IsVerified, IsActiveAndVerified, IsAdminOrClassLeader, IsAdmin, IsUniversityAdmin
 from .throttling import RegisterThrottle, OTPThrottle, LoginThrottle
 from .security import check_account_lockout, record_failed_login_attempt, clear_login_attempts
+from .presence import get_online_user_ids
 from core.cache import get_otp, set_otp, delete_otp
 from notifications.tasks import send_otp_sms, send_verification_email
 
@@ -294,6 +295,25 @@ def verification_status(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def presence_status(request):
+    """
+    Get online status for a list of users.
+    Usage: /presence/?ids=<uuid>,<uuid>,... (max 200 ids)
+    """
+    ids = [user_id.strip() for user_id in request.query_params.get('ids', '').split(',') if user_id.strip()]
+    if not ids:
+        return Response({'error': 'ids parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > 200:
+        return Response({'error': 'Maximum 200 ids per request.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    online_ids = get_online_user_ids(ids)
+    return Response({
+        'online': {user_id: user_id in online_ids for user_id in ids}
+    })
+
+
 @api_view(['GET', 'PUT'])
 @permission_classes([IsAuthenticated])
 def profile(request):
@@ -67,8 +67,8 @@ export default function EventDetailPage() {
     
     setIsJoining(true)
     try {
-      await eventService.joinEvent(eventId)
-      toast.success('Vous avez rejoint l\'événement avec succès')
+      const result = await eventService.joinEvent(eventId)
+      toast.success(result?.waitlisted ? result.message : 'Vous avez rejoint l\'événement avec succès')
       await loadEvent() // Reload to get updated participant count
     } catch (error: any) {
       console.error('Error joining event:', error)
@@ -82,14 +82,15 @@ export default function EventDetailPage() {
   const handleLeaveEvent = async () => {
     if (!event || !eventId) return
     
-    if (!confirm('Êtes-vous sûr de vouloir quitter cet événement ?')) {
+    const onWaitlist = !event.is_participating && event.is_waitlisted
+    if (!confirm(onWaitlist ? 'Quitter la liste d\'attente ?' : 'Êtes-vous sûr de vouloir quitter cet événement ?')) {
       return
     }
     
     setIsJoining(true)
     try {
       await eventService.leaveEvent(eventId)
-      toast.success('Vous avez quitté l\'événement')
+      toast.success(onWaitlist ? 'Vous avez quitté la liste d\'attente' : 'Vous avez quitté l\'événement')
       await loadEvent()
     } catch (error: any) {
       console.error('Error leaving event:', error)
@@ -303,6 +304,14 @@ export default function EventDetailPage() {
                   <div className="flex-1 bg-blue-50 text-blue-700 py-3 rounded-lg text-center font-medium">
                     Vous êtes l'organisateur de cet événement
                   </div>
+                ) : isEventFull && !isEventPassed ? (
+                  <button
+                    onClick={event.is_waitlisted ? handleLeaveEvent : handleJoinEvent}
+                    disabled={isJoining}
+                    className="flex-1 bg-amber-500 text-white py-3 rounded-lg hover:bg-amber-600 transition font-medium disabled:opacity-50 disabled:cursor-not-allowed"
+                  >
+                    {isJoining ? 'Traitement...' : event.is_waitlisted ? 'Quitter la liste d\'attente' : 'Événement complet · Rejoindre la liste d\'attente'}
+                  </button>
                 ) : isEventFull ? (
                   <div className="flex-1 bg-red-50 text-red-700 py-3 rounded-lg text-center font-medium">
                     Événement complet
@@ -139,7 +139,7 @@ export default function MyEventsPage() {
   const pastEvents = events.filter(e => isEventPast(e))
   const organizedEvents = events.filter(e => e.organizer.id === user.id)
   const participatingEvents = events.filter(e => e.is_participating && e.organizer.id !== user.id)
-  const favoriteEvents = events.filter(e => e.is_liked) // Note: is_liked might not be the right field for favorites
+  const favoriteEvents = events.filter(e => e.is_favorited)
 
   return (
     <div className="min-h-screen bg-gradient-to-br from-primary-50 to-secondary-50 page-with-bottom-nav">
@@ -5,7 +5,7 @@ import { useRouter } from 'next/navigation'
 import { useEffect, useState, useRef, useCallback } from 'react'
 import { useHotkeys } from 'react-hotkeys-hook'
 import { FiMessageSquare, FiSend, FiSearch, FiRadio, FiX, FiUsers, FiGlobe, FiUser, FiHash, FiPlus, FiSmile, FiLogOut, FiBookmark, FiArchive, FiStar, FiBell, FiBellOff, FiEdit2, FiTrash2, FiMoreVertical, FiPaperclip, FiImage, FiFile } from 'react-icons/fi'
-import { messagingService, Conversation, Message } from '@/services/messagingService'
+import { messagingService, Conversation, Message, ReactionSummary } from '@/services/messagingService'
 import { userService } from '@/services/userService'
 import { groupService, Group } from '@/services/groupService'
 import { useWebSocket } from '@/hooks/useWebSocket'
@@ -161,37 +161,37 @@ export default function MessagesPage() {
     )
   }, [user])
 
-  const handleReactionAdded = useCallback((messageId: string, reaction: any) => {
+  const handleReactionAdded = useCallback((messageId: string, reaction: any, reactionSummary: ReactionSummary) => {
     setMessages((prev) =>
       prev.map((msg) => {
         if (msg.id === messageId) {
-          const reactions = msg.reactions || []
+          const myReactions = msg.my_reactions || []
           return {
             ...msg,
-            reactions: [...reactions, reaction],
+            reaction_summary: reactionSummary,
+            my_reactions: reaction.user_id === user?.id ? [...myReactions, reaction.emoji] : myReactions,
           }
         }
         return msg
       })
     )
-  }, [])
+  }, [user])
 
-  const handleReactionRemoved = useCallback((messageId: string, userId: string, emoji: string) => {
+  const handleReactionRemoved = useCallback((messageId: string, userId: string, emoji: string, reactionSummary: ReactionSummary) => {
     setMessages((prev) =>
       prev.map((msg) => {
         if (msg.id === messageId) {
-          const reactions = (msg.reactions || []).filter(
-            (r: any) => !(r.user.id === userId && r.emoji === emoji)
-          )
+          const myReactions = msg.my_reactions || []
           return {
             ...msg,
-            reactions,
+            reaction_summary: reactionSummary,
+            my_reactions: userId === user?.id ? myReactions.filter((e: string) => e !== emoji) : myReactions,
           }
         }
         return msg
       })
     )
-  }, [])
+  }, [user])
 
   // WebSocket connection
   const ws = useWebSocket({
@@ -417,7 +417,7 @@ export default function MessagesPage() {
     setIsSendingBroadcast(true)
     try {
       const response = await messagingService.broadcastMessage(broadcastData)
-      toast.success(`Message envoyé à ${response.conversations.length} utilisateur(s)`)
+      toast.success(`Message en cours d'envoi à ${response.broadcast.total_recipients} utilisateur(s)`)
       setShowBroadcastModal(false)
       setBroadcastData({ content: '', type: 'class' })
       await loadConversations()
@@ -540,10 +540,11 @@ export default function MessagesPage() {
         await messagingService.sendMessage(
           selectedConversation.id,
           messageInput.trim() || (isImage ? '📷 Image' : '📎 Fichier'),
-          uploadResult.url,
+          uploadResult.url || undefined,
           uploadResult.name,
           uploadResult.size,
-          messageType
+          messageType,
+          uploadResult.id
         )
         setMessageInput('')
         setSelectedFile(null)
@@ -1264,7 +1265,8 @@ export default function MessagesPage() {
                           const isOwnMessage = message.sender?.id === user?.id || message.sender_id === user?.id
                           const senderName = message.sender?.username || message.sender?.first_name || message.sender || 'Utilisateur'
                           const readBy = message.read_by || []
-                          const reactions = message.reactions || []
+                          const reactions = Object.entries(message.reaction_summary || {}) as Array<[string, { count: number }]>
+                          const myReactions: string[] = message.my_reactions || []
                           
                           // Vérifier si le message précédent est du même expéditeur et dans les 5 dernières minutes
                           const prevMessage = index > 0 ? messages[index - 1] : null
@@ -1330,7 +1332,7 @@ export default function MessagesPage() {
                                               {message.message_type === 'image' ? (
                                                 <div className="rounded-lg overflow-hidden max-w-xs">
                                                   <img
-                                                    src={message.attachment_url}
+                                                    src={message.attachment_thumbnail_url || message.attachment_url}
                                                     alt={message.attachment_name || 'Image'}
                                                     className="max-w-full h-auto cursor-pointer hover:opacity-90 transition"
                                                     onClick={() => window.open(message.attachment_url, '_blank')}
@@ -1408,24 +1410,23 @@ export default function MessagesPage() {
                                 </div>
                                 {reactions.length > 0 && (
                                   <div className="flex flex-wrap gap-1 mt-1">
-                                    {reactions.map((reaction: any, idx: number) => (
+                                    {reactions.map(([emoji, summary]) => (
                                       <button
-                                        key={idx}
+                                        key={emoji}
                                         onClick={() => {
-                                          const isMyReaction = reaction.user?.id === user?.id || reaction.user_id === user?.id
-                                          if (isMyReaction) {
-                                            handleRemoveReaction(message.id, reaction.emoji)
+                                          if (myReactions.includes(emoji)) {
+                                            handleRemoveReaction(message.id, emoji)
                                           } else {
-                                            handleAddReaction(message.id, reaction.emoji)
+                                            handleAddReaction(message.id, emoji)
                                           }
                                         }}
                                         className={`text-xs px-2 py-1 rounded-full border ${
-                                          reaction.user?.id === user?.id || reaction.user_id === user?.id
+                                          myReactions.includes(emoji)
                                             ? 'bg-primary-100 dark:bg-primary-900 border-primary-300 dark:border-primary-700'
                                             : 'bg-gray-200 dark:bg-gray-600 border-gray-300 dark:border-gray-500'
                                         }`}
                                       >
-                                        {reaction.emoji}
+                                        {emoji}{summary.count > 1 ? ` ${summary.count}` : ''}
                                       </button>
                                     ))}
                                     <button
@@ -1,5 +1,6 @@
 import { useEffect, useRef, useState, useCallback } from 'react'
 import { useAuth } from '@/context/AuthContext'
+import type { ReactionSummary } from '@/services/messagingService'
 
 interface WebSocketMessage {
   type: string
@@ -10,6 +11,7 @@ interface WebSocketMessage {
   message_id?: string
   reaction?: any
   emoji?: string
+  reaction_summary?: ReactionSummary
 }
 
 interface UseWebSocketOptions {
@@ -17,10 +19,13 @@ interface UseWebSocketOptions {
   onMessage?: (message: any) => void
   onTyping?: (userId: string, username: string, typing: boolean) => void
   onReadReceipt?: (messageId: string, userId: string, username: string) => void
-  onReactionAdded?: (messageId: string, reaction: any) => void
-  onReactionRemoved?: (messageId: string, userId: string, emoji: string) => void
+  onReactionAdded?: (messageId: string, reaction: any, reactionSummary: ReactionSummary) => void
+  onReactionRemoved?: (messageId: string, userId: string, emoji: string, reactionSummary: ReactionSummary) => void
 }
 
+// Keeps the user online while the socket is open (server presence TTL is 120s)
+const HEARTBEAT_INTERVAL_MS = 45000
+
 export function useWebSocket({
   conversationId,
   onMessage,
@@ -34,6 +39,14 @@ export function useWebSocket({
   const wsRef = useRef<WebSocket | null>(null)
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null)
   const typingTimeoutRef = useRef<NodeJS.Timeout | null>(null)
+  const heartbeatIntervalRef = useRef<NodeJS.Timeout | null>(null)
+
+  const stopHeartbeat = useCallback(() => {
+    if (heartbeatIntervalRef.current) {
+      clearInterval(heartbeatIntervalRef.current)
+      heartbeatIntervalRef.current = null
+    }
+  }, [])
 
   const connect = useCallback(() => {
     if (!conversationId || !user) return
@@ -71,6 +84,12 @@ export function useWebSocket({
           clearTimeout(reconnectTimeoutRef.current)
           reconnectTimeoutRef.current = null
         }
+        stopHeartbeat()
+        heartbeatIntervalRef.current = setInterval(() => {
+          if (ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify({ type: 'heartbeat' }))
+          }
+        }, HEARTBEAT_INTERVAL_MS)
       }
 
       ws.onmessage = (event) => {
@@ -95,12 +114,12 @@ export function useWebSocket({
               break
             case 'reaction_added':
               if (data.message_id && data.reaction && onReactionAdded) {
-                onReactionAdded(data.message_id, data.reaction)
+                onReactionAdded(data.message_id, data.reaction, data.reaction_summary || {})
               }
               break
             case 'reaction_removed':
               if (data.message_id && data.user_id && data.emoji && onReactionRemoved) {
-                onReactionRemoved(data.message_id, data.user_id, data.emoji)
+                onReactionRemoved(data.message_id, data.user_id, data.emoji, data.reaction_summary || {})
               }
               break
           }
@@ -114,6 +133,7 @@ export function useWebSocket({
       }
 
       ws.onclose = () => {
+        stopHeartbeat()
         setIsConnected(false)
         // Attempt to reconnect after 3 seconds
         if (conversationId && user) {
@@ -125,9 +145,10 @@ export function useWebSocket({
     } catch (error) {
       console.error('Error creating WebSocket:', error)
     }
-  }, [conversationId, user, onMessage, onTyping, onReadReceipt, onReactionAdded, onReactionRemoved])
+  }, [conversationId, user, onMessage, onTyping, onReadReceipt, onReactionAdded, onReactionRemoved, stopHeartbeat])
 
   const disconnect = useCallback(() => {
+    stopHeartbeat()
     if (wsRef.current) {
       wsRef.current.close()
       wsRef.current = null
@@ -137,7 +158,7 @@ export function useWebSocket({
       reconnectTimeoutRef.current = null
     }
     setIsConnected(false)
-  }, [])
+  }, [stopHeartbeat])
 
   const sendMessage = useCallback((content: string) => {
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
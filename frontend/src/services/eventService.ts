@@ -44,7 +44,9 @@ export interface Event {
     last_name?: string
   }>
   is_participating?: boolean
+  is_waitlisted?: boolean
   is_liked?: boolean
+  is_favorited?: boolean
   likes_count: number
   created_at: string
   updated_at: string
@@ -58,20 +58,60 @@ export interface Message {
   attachment_url?: string
   attachment_name?: string
   attachment_size?: number
+  attachment?: string
+  attachment_thumbnail_url?: string
   is_read: boolean
   created_at: string
   edited_at?: string
   is_deleted_for_all?: boolean
   deleted_at?: string
+  seq?: number
+  reaction_summary?: ReactionSummary
+  my_reactions?: string[]
+}
+
+export type ReactionSummary = Record<string, {
+  count: number
+  recent: Array<{ user_id: string; username: string }>
+}>
+
+export interface Broadcast {
+  id: string
+  content: string
+  broadcast_type: 'all' | 'university' | 'class'
+  status: 'pending' | 'running' | 'completed' | 'failed'
+  total_recipients: number
+  processed_count: number
+  conversations_created: number
+  progress: number
+  error: string
+  created_at: string
+  started_at?: string
+  completed_at?: string
+}
+
+export interface AttachmentUploadResult {
+  id: string
+  url: string | null
+  thumbnail_url: string | null
+  name: string
+  size: number
+  content_type: string
+  sha256: string
+  status: 'pending' | 'processing' | 'ready' | 'failed'
+}
+
+// Files above this size are sent in resumable chunks
+const CHUNKED_UPLOAD_THRESHOLD = 1024 * 1024
+
+const sha256Hex = async (file: File) => {
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer())
+  return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('')
 }
 
 export interface BroadcastResponse {
   message: string
-  conversations: Array<{
-    conversation_id: string
-    user_id: string
-    username: string
-  }>
+  broadcast: Broadcast
 }
 
 export const messagingService = {
@@ -96,6 +136,11 @@ export const messagingService = {
     return response.data
   },
 
+  getUnreadSummary: async (): Promise<{ total: number; conversations: Record<string, number> }> => {
+    const response = await api.get('/messaging/conversations/unread_summary/')
+    return response.data
+  },
+
   createPrivateConversation: async (userId: string) => {
     const response = await api.post('/messaging/conversations/create_private/', {
       user_id: userId,
@@ -112,19 +157,32 @@ export const messagingService = {
     return response.data
   },
 
-  sendMessage: async (conversationId: string, content: string, attachmentUrl?: string, attachmentName?: string, attachmentSize?: number, messageType: 'text' | 'image' | 'file' = 'text') => {
+  searchMessages: async (query: string, conversationId?: string, page: number = 1) => {
+    const params: any = { q: query.trim(), page }
+    if (conversationId) {
+      params.conversation = conversationId
+    }
+    const response = await api.get('/messaging/messages/search/', { params })
+    return response.data
+  },
+
+  sendMessage: async (conversationId: string, content: string, attachmentUrl?: string, attachmentName?: string, attachmentSize?: number, messageType: 'text' | 'image' | 'file' = 'text', attachmentId?: string) => {
     const response = await api.post('/messaging/messages/', {
       conversation: conversationId,
       content,
       message_type: messageType,
-      attachment_url: attachmentUrl,
+      attachment_url: attachmentUrl || undefined,
       attachment_name: attachmentName,
       attachment_size: attachmentSize,
+      attachment: attachmentId,
     })
     return response.data
   },
 
-  uploadAttachment: async (file: File) => {
+  uploadAttachment: async (file: File): Promise<AttachmentUploadResult> => {
+    if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+      return messagingService.uploadAttachmentInChunks(file)
+    }
     const formData = new FormData()
     formData.append('file', file)
     const response = await api.post('/messaging/messages/upload_attachment/', formData, {
@@ -135,6 +193,52 @@ export const messagingService = {
     return response.data
   },
 
+  // Resumable upload: a file already stored on the server (same hash) is not sent again,
+  // and an interrupted upload resumes from the bytes the server acknowledged
+  uploadAttachmentInChunks: async (file: File, uploadId?: string): Promise<AttachmentUploadResult> => {
+    let upload
+    if (uploadId) {
+      upload = (await api.get(`/messaging/messages/attachments/uploads/${uploadId}/`)).data
+    } else {
+      const start = await api.post('/messaging/messages/attachments/uploads/', {
+        file_name: file.name,
+        content_type: file.type,
+        total_size: file.size,
+        sha256: await sha256Hex(file),
+      })
+      if (start.data.received_bytes === undefined) {
+        // Same content already stored, nothing to send
+        return start.data
+      }
+      upload = start.data
+    }
+    const chunkSize = upload.chunk_size || CHUNKED_UPLOAD_THRESHOLD
+    let offset = upload.received_bytes
+    while (offset < file.size) {
+      const formData = new FormData()
+      formData.append('offset', String(offset))
+      formData.append('chunk', file.slice(offset, offset + chunkSize), file.name)
+      try {
+        const response = await api.put(`/messaging/messages/attachments/uploads/${upload.id}/`, formData, {
+          headers: {
+            'Content-Type': 'multipart/form-data',
+          },
+        })
+        offset = response.data.received_bytes
+      } catch (error: any) {
+        if (error?.response?.status !== 409) throw error
+        offset = error.response.data.received_bytes
+      }
+    }
+    const response = await api.post(`/messaging/messages/attachments/uploads/${upload.id}/complete/`)
+    return { ...response.data, name: file.name }
+  },
+
+  getAttachment: async (attachmentId: string) => {
+    const response = await api.get(`/messaging/messages/attachments/${attachmentId}/`)
+    return response.data
+  },
+
   broadcastMessage: async (data: {
     content: string
     type: 'all' | 'university' | 'class'
@@ -146,11 +250,25 @@ export const messagingService = {
     return response.data
   },
 
+  getBroadcastStatus: async (broadcastId: string): Promise<Broadcast> => {
+    const response = await api.get(`/messaging/messages/broadcast/${broadcastId}/`)
+    return response.data
+  },
+
   addReaction: async (messageId: string, emoji: string) => {
     const response = await api.post(`/messaging/messages/${messageId}/add_reaction/`, { emoji })
     return response.data
   },
 
+  getReactions: async (messageId: string, emoji?: string, page: number = 1) => {
+    const params: any = { page }
+    if (emoji) {
+      params.emoji = emoji
+    }
+    const response = await api.get(`/messaging/messages/${messageId}/reactions/`, { params })
+    return response.data
+  },
+
   removeReaction: async (messageId: string, emoji: string) => {
     const response = await api.delete(`/messaging/messages/${messageId}/remove_reaction/`, {
       data: { emoji },